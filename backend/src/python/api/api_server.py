@@ -1,9 +1,15 @@
 from typing import Any
 import flask
+from werkzeug.serving import make_server
 
-from utils import SERVER
+from utils import SERVER, Metrics
+from utils.metrics import RequestStats
 
-from database import Database, User, Session, Project
+from database import Database
+
+from . import routes
+from .json_provider import FastJSONProvider
+from .unix_socket import UnixSocketListener
 
 from random import random
 
@@ -12,6 +18,78 @@ class ApiServer:
     def __init__(self):
         self.database = Database.get_instance()
         self.app = flask.Flask(__name__)
+        self.app.json = FastJSONProvider(self.app)
+        self.metrics = Metrics.get_instance()
+
+        # Registered first, so it runs before every other `before_request` and after every other `after_request`
+        @self.app.before_request
+        def start_measuring():
+            self.metrics.start_request()
+
+        @self.app.after_request
+        def record_status(response: flask.Response) -> flask.Response:
+            flask.g.status_code = response.status_code
+            return response
+
+        # Measured on teardown, which runs even when the request failed without a response (then a 500)
+        @self.app.teardown_request
+        def finish_measuring(exception: BaseException | None) -> None:
+            rule = flask.request.url_rule
+            status_code = flask.g.get("status_code", 500)
+            measured = self.metrics.finish_request(
+                rule.rule if rule else "<unmatched>",
+                flask.request.method,
+                status_code,
+            )
+            if measured:
+                self.log_slow_request(
+                    flask.request.method,
+                    flask.request.path,
+                    status_code,
+                    *measured,
+                )
+
+        @self.app.route("/metrics")
+        def metrics():
+            """
+            Exposes the performance metrics of this process in the Prometheus text format.
+            It's not under /api, so nginx doesn't expose it publicly.
+            """
+            counters, gauges = self.database.get_stats()
+            return flask.Response(
+                self.metrics.render(counters, gauges),
+                mimetype="text/plain; version=0.0.4",
+            )
+
+        @self.app.route("/internal/authorize", methods=["POST"])
+        def authorize():
+            """
+            Checks many websocket handshakes at once (see `routes.authorize`).
+            It's not under /api, so nginx doesn't expose it publicly and it doesn't need a session cookie,
+            but it requires the realtime servers' secret.
+            """
+            request = flask.request
+            return self.run(
+                routes.authorize(
+                    request.get_json(silent=True),
+                    request.headers.get(routes.INTERNAL_SECRET_HEADER),
+                )
+            )
+
+        @self.app.route("/internal/projects/files", methods=["POST"])
+        def import_files():
+            """
+            Registers files the realtime servers already store (see `routes.import_files`).
+            It's not under /api, so nginx doesn't expose it publicly and it doesn't need a session cookie,
+            but it requires the realtime servers' secret.
+            """
+            request = flask.request
+            return self.run(
+                routes.import_files(
+                    request.get_json(silent=True),
+                    request.headers.get(routes.INTERNAL_SECRET_HEADER),
+                )
+            )
 
         @self.app.route("/api/rand")
         def rand():
@@ -19,232 +97,116 @@ class ApiServer:
 
         @self.app.route("/api/login", methods=["POST"])
         def login():
-            data = flask.request.json
-            if not data:
-                return self.json_response(False, {"error": "Invalid request"}, 400)
-            email = data.get("email")
-            password = data.get("password")
-            if email and password:
-                password = self.database.hash_sha256(password)
-                with self.database.session_scope():
-                    user = self.database.select_from(
-                        User, User.email == email, User.password == password
-                    )
-                    if user:
-                        session = self.database.add_session(user.id)
-                        # Set the session cookie
-                        response = self.json_response(True, user.to_dict())
-                        response.set_cookie(
-                            "session_id",
-                            session.session_id,
-                            httponly=True,
-                            secure=True,
-                            samesite="Strict",
-                            max_age=SERVER.COOKIE_MAX_AGE,
-                        )
-                        return response
-                    else:
-                        return self.json_response(
-                            False, {"error": "Email or password is incorrect"}
-                        )
-            return self.json_response(False, {"error": "Failed to login"})
+            return self.run(routes.login(flask.request.json))
 
         @self.app.route("/api/logout", methods=["POST"])
         def logout():
-            session_id = flask.request.cookies.get("session_id")
-            if session_id:
-                with self.database.session_scope():
-                    self.database.delete_from(Session, Session.session_id == session_id)
-
-            response = self.json_response(True, {})
-            response.set_cookie(
-                "session_id",
-                "",
-                expires=0,
-                httponly=True,
-                secure=True,
-                samesite="Strict",
-            )
-            return response
+            return self.run(routes.logout(flask.request.cookies.get("session_id")))
 
         @self.app.route("/api/register", methods=["POST"])
         def register():
-            data = flask.request.json
-            if not data:
-                return self.json_response(False, {"error": "Invalid request"}, 400)
-            email = data.get("email")
-            username = data.get("username")
-            password = data.get("password")
-            if email and username and password:
-                with self.database.session_scope():
-                    user = self.database.add_user(username, email, password)
-                    if user:
-                        session = self.database.add_session(user.id)
-                        response = self.json_response(True, user.to_dict())
-                        response.set_cookie(
-                            "session_id",
-                            session.session_id,
-                            httponly=True,
-                            secure=True,
-                            samesite="Strict",
-                        )
-                        return response
-            return self.json_response(False, {"error": "Failed to register"})
+            return self.run(routes.register(flask.request.json))
 
         @self.app.route("/api/projects", methods=["GET"])
         def projects():
-            user_id = flask.g.user_id
-            with self.database.session_scope():
-                user = self.database.select_from(User, User.id == user_id)
-                if not user:
-                    return self.json_response(False, {"error": "User not found"}, 404)
-                projects = user.projects
-                projects = [p.to_dict() for p in projects]
-            return self.json_response(True, {"projects": projects})
+            """
+            Lists the user's projects, oldest first (see `routes.projects` for the query parameters).
+            """
+            request = flask.request
+            return self.run(
+                routes.projects(
+                    request.args,
+                    request.query_string,
+                    request.if_none_match,
+                    flask.g.user_id,
+                )
+            )
+
+        @self.app.route("/api/projects/search", methods=["GET"])
+        def search_projects():
+            """
+            Searches the user's projects, the best matches first (see `routes.search_projects` for the query parameters).
+            """
+            return self.run(routes.search_projects(flask.request.args, flask.g.user_id))
 
         @self.app.route("/api/projects", methods=["POST"])
         def create_project():
-            data = flask.request.json
-            if not data:
-                return self.json_response(False, {"error": "Invalid request"}, 400)
-            name = data.get("name")
-            description = data.get("description")
-            language = data.get("language")
-            if name and description and language:
-                with self.database.session_scope():
-                    user_id = flask.g.user_id
-
-                    project = self.database.add_project(
-                        name, description, language, user_id
-                    )
-
-                    if project:
-                        return self.json_response(True, project.to_dict())
-
-            return self.json_response(False, {"error": "Failed to create project"})
+            return self.run(routes.create_project(flask.request.json, flask.g.user_id))
 
         @self.app.route("/api/projects/<project_id>", methods=["DELETE"])
         def delete_project(project_id: str):
-            with self.database.session_scope():
-                project = self.database.select_from(
-                    Project, Project.project_id == project_id
-                )
-                if not project:
-                    return self.json_response(
-                        False, {"error": "Project not found"}, 404
-                    )
-
-                # Check if user has access to the project
-                allowed_users = [user.id for user in project.allowed_users]
-                user_id = flask.g.user_id
-                if user_id not in allowed_users:
-                    return self.json_response(False, {"error": "Access denied"}, 403)
-
-                self.database.delete_from(Project, Project.project_id == project_id)
-                return self.json_response(True, {})
+            return self.run(routes.delete_project(project_id, flask.g.user_id))
 
         @self.app.route("/api/projects/<project_id>", methods=["GET"])
         def project(project_id: str):
-            with self.database.session_scope():
-                project = self.database.select_from(
-                    Project, Project.project_id == project_id
-                )
-                if not project:
-                    return self.json_response(
-                        False, {"error": "Project not found"}, 404
-                    )
-
-                # Check if user has access to the project
-                allowed_users = [user.id for user in project.allowed_users]
-                user_id = flask.g.user_id
-                if user_id not in allowed_users:
-                    return self.json_response(False, {"error": "Access denied"}, 403)
-
-                response = self.json_response(True, project.to_dict())
-                return response
+            return self.run(
+                routes.project(project_id, flask.request.if_none_match, flask.g.user_id)
+            )
+
+        @self.app.route("/api/projects/<project_id>/access", methods=["GET", "HEAD"])
+        def project_access(project_id: str):
+            """
+            A lightweight access check used by the realtime servers on every websocket handshake.
+            """
+            return self.run(routes.project_access(project_id, flask.g.user_id))
 
         @self.app.route("/api/projects/<project_id>/addUser", methods=["POST"])
         def add_user(project_id: str):
-            data = flask.request.json
-            if not data:
-                return self.json_response(False, {"error": "Invalid request"}, 400)
-            email = data.get("email")
-            if email:
-                with self.database.session_scope():
-                    project = self.database.select_from(
-                        Project, Project.project_id == project_id
-                    )
-                    if not project:
-                        return self.json_response(
-                            False, {"error": "Project not found"}, 404
-                        )
-
-                    # Check if user has access to the project
-                    allowed_users = [user.id for user in project.allowed_users]
-                    user_id = flask.g.user_id
-                    if user_id not in allowed_users:
-                        return self.json_response(
-                            False, {"error": "Access denied"}, 403
-                        )
-
-                    user = self.database.select_from(User, User.email == email)
-                    if not user:
-                        return self.json_response(
-                            False, {"error": "User not found"}, 404
-                        )
-
-                    # Add user to project
-                    self.database.add_allowed_user(project.id, user.id)
-
-                    return self.json_response(True, project.to_dict())
-
-            return self.json_response(False, {"error": "Failed to add user"})
+            return self.run(
+                routes.add_user(flask.request.json, project_id, flask.g.user_id)
+            )
 
         @self.app.route("/api/projects/<project_id>/removeUser", methods=["POST"])
         def remove_user(project_id: str):
-            data = flask.request.json
-            if not data:
-                return self.json_response(False, {"error": "Invalid request"}, 400)
-            email = data.get("email")
-            if email:
-                with self.database.session_scope():
-                    project = self.database.select_from(
-                        Project, Project.project_id == project_id
-                    )
-                    if not project:
-                        return self.json_response(
-                            False, {"error": "Project not found"}, 404
-                        )
-
-                    # Check if user has access to the project
-                    allowed_users = [user.id for user in project.allowed_users]
-                    user_id = flask.g.user_id
-                    if user_id not in allowed_users:
-                        return self.json_response(
-                            False, {"error": "Access denied"}, 403
-                        )
-
-                    user = self.database.select_from(User, User.email == email)
-                    if not user:
-                        return self.json_response(
-                            False, {"error": "User not found"}, 404
-                        )
-
-                    # Remove user from project
-                    self.database.remove_allowed_user(project.id, user.id)
-
-                    return self.json_response(True, project.to_dict())
-
-            return self.json_response(False, {"error": "Failed to remove user"})
+            return self.run(
+                routes.remove_user(flask.request.json, project_id, flask.g.user_id)
+            )
+
+        @self.app.route("/api/projects/<project_id>/addUsers", methods=["POST"])
+        def add_users(project_id: str):
+            """
+            Adds many users to a project at once (see `routes.add_users`).
+            """
+            data = flask.request.get_json(silent=True)
+            return self.run(routes.add_users(data, project_id, flask.g.user_id))
+
+        @self.app.route("/api/projects/<project_id>/removeUsers", methods=["POST"])
+        def remove_users(project_id: str):
+            """
+            Removes many users from a project at once (see `routes.remove_users`).
+            """
+            data = flask.request.get_json(silent=True)
+            return self.run(routes.remove_users(data, project_id, flask.g.user_id))
+
+        @self.app.route("/api/projects/<project_id>/files", methods=["GET"])
+        def project_files(project_id: str):
+            """
+            Lists the files of a project, ordered by their names.
+            """
+            return self.run(routes.project_files(project_id, flask.g.user_id))
+
+        @self.app.route("/api/projects/<project_id>/files", methods=["POST"])
+        def create_file(project_id: str):
+            """
+            Adds a file to a project (see `routes.create_file`).
+            """
+            data = flask.request.get_json(silent=True)
+            return self.run(routes.create_file(data, project_id, flask.g.user_id))
+
+        @self.app.route("/api/projects/<project_id>/files/<name>", methods=["DELETE"])
+        def delete_file(project_id: str, name: str):
+            return self.run(routes.delete_file(project_id, name, flask.g.user_id))
+
+        @self.app.route("/api/users/autocomplete", methods=["GET"])
+        def autocomplete_users():
+            """
+            Finds the users whose username or email start with `q` (see `routes.autocomplete_users`).
+            """
+            return self.run(routes.autocomplete_users(flask.request.args))
 
         @self.app.route("/api/user", methods=["GET"])
         def user():
-            user_id = flask.g.user_id
-            with self.database.session_scope():
-                user = self.database.select_from(User, User.id == user_id)
-                if not user:
-                    return self.json_response(False, {"error": "User not found"}, 404)
-                return self.json_response(True, user.to_dict())
+            return self.run(routes.user(flask.g.user_id))
 
         @self.app.before_request
         def before_request():
@@ -255,29 +217,24 @@ class ApiServer:
             """
             if not flask.request.path.startswith("/api"):
                 return
-            if flask.request.path in ["/api/login", "/api/logout", "/api/register"]:
+            if flask.request.path in routes.PUBLIC_PATHS:
                 return
 
+            session_id = flask.request.cookies.get("session_id")
+            if not session_id:
+                return self.json_response(False, {"error": "Not logged in"}, 401)
+
             with self.database.session_scope():
-                session_id = flask.request.cookies.get("session_id")
-                if not session_id:
-                    return self.json_response(False, {"error": "Not logged in"}, 401)
-                if not self.database.validate_session(session_id):
-                    return self.json_response(False, {"error": "Invalid session"}, 401)
-
-                session = self.database.select_from(
-                    Session, Session.session_id == session_id
-                )
-                user = self.database.select_from(User, User.id == session.user_id)
-                if not user:
-                    return self.json_response(False, {"error": "User not found"}, 404)
-                flask.g.user_id = user.id
+                user_id = self.database.get_session_user_id(session_id)
+            if user_id is None:
+                return self.json_response(False, {"error": "Invalid session"}, 401)
+            flask.g.user_id = user_id
 
         @self.app.after_request
         def after_request(response: flask.Response) -> flask.Response:
             if not flask.request.path.startswith("/api"):
                 return response
-            if flask.request.path in ["/api/login", "/api/logout", "/api/register"]:
+            if flask.request.path in routes.PUBLIC_PATHS:
                 return response
             if response.status_code != 200:
                 return response
@@ -287,24 +244,66 @@ class ApiServer:
             if session_id:
                 response.set_cookie(
                     "session_id",
-                    session_id,
-                    httponly=True,
-                    secure=True,
-                    samesite="Strict",
+                    self.database.renew_session(session_id),
                     max_age=SERVER.COOKIE_MAX_AGE,
+                    **routes.SESSION_COOKIE,
                 )
             return response
 
+    def run(self, route: routes.Route) -> flask.Response:
+        """
+        Runs a route (see `routes`) with the database, and turns its reply into a response.
+        """
+        return self.respond(routes.run(route, self.database))
+
+    @staticmethod
+    def respond(reply: routes.Reply) -> flask.Response:
+        if reply.body is None:
+            response = flask.Response(status=reply.status)
+        else:
+            response = flask.make_response(flask.jsonify(reply.body), reply.status)
+        return routes.finish(reply, response)
+
     def json_response(
         self, success: bool, data: dict[str, Any], status_code: int = 200
     ):
-        return flask.make_response(
-            flask.jsonify({"success": success, "data": data}), status_code
+        return self.respond(routes.json_reply(success, data, status_code))
+
+    @staticmethod
+    def log_slow_request(
+        method: str, path: str, status: int, duration: float, stats: RequestStats
+    ) -> None:
+        """
+        Logs a request along with its SQL, if it took longer than `SERVER.SLOW_REQUEST_THRESHOLD`.
+        """
+        threshold = SERVER.SLOW_REQUEST_THRESHOLD
+        if threshold is None or duration <= threshold:
+            return
+        print(
+            f"[slow-request] {method} {path} -> {status} "
+            f"took {duration:.3f}s, {stats.queries} queries took {stats.query_time:.3f}s"
         )
+        for statement, query_duration in stats.statements:
+            print(f"    {query_duration:.4f}s  {' '.join(statement.split())}")
 
     def start(self, debug=False):
-        self.app.run(
-            host=SERVER.IP,
-            port=SERVER.PORT,
-            debug=debug,
-        )
+        if not SERVER.UNIX_SOCKET:
+            self.app.run(
+                host=SERVER.IP,
+                port=SERVER.PORT,
+                debug=debug,
+            )
+            return
+
+        # Without werkzeug's reloader, whose child process would bind the socket again
+        self.app.debug = debug
+        with UnixSocketListener(SERVER.UNIX_SOCKET) as listener:
+            server = make_server(
+                f"unix://{listener.path}",
+                0,
+                self.app,
+                threaded=True,
+                fd=listener.fileno(),
+            )
+            print(f" * Running on unix://{listener.path}")
+            server.serve_forever()
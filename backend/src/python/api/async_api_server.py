@@ -0,0 +1,313 @@
+from typing import Any
+import asyncio
+import quart
+
+from utils import SERVER, Metrics
+
+from database.async_database import AsyncDatabase
+
+from . import routes
+from .api_server import ApiServer
+from .json_provider import FastJSONProvider
+from .unix_socket import UnixSocketListener
+
+from random import random
+
+
+class AsyncApiServer:
+    """
+    The asyncio counterpart of `ApiServer`, built on Quart and `AsyncDatabase`.
+    It serves the same routes (see `routes`) with the same behavior and cookies,
+    but a request waiting on the database (or on a lock held by another worker) doesn't hold a thread,
+    so a few workers can serve thousands of concurrent access checks.
+
+    Every route and hook is a coroutine - Quart would run plain functions on a thread pool.
+    """
+
+    def __init__(self):
+        self.database = AsyncDatabase.get_instance()
+        self.app = quart.Quart(__name__)
+        self.app.json = FastJSONProvider(self.app)
+        self.metrics = Metrics.get_instance()
+
+        @self.app.after_serving
+        async def close_database():
+            await self.database.close()
+
+        # Registered first, so it runs before every other `before_request` and after every other `after_request`
+        @self.app.before_request
+        async def start_measuring():
+            self.metrics.start_request()
+
+        @self.app.after_request
+        async def record_status(response: quart.Response) -> quart.Response:
+            quart.g.status_code = response.status_code
+            return response
+
+        # Measured on teardown, which runs even when the request failed without a response (then a 500)
+        @self.app.teardown_request
+        async def finish_measuring(exception: BaseException | None) -> None:
+            rule = quart.request.url_rule
+            status_code = quart.g.get("status_code", 500)
+            measured = self.metrics.finish_request(
+                rule.rule if rule else "<unmatched>",
+                quart.request.method,
+                status_code,
+            )
+            if measured:
+                ApiServer.log_slow_request(
+                    quart.request.method,
+                    quart.request.path,
+                    status_code,
+                    *measured,
+                )
+
+        @self.app.route("/metrics")
+        async def metrics():
+            """
+            Exposes the performance metrics of this process in the Prometheus text format.
+            It's not under /api, so nginx doesn't expose it publicly.
+            """
+            counters, gauges = self.database.get_stats()
+            return quart.Response(
+                self.metrics.render(counters, gauges),
+                mimetype="text/plain; version=0.0.4",
+            )
+
+        @self.app.route("/internal/authorize", methods=["POST"])
+        async def authorize():
+            """
+            Checks many websocket handshakes at once (see `routes.authorize`).
+            """
+            data = await quart.request.get_json(silent=True)
+            secret = quart.request.headers.get(routes.INTERNAL_SECRET_HEADER)
+            return await self.run(routes.authorize(data, secret))
+
+        @self.app.route("/internal/projects/files", methods=["POST"])
+        async def import_files():
+            """
+            Registers files the realtime servers already store (see `routes.import_files`).
+            """
+            data = await quart.request.get_json(silent=True)
+            secret = quart.request.headers.get(routes.INTERNAL_SECRET_HEADER)
+            return await self.run(routes.import_files(data, secret))
+
+        @self.app.route("/api/rand")
+        async def rand():
+            return self.json_response(True, {"num": random()})
+
+        @self.app.route("/api/login", methods=["POST"])
+        async def login():
+            return await self.run(routes.login(await self.get_json()))
+
+        @self.app.route("/api/logout", methods=["POST"])
+        async def logout():
+            session_id = quart.request.cookies.get("session_id")
+            return await self.run(routes.logout(session_id))
+
+        @self.app.route("/api/register", methods=["POST"])
+        async def register():
+            return await self.run(routes.register(await self.get_json()))
+
+        @self.app.route("/api/projects", methods=["GET"])
+        async def projects():
+            """
+            Lists the user's projects, oldest first (see `routes.projects` for the query parameters).
+            """
+            request = quart.request
+            return await self.run(
+                routes.projects(
+                    request.args,
+                    request.query_string,
+                    request.if_none_match,
+                    quart.g.user_id,
+                )
+            )
+
+        @self.app.route("/api/projects/search", methods=["GET"])
+        async def search_projects():
+            """
+            Searches the user's projects, the best matches first (see `routes.search_projects` for the query parameters).
+            """
+            return await self.run(
+                routes.search_projects(quart.request.args, quart.g.user_id)
+            )
+
+        @self.app.route("/api/projects", methods=["POST"])
+        async def create_project():
+            data = await self.get_json()
+            return await self.run(routes.create_project(data, quart.g.user_id))
+
+        @self.app.route("/api/projects/<project_id>", methods=["DELETE"])
+        async def delete_project(project_id: str):
+            return await self.run(routes.delete_project(project_id, quart.g.user_id))
+
+        @self.app.route("/api/projects/<project_id>", methods=["GET"])
+        async def project(project_id: str):
+            return await self.run(
+                routes.project(project_id, quart.request.if_none_match, quart.g.user_id)
+            )
+
+        @self.app.route("/api/projects/<project_id>/access", methods=["GET", "HEAD"])
+        async def project_access(project_id: str):
+            """
+            A lightweight access check used by the realtime servers on every websocket handshake.
+            """
+            return await self.run(routes.project_access(project_id, quart.g.user_id))
+
+        @self.app.route("/api/projects/<project_id>/addUser", methods=["POST"])
+        async def add_user(project_id: str):
+            data = await self.get_json()
+            return await self.run(routes.add_user(data, project_id, quart.g.user_id))
+
+        @self.app.route("/api/projects/<project_id>/removeUser", methods=["POST"])
+        async def remove_user(project_id: str):
+            data = await self.get_json()
+            return await self.run(routes.remove_user(data, project_id, quart.g.user_id))
+
+        @self.app.route("/api/projects/<project_id>/addUsers", methods=["POST"])
+        async def add_users(project_id: str):
+            """
+            Adds many users to a project at once (see `routes.add_users`).
+            """
+            data = await quart.request.get_json(silent=True)
+            return await self.run(routes.add_users(data, project_id, quart.g.user_id))
+
+        @self.app.route("/api/projects/<project_id>/removeUsers", methods=["POST"])
+        async def remove_users(project_id: str):
+            """
+            Removes many users from a project at once (see `routes.remove_users`).
+            """
+            data = await quart.request.get_json(silent=True)
+            return await self.run(
+                routes.remove_users(data, project_id, quart.g.user_id)
+            )
+
+        @self.app.route("/api/projects/<project_id>/files", methods=["GET"])
+        async def project_files(project_id: str):
+            """
+            Lists the files of a project, ordered by their names.
+            """
+            return await self.run(routes.project_files(project_id, quart.g.user_id))
+
+        @self.app.route("/api/projects/<project_id>/files", methods=["POST"])
+        async def create_file(project_id: str):
+            """
+            Adds a file to a project (see `routes.create_file`).
+            """
+            data = await quart.request.get_json(silent=True)
+            return await self.run(routes.create_file(data, project_id, quart.g.user_id))
+
+        @self.app.route("/api/projects/<project_id>/files/<name>", methods=["DELETE"])
+        async def delete_file(project_id: str, name: str):
+            return await self.run(routes.delete_file(project_id, name, quart.g.user_id))
+
+        @self.app.route("/api/users/autocomplete", methods=["GET"])
+        async def autocomplete_users():
+            """
+            Finds the users whose username or email start with `q` (see `routes.autocomplete_users`).
+            """
+            return await self.run(routes.autocomplete_users(quart.request.args))
+
+        @self.app.route("/api/user", methods=["GET"])
+        async def user():
+            return await self.run(routes.user(quart.g.user_id))
+
+        @self.app.before_request
+        async def before_request():
+            """
+            Checks if the user is logged in, like `ApiServer`'s `before_request`.
+            """
+            if not quart.request.path.startswith("/api"):
+                return
+            if quart.request.path in routes.PUBLIC_PATHS:
+                return
+
+            session_id = quart.request.cookies.get("session_id")
+            if not session_id:
+                return self.json_response(False, {"error": "Not logged in"}, 401)
+
+            async with self.database.session_scope():
+                user_id = await self.database.get_session_user_id(session_id)
+            if user_id is None:
+                return self.json_response(False, {"error": "Invalid session"}, 401)
+            quart.g.user_id = user_id
+
+        @self.app.after_request
+        async def after_request(response: quart.Response) -> quart.Response:
+            if not quart.request.path.startswith("/api"):
+                return response
+            if quart.request.path in routes.PUBLIC_PATHS:
+                return response
+            if response.status_code != 200:
+                return response
+
+            # We need to update the session_id cookie to extend the session's lifetime
+            session_id = quart.request.cookies.get("session_id")
+            if session_id:
+                response.set_cookie(
+                    "session_id",
+                    self.database.renew_session(session_id),
+                    max_age=SERVER.COOKIE_MAX_AGE,
+                    **routes.SESSION_COOKIE,
+                )
+            return response
+
+    async def run(self, route: routes.Route) -> quart.Response:
+        """
+        Runs a route (see `routes`) with the async database, and turns its reply into a response.
+        """
+        return self.respond(await routes.run_async(route, self.database))
+
+    @staticmethod
+    def respond(reply: routes.Reply) -> quart.Response:
+        if reply.body is None:
+            response = quart.Response("", status=reply.status)
+        else:
+            response = quart.jsonify(reply.body)
+            response.status_code = reply.status
+        return routes.finish(reply, response)
+
+    def json_response(
+        self, success: bool, data: dict[str, Any], status_code: int = 200
+    ) -> quart.Response:
+        return self.respond(routes.json_reply(success, data, status_code))
+
+    @staticmethod
+    async def get_json() -> Any:
+        """
+        Gets the JSON body of the request, like `flask.request.json`:
+        a body that isn't declared as JSON is rejected with a 415 (Quart would return None).
+        """
+        if not quart.request.is_json:
+            quart.abort(415)
+        return await quart.request.get_json()
+
+    def start(self, debug=False):
+        if not SERVER.UNIX_SOCKET:
+            self.app.run(
+                host=SERVER.IP,
+                port=SERVER.PORT,
+                debug=debug,
+            )
+            return
+
+        from hypercorn.asyncio import serve
+        from hypercorn.config import Config
+
+        # Without Quart's reloader, whose child process would bind the socket again
+        self.app.debug = debug
+        with UnixSocketListener(SERVER.UNIX_SOCKET) as listener:
+            config = Config()
+            config.bind = [listener.bind()]
+            try:
+                asyncio.run(serve(self.app, config))
+            except KeyboardInterrupt:
+                pass
+
+
+def create_app() -> quart.Quart:
+    """
+    Creates the app of a worker of `AsyncProductionServer`.
+    """
+    return AsyncApiServer().app
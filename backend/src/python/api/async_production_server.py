@@ -0,0 +1,45 @@
+from hypercorn.config import Config
+from hypercorn.run import run
+
+from utils import SERVER
+
+from database.membership_broadcast import MembershipBroadcast
+
+from .unix_socket import UnixSocketListener
+
+
+class AsyncProductionServer:
+    """
+    Serves `AsyncApiServer` with hypercorn - a few worker processes, each running an asyncio event loop.
+    Every worker is a fresh (spawned) process that builds its own `AsyncApiServer`, and with it its own database engines.
+
+    SIGTERM and SIGINT gracefully shut the workers down (see `SERVER.GRACEFUL_TIMEOUT`).
+
+    With `SERVER.UNIX_SOCKET`, the workers listen on a Unix domain socket instead of `SERVER.IP`:`SERVER.PORT`.
+    Like `ProductionServer`, the workers broadcast ended sessions and membership changes to each other.
+    """
+
+    def __init__(self, workers: int = SERVER.ASYNC_WORKERS) -> None:
+        """
+        Args:
+            workers: The amount of worker processes.
+        """
+        self.config = Config()
+        self.config.bind = [f"{SERVER.IP}:{SERVER.PORT}"]
+        self.config.workers = workers
+        if workers > 1:
+            MembershipBroadcast.share_between_workers()
+        self.config.keep_alive_timeout = SERVER.KEEP_ALIVE
+        self.config.graceful_timeout = SERVER.GRACEFUL_TIMEOUT
+        # Loaded in each worker, relative to the working directory (backend/src/python)
+        self.config.application_path = "api.async_api_server:create_app()"
+
+    def run(self) -> None:
+        if not SERVER.UNIX_SOCKET:
+            run(self.config)
+            return
+
+        # Bound here rather than by hypercorn, which would replace a running server's socket
+        with UnixSocketListener(SERVER.UNIX_SOCKET) as listener:
+            self.config.bind = [listener.bind()]
+            run(self.config)
@@ -0,0 +1,87 @@
+from typing import Any
+
+from gunicorn.app.base import BaseApplication
+from gunicorn.arbiter import Arbiter
+from gunicorn.workers.base import Worker
+
+from utils import SERVER
+
+from database import Database
+from database.membership_broadcast import MembershipBroadcast
+
+from .unix_socket import UnixSocketListener
+
+
+class ProductionServer(BaseApplication):
+    """
+    Serves the API with gunicorn - a pre-fork server with multiple worker processes, each running a pool of threads.
+    Every worker builds its own `ApiServer`, and with it its own `Database` engine, after it was forked.
+
+    Sending SIGHUP to the master process gracefully reloads the workers,
+    and SIGTERM gracefully shuts them down (see `SERVER.GRACEFUL_TIMEOUT`).
+
+    With `SERVER.UNIX_SOCKET`, the master listens on a Unix domain socket instead of `SERVER.IP`:`SERVER.PORT`.
+
+    Every worker caches validated sessions and project members in memory, so the workers broadcast
+    ended sessions and membership changes to each other (see `MembershipBroadcast.share_between_workers`).
+    Without it, a session that ended on one worker would still be accepted by the others for up to
+    `DATABASE.SESSION_CACHE_TTL`, and changed members served for up to `DATABASE.MEMBERSHIP_CACHE_TTL`.
+    """
+
+    def __init__(
+        self,
+        workers: int = SERVER.WORKERS,
+        threads: int = SERVER.THREADS,
+    ) -> None:
+        """
+        Args:
+            workers: The amount of worker processes.
+            threads: The amount of threads handling requests in each worker.
+        """
+        self.options: dict[str, Any] = {
+            "bind": f"{SERVER.IP}:{SERVER.PORT}",
+            "workers": workers,
+            "threads": threads,
+            "worker_class": "gthread",
+            "keepalive": SERVER.KEEP_ALIVE,
+            "timeout": SERVER.TIMEOUT,
+            "graceful_timeout": SERVER.GRACEFUL_TIMEOUT,
+            # The app is loaded in each worker after the fork, never in the master
+            "preload_app": False,
+            "post_fork": self.post_fork,
+            "worker_exit": self.worker_exit,
+        }
+        if workers > 1:
+            MembershipBroadcast.share_between_workers()
+        super().__init__()
+
+    def run(self) -> None:
+        if not SERVER.UNIX_SOCKET:
+            super().run()
+            return
+
+        # Bound here rather than by gunicorn, which would replace a running server's socket
+        with UnixSocketListener(SERVER.UNIX_SOCKET) as listener:
+            self.cfg.set("bind", [listener.bind()])
+            super().run()
+
+    def load_config(self) -> None:
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from .api_server import ApiServer
+
+        return ApiServer().app
+
+    @staticmethod
+    def post_fork(server: Arbiter, worker: Worker) -> None:
+        # A database inherited from the master would share its connections with every worker
+        if Database.instance:
+            Database.instance.engine.dispose(close=False)
+            Database.instance = None
+
+    @staticmethod
+    def worker_exit(server: Arbiter, worker: Worker) -> None:
+        if Database.instance:
+            Database.instance.close()
@@ -0,0 +1,645 @@
+"""
+The bodies of the API's routes, shared by `ApiServer` (Flask) and `AsyncApiServer` (Quart).
+
+A route is a generator that yields the database operations it needs - functions called with the database -
+and returns a `Reply`. `run` calls the operations with `Database`, and `run_async` awaits them with `AsyncDatabase`,
+whose methods are the same as coroutines, so the servers only read their framework's request and build its response.
+"""
+
+from typing import TYPE_CHECKING, Any, Callable, Generator, Mapping, TypeVar
+import base64
+import hmac
+import datetime
+import re
+from dataclasses import dataclass
+from hashlib import sha1
+
+from werkzeug.datastructures import ETags
+from werkzeug.sansio.response import Response
+
+from utils import DATABASE, SERVER
+
+from database import Database, User, Project
+
+if TYPE_CHECKING:
+    from database.async_database import AsyncDatabase
+
+R = TypeVar("R", bound=Response)
+
+# A database operation, e.g. `lambda database: database.get_project(project_id)`
+Operation = Callable[[Any], Any]
+Route = Generator[Operation, Any, "Reply"]
+
+# The routes that don't require a session
+PUBLIC_PATHS = ["/api/login", "/api/logout", "/api/register"]
+
+# The attributes of the session cookie
+SESSION_COOKIE = {"httponly": True, "secure": True, "samesite": "Strict"}
+
+# The header the realtime servers send `SERVER.INTERNAL_SECRET` in, to the /internal routes
+INTERNAL_SECRET_HEADER = "X-Internal-Secret"
+
+
+@dataclass
+class Reply:
+    """
+    The response of a route, before it's turned into the framework's response (see `finish`).
+    """
+
+    status: int = 200
+    # {"success": ..., "data": ...}, or None for an empty response
+    body: dict[str, Any] | None = None
+    # The version of the resource, which makes clients revalidate the response on every use
+    etag: str | None = None
+    last_modified: datetime.datetime | None = None
+    # How long (in seconds) clients may cache the response for
+    max_age: int | None = None
+    # The arguments of the session cookie's `set_cookie`, if it's set
+    session_cookie: dict[str, Any] | None = None
+
+
+def json_reply(success: bool, data: dict[str, Any], status: int = 200) -> Reply:
+    return Reply(status, {"success": success, "data": data})
+
+
+def finish(reply: Reply, response: R) -> R:
+    """
+    Adds the headers and the cookie of a reply to the framework's response for it.
+    """
+    if reply.etag is not None:
+        response.set_etag(reply.etag)
+        if reply.last_modified:
+            response.last_modified = reply.last_modified.astimezone()
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    if reply.max_age is not None:
+        response.cache_control.private = True
+        response.cache_control.max_age = reply.max_age
+    if reply.session_cookie is not None:
+        response.set_cookie("session_id", **reply.session_cookie)
+    return response
+
+
+def run(route: Route, database: Database) -> Reply:
+    """
+    Runs a route with `Database`, within a session scope.
+    """
+    with database.session_scope():
+        try:
+            operation = next(route)
+            while True:
+                operation = route.send(operation(database))
+        except StopIteration as stop:
+            return stop.value
+
+
+async def run_async(route: Route, database: "AsyncDatabase") -> Reply:
+    """
+    Runs a route with `AsyncDatabase`, within a session scope.
+    """
+    async with database.session_scope():
+        try:
+            operation = next(route)
+            while True:
+                operation = route.send(await operation(database))
+        except StopIteration as stop:
+            return stop.value
+
+
+def authorize(data: Any, secret: str | None) -> Route:
+    """
+    Checks many websocket handshakes at once, for the realtime servers when a room reconnects,
+    e.g. {"pairs": [{"session_id": "...", "project_id": "..."}, ...]}.
+    Responds with {"verdicts": {session_id: {project_id: allowed}}, "ttl": seconds the verdicts may be cached for}.
+    `secret` is the request's `INTERNAL_SECRET_HEADER`.
+    """
+    if not _is_internal(secret):
+        return json_reply(False, {"error": "Forbidden"}, 403)
+
+    pairs = parse_pairs(data)
+    if pairs is None:
+        return json_reply(False, {"error": "Invalid request"}, 400)
+
+    verdicts = yield lambda database: database.authorize_sessions(pairs)
+    return json_reply(True, {"verdicts": verdicts, "ttl": SERVER.AUTHORIZATION_TTL})
+
+
+def import_files(data: Any, secret: str | None) -> Route:
+    """
+    Registers files the realtime servers already store, e.g. {"files": [{"project_id": "...", "name": "..."}, ...]}.
+    Files that are already registered, and files of projects that don't exist, are skipped.
+    Responds with {"imported": the amount of files whose project exists}.
+    `secret` is the request's `INTERNAL_SECRET_HEADER`.
+    """
+    if not _is_internal(secret):
+        return json_reply(False, {"error": "Forbidden"}, 403)
+
+    files = parse_files(data)
+    if files is None:
+        return json_reply(False, {"error": "Invalid request"}, 400)
+
+    imported = yield lambda database: database.import_project_files(files)
+    return json_reply(True, {"imported": imported})
+
+
+def login(data: Any) -> Route:
+    if not isinstance(data, dict) or not data:
+        return json_reply(False, {"error": "Invalid request"}, 400)
+    email = data.get("email")
+    password = data.get("password")
+    if not _strings_or_missing(email, password):
+        return json_reply(False, {"error": "Invalid request"}, 400)
+    if email and password:
+        user = yield lambda database: database.authenticate_user(email, password)
+        if user:
+            session_id = yield lambda database: database.start_session(user.id)
+            # Set the session cookie
+            reply = json_reply(True, user.to_dict())
+            reply.session_cookie = {
+                "value": session_id,
+                "max_age": SERVER.COOKIE_MAX_AGE,
+                **SESSION_COOKIE,
+            }
+            return reply
+        else:
+            return json_reply(False, {"error": "Email or password is incorrect"})
+    return json_reply(False, {"error": "Failed to login"})
+
+
+def logout(session_id: str | None) -> Route:
+    if session_id:
+        yield lambda database: database.end_session(session_id)
+
+    reply = json_reply(True, {})
+    reply.session_cookie = {"value": "", "expires": 0, **SESSION_COOKIE}
+    return reply
+
+
+def register(data: Any) -> Route:
+    if not isinstance(data, dict) or not data:
+        return json_reply(False, {"error": "Invalid request"}, 400)
+    email = data.get("email")
+    username = data.get("username")
+    password = data.get("password")
+    if not _strings_or_missing(email, username, password):
+        return json_reply(False, {"error": "Invalid request"}, 400)
+    if email and username and password:
+        user = yield lambda database: database.add_user(username, email, password)
+        if user:
+            session_id = yield lambda database: database.start_session(user.id)
+            reply = json_reply(True, user.to_dict())
+            reply.session_cookie = {"value": session_id, **SESSION_COOKIE}
+            return reply
+    return json_reply(False, {"error": "Failed to register"})
+
+
+def projects(
+    args: Mapping[str, str], query_string: bytes, if_none_match: ETags, user_id: int
+) -> Route:
+    """
+    Lists the user's projects, oldest first. Accepts the optional query parameters:
+        limit: The page size (up to `SERVER.MAX_PAGE_SIZE`), all the projects are returned if omitted.
+        cursor: The `next_cursor` of the previous page.
+        language: Only list the projects with this language.
+        name: Only list the projects whose name contains this (case-insensitive).
+        fields: A comma-separated list of the project fields to return, e.g. "project_id,name".
+    """
+    limit = args.get("limit")
+    cursor = args.get("cursor")
+    fields = args.get("fields")
+    try:
+        limit = parse_limit(limit) if limit is not None else None
+        after = decode_cursor(cursor) if cursor is not None else None
+        fields = parse_fields(fields) if fields is not None else None
+    except ValueError as e:
+        return json_reply(False, {"error": str(e)}, 400)
+    page = {
+        "limit": limit,
+        "after": after,
+        "language": args.get("language"),
+        "name": args.get("name"),
+    }
+
+    # The version of the requested page alone
+    version, last_updated_at = (
+        yield lambda database: database.get_user_projects_version(user_id, **page)
+    )
+    if query_string:
+        version = sha1(version.encode() + query_string).hexdigest()
+    if if_none_match.contains(version):
+        return Reply(304, etag=version, last_modified=last_updated_at)
+
+    projects = yield lambda database: database.get_user_projects(
+        user_id,
+        **page,
+        with_allowed_users=fields is None or "allowed_users" in fields,
+    )
+    next_cursor = None
+    if limit is not None and len(projects) == limit:
+        next_cursor = encode_cursor(projects[-1])
+    # Members shared by several projects are serialized once
+    users: dict[int, dict[str, Any]] = {}
+    projects = [p.to_dict(fields, users) for p in projects]
+
+    reply = json_reply(True, {"projects": projects, "next_cursor": next_cursor})
+    reply.etag, reply.last_modified = version, last_updated_at
+    return reply
+
+
+def search_projects(args: Mapping[str, str], user_id: int) -> Route:
+    """
+    Searches the user's projects by their name, description and language, the best matches first
+    (see `Database.search_projects`). Accepts the query parameters:
+        q: The text to search for, the projects must contain all its words (the last one may be partial).
+        limit: The maximum amount of results (up to `SERVER.MAX_PAGE_SIZE`), `SERVER.SEARCH_LIMIT` if omitted.
+        fields: A comma-separated list of the project fields to return, e.g. "project_id,name".
+    """
+    limit = args.get("limit")
+    fields = args.get("fields")
+    try:
+        terms = parse_search_terms(args.get("q", ""))
+        limit = parse_limit(limit) if limit is not None else None
+        fields = parse_fields(fields) if fields is not None else None
+    except ValueError as e:
+        return json_reply(False, {"error": str(e)}, 400)
+
+    projects = yield lambda database: database.search_projects(
+        user_id,
+        terms,
+        limit or SERVER.SEARCH_LIMIT,
+        with_allowed_users=fields is None or "allowed_users" in fields,
+    )
+    # Members shared by several projects are serialized once
+    users: dict[int, dict[str, Any]] = {}
+    projects = [p.to_dict(fields, users) for p in projects]
+    return json_reply(True, {"projects": projects})
+
+
+def create_project(data: Any, user_id: int) -> Route:
+    if not isinstance(data, dict) or not data:
+        return json_reply(False, {"error": "Invalid request"}, 400)
+    name = data.get("name")
+    description = data.get("description")
+    language = data.get("language")
+    if name and description and language:
+        project = yield lambda database: database.add_project(
+            name, description, language, user_id
+        )
+
+        if project:
+            return json_reply(True, project.to_dict())
+
+    return json_reply(False, {"error": "Failed to create project"})
+
+
+def delete_project(project_id: str, user_id: int) -> Route:
+    project = yield from _accessible_project(project_id, user_id)
+    if isinstance(project, Reply):
+        return project
+
+    yield lambda database: database.delete_from(
+        Project, Project.project_id == project_id
+    )
+    return json_reply(True, {})
+
+
+def project(project_id: str, if_none_match: ETags, user_id: int) -> Route:
+    version = yield lambda database: database.get_project_version(project_id, user_id)
+    if version:
+        revision, last_updated_at = version
+        etag = f"{project_id}-{revision}"
+        if if_none_match.contains(etag):
+            return Reply(304, etag=etag, last_modified=last_updated_at)
+
+    project = yield from _accessible_project(project_id, user_id)
+    if isinstance(project, Reply):
+        return project
+
+    reply = json_reply(True, project.to_dict())
+    reply.etag = f"{project.project_id}-{project.revision}"
+    reply.last_modified = project.last_updated_at
+    return reply
+
+
+def project_access(project_id: str, user_id: int) -> Route:
+    """
+    A lightweight access check used by the realtime servers on every websocket handshake.
+    Responds with an empty 204 if the user may access the project, and an empty 403 otherwise.
+    """
+    allowed = yield lambda database: database.has_project_access(project_id, user_id)
+    return Reply(204 if allowed else 403)
+
+
+def add_user(data: Any, project_id: str, user_id: int) -> Route:
+    if not isinstance(data, dict) or not data:
+        return json_reply(False, {"error": "Invalid request"}, 400)
+    email = data.get("email")
+    if not _strings_or_missing(email):
+        return json_reply(False, {"error": "Invalid request"}, 400)
+    if email:
+        project = yield from _accessible_project(project_id, user_id)
+        if isinstance(project, Reply):
+            return project
+
+        user = yield lambda database: database.get_user_by_email(email)
+        if not user:
+            return json_reply(False, {"error": "User not found"}, 404)
+
+        # Add user to project
+        yield lambda database: database.add_allowed_user(project.id, user.id)
+
+        return json_reply(True, project.to_dict())
+
+    return json_reply(False, {"error": "Failed to add user"})
+
+
+def remove_user(data: Any, project_id: str, user_id: int) -> Route:
+    if not isinstance(data, dict) or not data:
+        return json_reply(False, {"error": "Invalid request"}, 400)
+    email = data.get("email")
+    if not _strings_or_missing(email):
+        return json_reply(False, {"error": "Invalid request"}, 400)
+    if email:
+        project = yield from _accessible_project(project_id, user_id)
+        if isinstance(project, Reply):
+            return project
+
+        user = yield lambda database: database.get_user_by_email(email)
+        if not user:
+            return json_reply(False, {"error": "User not found"}, 404)
+
+        # Remove user from project
+        yield lambda database: database.remove_allowed_user(project.id, user.id)
+
+        return json_reply(True, project.to_dict())
+
+    return json_reply(False, {"error": "Failed to remove user"})
+
+
+def add_users(data: Any, project_id: str, user_id: int) -> Route:
+    """
+    Adds many users to a project at once, e.g. {"emails": ["a@example.com", "b@example.com"]}.
+    Responds with the result for each email (see `Database.add_allowed_users`).
+    """
+    emails = parse_emails(data)
+    if emails is None:
+        return json_reply(False, {"error": "Invalid request"}, 400)
+
+    project = yield from _accessible_project(project_id, user_id, members=False)
+    if isinstance(project, Reply):
+        return project
+
+    results = yield lambda database: database.add_allowed_users(project.id, emails)
+    return json_reply(True, {"results": results})
+
+
+def remove_users(data: Any, project_id: str, user_id: int) -> Route:
+    """
+    Removes many users from a project at once, e.g. {"emails": ["a@example.com", "b@example.com"]}.
+    Responds with the result for each email (see `Database.remove_allowed_users`).
+    """
+    emails = parse_emails(data)
+    if emails is None:
+        return json_reply(False, {"error": "Invalid request"}, 400)
+
+    project = yield from _accessible_project(project_id, user_id, members=False)
+    if isinstance(project, Reply):
+        return project
+
+    results = yield lambda database: database.remove_allowed_users(project.id, emails)
+    return json_reply(True, {"results": results})
+
+
+def project_files(project_id: str, user_id: int) -> Route:
+    """
+    Lists the files of a project, ordered by their names.
+    """
+    project = yield from _accessible_project(project_id, user_id, members=False)
+    if isinstance(project, Reply):
+        return project
+
+    files = yield lambda database: database.get_project_files(project.id)
+    return json_reply(True, {"files": [file.to_dict() for file in files]})
+
+
+def create_file(data: Any, project_id: str, user_id: int) -> Route:
+    """
+    Adds a file to a project, e.g. {"name": "main.py"}.
+    Responds with the file, or a 409 if the project already has a file with that name.
+    """
+    name = parse_file_name(data.get("name") if isinstance(data, dict) else None)
+    if name is None:
+        return json_reply(False, {"error": "Invalid request"}, 400)
+
+    project = yield from _accessible_project(project_id, user_id, members=False)
+    if isinstance(project, Reply):
+        return project
+
+    file = yield lambda database: database.add_project_file(project.id, name)
+    if not file:
+        return json_reply(False, {"error": "File already exists"}, 409)
+    return json_reply(True, file.to_dict())
+
+
+def delete_file(project_id: str, name: str, user_id: int) -> Route:
+    project = yield from _accessible_project(project_id, user_id, members=False)
+    if isinstance(project, Reply):
+        return project
+
+    if not (yield lambda database: database.remove_project_file(project.id, name)):
+        return json_reply(False, {"error": "File not found"}, 404)
+    return json_reply(True, {})
+
+
+def autocomplete_users(args: Mapping[str, str]) -> Route:
+    """
+    Finds the users whose username or email start with `q` (case-insensitively), e.g. for adding members to a project.
+    Accepts an optional `limit` (up to `SERVER.AUTOCOMPLETE_LIMIT`, which is the default).
+    Responds with {"users": [...]} ordered by username, which clients may cache for `DATABASE.USER_DIRECTORY_CACHE_TTL`.
+    """
+    try:
+        prefix = parse_autocomplete_prefix(args.get("q", ""))
+        limit = parse_autocomplete_limit(args.get("limit"))
+    except ValueError as e:
+        return json_reply(False, {"error": str(e)}, 400)
+
+    users = yield lambda database: database.search_users(prefix, limit)
+    reply = json_reply(True, {"users": users})
+    reply.max_age = int(DATABASE.USER_DIRECTORY_CACHE_TTL.total_seconds())
+    return reply
+
+
+def user(user_id: int) -> Route:
+    user = yield lambda database: database.select_from(User, User.id == user_id)
+    if not user:
+        return json_reply(False, {"error": "User not found"}, 404)
+    return json_reply(True, user.to_dict())
+
+
+def _accessible_project(
+    project_id: str, user_id: int, members: bool = True
+) -> Generator[Operation, Any, Project | Reply]:
+    # Gets a project the user may access, or the error reply if it doesn't exist or they may not.
+    # Its allowed users are loaded along with it, unless `members` is False.
+    if members:
+        project = yield lambda database: database.get_project(project_id)
+    else:
+        project = yield lambda database: database.select_from(
+            Project, Project.project_id == project_id
+        )
+    if not project:
+        return json_reply(False, {"error": "Project not found"}, 404)
+
+    # Check if user has access to the project
+    if not (yield lambda database: database.has_project_access(project_id, user_id)):
+        return json_reply(False, {"error": "Access denied"}, 403)
+    return project
+
+
+def _strings_or_missing(*values: Any) -> bool:
+    # Whether the fields of a JSON body are strings, the missing (None) ones are checked by the routes
+    return all(value is None or isinstance(value, str) for value in values)
+
+
+def _is_internal(secret: str | None) -> bool:
+    # Whether a request to an /internal route comes from the realtime servers, in constant time
+    if not SERVER.INTERNAL_SECRET or secret is None:
+        return False
+    return hmac.compare_digest(secret.encode(), SERVER.INTERNAL_SECRET.encode())
+
+
+def parse_limit(limit: str) -> int:
+    if not limit.isdigit() or not 1 <= int(limit) <= SERVER.MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {SERVER.MAX_PAGE_SIZE}")
+    return int(limit)
+
+
+def parse_fields(fields: str) -> list[str]:
+    fields_list = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in fields_list if field not in Project.FIELDS]
+    if not fields_list or unknown:
+        raise ValueError(f"fields must be a subset of {', '.join(Project.FIELDS)}")
+    return fields_list
+
+
+def parse_search_terms(text: str) -> list[str]:
+    """
+    Splits a search text into its words, without duplicates. Punctuation separates words, like in the FTS5 index.
+    """
+    terms = list(dict.fromkeys(re.findall(r"[^\W_]+", text)))
+    if not terms:
+        raise ValueError("q must contain at least one word")
+    if len(terms) > SERVER.MAX_SEARCH_TERMS:
+        raise ValueError(f"q must contain at most {SERVER.MAX_SEARCH_TERMS} words")
+    return terms
+
+
+def parse_autocomplete_prefix(prefix: str) -> str:
+    prefix = prefix.strip()
+    if not 1 <= len(prefix) <= SERVER.MAX_AUTOCOMPLETE_LENGTH:
+        raise ValueError(
+            f"q must have between 1 and {SERVER.MAX_AUTOCOMPLETE_LENGTH} characters"
+        )
+    return prefix
+
+
+def parse_autocomplete_limit(limit: str | None) -> int:
+    if limit is None:
+        return SERVER.AUTOCOMPLETE_LIMIT
+    if not limit.isdigit() or not 1 <= int(limit) <= SERVER.AUTOCOMPLETE_LIMIT:
+        raise ValueError(f"limit must be between 1 and {SERVER.AUTOCOMPLETE_LIMIT}")
+    return int(limit)
+
+
+def parse_emails(data: Any) -> list[str] | None:
+    """
+    Gets the emails of a bulk request's body, without duplicates.
+    Returns None if the body isn't {"emails": [...]} with 1 to `SERVER.MAX_BULK_SIZE` strings.
+    """
+    if not isinstance(data, dict):
+        return None
+    emails = data.get("emails")
+    if not isinstance(emails, list) or not all(
+        isinstance(email, str) and email for email in emails
+    ):
+        return None
+    emails = list(dict.fromkeys(emails))
+    if not 1 <= len(emails) <= SERVER.MAX_BULK_SIZE:
+        return None
+    return emails
+
+
+def parse_pairs(data: Any) -> list[tuple[str, str]] | None:
+    """
+    Gets the (session id, project id) pairs of an authorization request's body, without duplicates.
+    Returns None if the body isn't {"pairs": [{"session_id": ..., "project_id": ...}, ...]}
+    with 1 to `SERVER.MAX_AUTHORIZATION_BATCH` pairs of strings.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("pairs"), list):
+        return None
+    pairs = []
+    for pair in data["pairs"]:
+        if not isinstance(pair, dict):
+            return None
+        session_id, project_id = pair.get("session_id"), pair.get("project_id")
+        if not isinstance(session_id, str) or not isinstance(project_id, str):
+            return None
+        pairs.append((session_id, project_id))
+    pairs = list(dict.fromkeys(pairs))
+    if not 1 <= len(pairs) <= SERVER.MAX_AUTHORIZATION_BATCH:
+        return None
+    return pairs
+
+
+def parse_file_name(name: Any) -> str | None:
+    """
+    Checks the name of a file, which the realtime servers use as the last part of the file's document name.
+    Returns None if it isn't a string of 1 to `SERVER.MAX_FILE_NAME_LENGTH` characters without a "/", or "." or "..".
+    """
+    if not isinstance(name, str) or not 1 <= len(name) <= SERVER.MAX_FILE_NAME_LENGTH:
+        return None
+    if "/" in name or name in (".", ".."):
+        return None
+    return name
+
+
+def parse_files(data: Any) -> list[tuple[str, str]] | None:
+    """
+    Gets the (project id, file name) pairs of a files import request's body, without duplicates.
+    Returns None if the body isn't {"files": [{"project_id": ..., "name": ...}, ...]}
+    with 1 to `SERVER.MAX_FILE_IMPORT_BATCH` files with valid names (see `parse_file_name`).
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("files"), list):
+        return None
+    files = []
+    for file in data["files"]:
+        if not isinstance(file, dict):
+            return None
+        project_id = file.get("project_id")
+        name = parse_file_name(file.get("name"))
+        if not isinstance(project_id, str) or name is None:
+            return None
+        files.append((project_id, name))
+    files = list(dict.fromkeys(files))
+    if not 1 <= len(files) <= SERVER.MAX_FILE_IMPORT_BATCH:
+        return None
+    return files
+
+
+def encode_cursor(project: Project) -> str:
+    """
+    Encodes the position of a project in the projects list as an opaque pagination cursor.
+    """
+    position = f"{project.created_at.isoformat()}|{project.id}"
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime.datetime, int]:
+    """
+    Decodes a cursor created by `encode_cursor` back into a (created_at, id) position.
+    """
+    try:
+        created_at, id = base64.urlsafe_b64decode(cursor).decode().split("|")
+        return datetime.datetime.fromisoformat(created_at), int(id)
+    except ValueError:
+        raise ValueError("Invalid cursor")
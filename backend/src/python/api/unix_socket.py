@@ -0,0 +1,105 @@
+import errno
+import os
+import socket
+import stat
+
+from utils import SERVER
+
+
+class UnixSocketListener:
+    """
+    A listening Unix domain socket the API is served on, instead of a TCP port (see `SERVER.UNIX_SOCKET`),
+    so the proxies on the same machine (nginx and the realtime server) skip the TCP stack.
+
+    The socket is bound by the process that starts the server and handed to it as a file descriptor,
+    because werkzeug, gunicorn and hypercorn all remove whatever is at the path first - even the socket of a running server.
+    Here a socket left behind is only removed if nothing accepts connections on it anymore.
+    It's created with `SERVER.UNIX_SOCKET_MODE` permissions from the start, and removed when the listener is closed.
+
+    Usage::
+
+        with UnixSocketListener(SERVER.UNIX_SOCKET) as listener:
+            serve(bind=listener.bind())
+    """
+
+    def __init__(self, path: str, mode: int = SERVER.UNIX_SOCKET_MODE) -> None:
+        """
+        Args:
+            path: The path of the socket. Its directory must exist.
+            mode: The permissions of the socket, connecting requires write permission.
+
+        Raises:
+            OSError: If another server listens on the path (EADDRINUSE), or it isn't a socket (EEXIST).
+        """
+        self.path = os.path.abspath(path)
+        self.__remove_stale(self.path)
+
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # The socket is created by bind, with the umask's permissions - none for others until the chmod
+        umask = os.umask(0o177)
+        try:
+            self.socket.bind(self.path)
+        except OSError:
+            self.socket.close()
+            raise
+        finally:
+            os.umask(umask)
+        os.chmod(self.path, mode)
+        self.socket.listen(socket.SOMAXCONN)
+        self.socket.set_inheritable(True)
+        # Identifies the file, so it's not removed after another server replaced it
+        self.__inode = os.stat(self.path).st_ino
+
+    def fileno(self) -> int:
+        return self.socket.fileno()
+
+    def bind(self) -> str:
+        """
+        Returns the bind address of a duplicate of the socket's descriptor (`fd://<fd>`), for gunicorn and hypercorn,
+        which take over the descriptors they're given and close them.
+        """
+        return f"fd://{os.dup(self.fileno())}"
+
+    def close(self) -> None:
+        """
+        Closes the socket and removes it, unless it was already removed or replaced.
+        """
+        self.socket.close()
+        try:
+            if os.stat(self.path).st_ino == self.__inode:
+                os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "UnixSocketListener":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    @staticmethod
+    def __remove_stale(path: str) -> None:
+        """
+        Removes the socket at a path if it was left behind by a server that didn't shut down cleanly.
+        """
+        try:
+            mode = os.stat(path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise OSError(errno.EEXIST, "Not a socket", path)
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            probe.settimeout(1.0)
+            try:
+                probe.connect(path)
+            except ConnectionRefusedError:
+                # Nothing listens on it anymore
+                os.unlink(path)
+                print(f"[unix-socket] Removed the stale socket {path}")
+                return
+            except FileNotFoundError:
+                return
+            except (BlockingIOError, TimeoutError):
+                pass  # Its backlog is full, but it's still listening
+        raise OSError(errno.EADDRINUSE, "Another server listens on the socket", path)
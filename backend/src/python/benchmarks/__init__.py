@@ -0,0 +1,6 @@
+"""
+Benchmarks for the Python backend.
+They are run as modules from `backend/src/python`, e.g.::
+
+    python -m benchmarks.password_hashing
+"""
@@ -0,0 +1,375 @@
+"""
+Shared pieces of the benchmarks that drive the API over HTTP:
+booting `ApiServer` (or `AsyncApiServer`) against a temporary SQLite database, seeding it, and measuring concurrent clients.
+"""
+
+import asyncio
+import http.client
+import json
+import logging
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from typing import Any, Callable
+
+from werkzeug.serving import make_server
+
+from utils.const import DATABASE, SERVER
+
+PASSWORD = "benchmark-password"
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """
+    Gets a percentile of a sorted list of values.
+    """
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+@dataclass
+class Seed:
+    """
+    The rows created by `BenchServer.seed`.
+    """
+
+    emails: list[str]
+    user_ids: list[int]
+    project_ids: list[str]
+    # The projects each user is allowed to access, by user id
+    memberships: dict[int, list[str]]
+    # A valid session id of each user, by user id
+    sessions: dict[int, str]
+
+
+class BenchServer:
+    """
+    Runs `ApiServer` (or `AsyncApiServer`) on a local port, in a background thread, against a temporary SQLite database.
+
+    Note:
+        The database settings in `DATABASE` are overridden, so it must be created before anything uses `Database`.
+    """
+
+    def __init__(self, db_path: str | None = None, asynchronous: bool = False) -> None:
+        """
+        Args:
+            db_path: The path of the SQLite database, a new temporary file if None.
+            asynchronous: Whether to serve `AsyncApiServer` with hypercorn, rather than `ApiServer` with werkzeug.
+        """
+        self.directory = tempfile.mkdtemp(prefix="collab-ide-bench-")
+        self.db_path = db_path or os.path.join(self.directory, "bench.db")
+        DATABASE.DB_PATH = self.db_path
+        DATABASE.URL = "sqlite:///" + self.db_path
+        SERVER.SLOW_REQUEST_THRESHOLD = None
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+        self.asynchronous = asynchronous
+        if asynchronous:
+            from api.async_api_server import AsyncApiServer
+
+            self.api_server = AsyncApiServer()
+            self.database = self.api_server.database.database
+        else:
+            from api import ApiServer
+
+            self.api_server = ApiServer()
+            self.database = self.api_server.database
+        self.unix_socket: str | None = None
+        self.__stops: list[Callable[[], None]] = []
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        """
+        Starts serving on the given address, an ephemeral port by default.
+        """
+        self.host = host
+        if self.asynchronous:
+            self.port = port or self.__free_port(host)
+            self.__start_hypercorn()
+        else:
+            server = make_server(host, port, self.api_server.app, threaded=True)
+            self.port = server.server_port
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self.__stops.append(server.shutdown)
+
+    def start_unix(self, path: str | None = None) -> None:
+        """
+        Starts serving on a Unix domain socket too (see `UnixSocketListener`), in the temporary directory by default.
+        """
+        from api.unix_socket import UnixSocketListener
+
+        listener = UnixSocketListener(path or os.path.join(self.directory, "api.sock"))
+        self.unix_socket = listener.path
+        if self.asynchronous:
+            self.__start_hypercorn(listener.bind())
+        else:
+            server = make_server(
+                f"unix://{listener.path}",
+                0,
+                self.api_server.app,
+                threaded=True,
+                fd=listener.fileno(),
+            )
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self.__stops.append(server.shutdown)
+        self.__stops.append(listener.close)
+
+    def stop(self) -> None:
+        for stop in self.__stops:
+            stop()
+        self.database.close()
+
+    def __start_hypercorn(self, bind: str | None = None) -> None:
+        from hypercorn.asyncio import serve
+        from hypercorn.config import Config
+
+        config = Config()
+        config.bind = [bind or f"{self.host}:{self.port}"]
+        config.errorlog = None
+        loop = asyncio.new_event_loop()
+        shutdown = asyncio.Event()
+        thread = threading.Thread(
+            target=loop.run_until_complete,
+            args=(serve(self.api_server.app, config, shutdown_trigger=shutdown.wait),),
+            daemon=True,
+        )
+        thread.start()
+
+        def stop() -> None:
+            loop.call_soon_threadsafe(shutdown.set)
+            thread.join()
+
+        self.__stops.append(stop)
+        # Wait for the server to listen
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                if bind:
+                    connection = UnixHTTPConnection(self.unix_socket, timeout=1)
+                    connection.connect()
+                    connection.close()
+                else:
+                    socket.create_connection((self.host, self.port), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+
+    @staticmethod
+    def __free_port(host: str) -> int:
+        with socket.socket() as s:
+            s.bind((host, 0))
+            return s.getsockname()[1]
+
+    def seed(self, users: int, projects: int, members: int) -> Seed:
+        """
+        Fills the database with users, projects and memberships, and gives every user a session
+        (a `Session` row, or a signed token in the "signed" `DATABASE.SESSION_MODE`).
+        The rows are inserted directly (not through the API), with one password hash shared by all the users.
+
+        Args:
+            users: The amount of users.
+            projects: The amount of projects.
+            members: The amount of allowed users of each project.
+
+        Returns:
+            The created rows.
+        """
+        from database.database import AllowedUsers, Project, Session, User
+
+        hashed = self.database.password_hasher.hash(PASSWORD)
+        rng = random.Random(0)
+        emails = [f"user{i}@example.com" for i in range(users)]
+        with self.database.engine.begin() as connection:
+            connection.execute(
+                User.__table__.insert(),
+                [
+                    {"username": f"user{i}", "email": email, "password": hashed}
+                    for i, email in enumerate(emails)
+                ],
+            )
+            user_ids = [row[0] for row in connection.execute(User.__table__.select())]
+
+            project_ids = [f"{i:032x}" for i in range(projects)]
+            connection.execute(
+                Project.__table__.insert(),
+                [
+                    {
+                        "project_id": project_id,
+                        "name": f"Project {i}",
+                        "description": "A project created by the benchmarks",
+                        "language": rng.choice(["python", "javascript", "c"]),
+                    }
+                    for i, project_id in enumerate(project_ids)
+                ],
+            )
+            ids = dict(
+                connection.execute(
+                    Project.__table__.select().with_only_columns(
+                        Project.project_id, Project.id
+                    )
+                ).all()
+            )
+
+            memberships: dict[int, list[str]] = {user_id: [] for user_id in user_ids}
+            rows = []
+            for project_id in project_ids:
+                for user_id in rng.sample(user_ids, min(members, len(user_ids))):
+                    memberships[user_id].append(project_id)
+                    rows.append({"user_id": user_id, "project_id": ids[project_id]})
+            connection.execute(AllowedUsers.insert(), rows)
+
+            tokens = self.database.session_tokens
+            if tokens is not None:
+                sessions = {user_id: tokens.issue(user_id) for user_id in user_ids}
+            else:
+                sessions = {user_id: os.urandom(16).hex() for user_id in user_ids}
+                connection.execute(
+                    Session.__table__.insert(),
+                    [
+                        {"session_id": session_id, "user_id": user_id}
+                        for user_id, session_id in sessions.items()
+                    ],
+                )
+
+        return Seed(emails, user_ids, project_ids, memberships, sessions)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """
+    An HTTP connection over a Unix domain socket, like the ones of nginx and the realtime server to `SERVER.UNIX_SOCKET`.
+    """
+
+    def __init__(self, path: str, timeout: float | None = None) -> None:
+        super().__init__("localhost")
+        self.socket_path = path
+        self.timeout = timeout
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class Client:
+    """
+    A keep-alive HTTP client of the API, used by a single benchmark thread.
+    """
+
+    def __init__(self, connect: Callable[[], http.client.HTTPConnection]) -> None:
+        self.__connect = connect
+        self.__connection = connect()
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        session_id: str | None = None,
+        body: dict[str, Any] | None = None,
+    ) -> tuple[int, bytes]:
+        """
+        Sends a request and reads the whole response.
+
+        Returns:
+            The status code and the body of the response.
+        """
+        headers = {}
+        if session_id:
+            headers["Cookie"] = f"session_id={session_id}"
+        data = None
+        if body is not None:
+            data = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+
+        try:
+            self.__connection.request(method, path, body=data, headers=headers)
+            response = self.__connection.getresponse()
+        except (http.client.HTTPException, ConnectionError):
+            # The server closed the keep-alive connection, retry once on a new one
+            self.__connection.close()
+            self.__connection = self.__connect()
+            self.__connection.request(method, path, body=data, headers=headers)
+            response = self.__connection.getresponse()
+        return response.status, response.read()
+
+    def close(self) -> None:
+        self.__connection.close()
+
+
+@dataclass
+class Result:
+    """
+    The measurements of a benchmark scenario.
+    """
+
+    scenario: str
+    requests: int
+    errors: int
+    seconds: float
+    latencies: list[float] = field(repr=False)
+
+    def to_dict(self) -> dict[str, Any]:
+        latencies = sorted(self.latencies)
+        return {
+            "scenario": self.scenario,
+            "requests": self.requests,
+            "errors": self.errors,
+            "requests_per_second": self.requests / self.seconds,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "max_ms": latencies[-1] * 1000,
+        }
+
+
+def measure(
+    scenario: str,
+    operation: Callable[[Client, random.Random], bool],
+    connect: Callable[[], http.client.HTTPConnection],
+    requests: int,
+    concurrency: int,
+) -> Result:
+    """
+    Runs an operation many times from concurrent clients.
+
+    Args:
+        scenario: The name of the scenario.
+        operation: Sends one request with the given client, and returns whether it succeeded.
+        connect: Opens a connection to the server.
+        requests: The total amount of operations.
+        concurrency: The amount of clients running at the same time.
+
+    Returns:
+        The measurements.
+    """
+    per_client = [
+        requests // concurrency + (i < requests % concurrency)
+        for i in range(concurrency)
+    ]
+
+    def run_client(index: int) -> tuple[list[float], int]:
+        client = Client(connect)
+        rng = random.Random(index)
+        latencies, errors = [], 0
+        try:
+            for _ in range(per_client[index]):
+                start = time.perf_counter()
+                ok = operation(client, rng)
+                latencies.append(time.perf_counter() - start)
+                errors += not ok
+        finally:
+            client.close()
+        return latencies, errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(run_client, range(concurrency)))
+    seconds = time.perf_counter() - start
+
+    latencies = [latency for client, _ in results for latency in client]
+    errors = sum(errors for _, errors in results)
+    return Result(scenario, len(latencies), errors, seconds, latencies)
@@ -0,0 +1,99 @@
+"""
+Measures how fast the list-projects payload is serialized into a response,
+with Flask's default JSON provider and with `FastJSONProvider`.
+
+The projects are built in memory (no database), each with a few allowed users drawn from a shared pool,
+and serialized like the `/api/projects` route does: `Project.to_dict` followed by `ApiServer.json_response`.
+
+Usage::
+
+    python -m benchmarks.json_response [--sizes 10 100 1000] [--members 5] [--repeat 50] [--json]
+"""
+
+import argparse
+import datetime
+import json
+import random
+import time
+
+import flask
+from flask.json.provider import DefaultJSONProvider
+
+from database import Project, User
+
+from api.json_provider import FastJSONProvider
+
+PROVIDERS = {"default": DefaultJSONProvider, "fast": FastJSONProvider}
+
+
+def build_projects(count: int, members: int) -> list[Project]:
+    users = [
+        User(id=i, username=f"user{i}", email=f"user{i}@example.com", password="")
+        for i in range(max(members * 4, 20))
+    ]
+    now = datetime.datetime.now()
+    return [
+        Project(
+            id=i,
+            project_id=f"{i:032x}",
+            name=f"Project {i}",
+            description="A project used for benchmarking the JSON responses",
+            language="python",
+            created_at=now,
+            allowed_users=random.sample(users, members),
+        )
+        for i in range(count)
+    ]
+
+
+def run(provider: str, count: int, members: int, repeat: int) -> dict:
+    app = flask.Flask(__name__)
+    app.json = PROVIDERS[provider](app)
+    projects = build_projects(count, members)
+
+    latencies = []
+    size = 0
+    with app.app_context():
+        for _ in range(repeat):
+            start = time.perf_counter()
+            users: dict[int, dict] = {}
+            data = {"projects": [p.to_dict(users=users) for p in projects]}
+            response = flask.jsonify({"success": True, "data": data})
+            size = len(response.get_data())
+            latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    total = sum(latencies)
+    return {
+        "provider": provider,
+        "projects": count,
+        "bytes": size,
+        "bytes_per_second": size * repeat / total,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--members", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--json", action="store_true", help="Print JSON lines")
+    args = parser.parse_args()
+
+    for count in args.sizes:
+        for provider in PROVIDERS:
+            result = run(provider, count, args.members, args.repeat)
+            if args.json:
+                print(json.dumps(result))
+            else:
+                print(
+                    f"{count:>5} projects, {provider:>7}: {result['bytes']:>8} bytes, "
+                    f"{result['bytes_per_second'] / 2**20:7.1f} MiB/s, "
+                    f"p50 {result['p50_ms']:7.2f} ms, max {result['max_ms']:7.2f} ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Load-tests the API over HTTP with realistic mixes of requests.
+
+`ApiServer` is booted on a local port against a temporary SQLite database seeded with users, projects and memberships,
+and concurrent keep-alive clients drive each scenario:
+
+- login: a storm of `POST /api/login` (password hashing bound)
+- access: `GET /api/projects/<id>/access`, the check made by the websocket server on every handshake
+- authorize: `POST /internal/authorize` with `--batch` pairs, the checks of a room that reconnects at once
+- list: `GET /api/projects`, the first page of the caller's projects
+- churn: `POST /api/projects/<id>/addUser` followed by `removeUser`, the membership writes
+- autocomplete: `GET /api/users/autocomplete` with the first letters of an email, as they're typed in the add-member form
+- mixed: all of the above, weighted like a busy editor
+
+`--server async` runs the same scenarios against `AsyncApiServer` (served by hypercorn) instead,
+and `--session-mode signed` authenticates with signed session tokens rather than `Session` rows.
+
+Usage::
+
+    python -m benchmarks.load_test [--users 200] [--projects 1000] [--members 5] [--requests 2000]
+        [--concurrency 8] [--batch 100] [--scenarios access list ...] [--scrypt-n 16384] [--server sync] [--session-mode database] [--json]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+from urllib.parse import quote
+
+from typing import Callable
+
+from utils.const import DATABASE
+
+from benchmarks.harness import PASSWORD, BenchServer, Client, Seed, measure
+
+# The share of each scenario in the "mixed" one
+MIX = {"login": 0.02, "access": 0.6, "list": 0.3, "churn": 0.08}
+
+
+def build_scenarios(
+    seed: Seed, batch: int
+) -> dict[str, Callable[[Client, random.Random], bool]]:
+    """
+    Builds the operations of every scenario.
+
+    Args:
+        seed: The rows the database was seeded with.
+        batch: The amount of pairs in an authorize request.
+
+    Returns:
+        The operations by scenario name, each sends one request (two for churn) and returns whether it succeeded.
+    """
+    members = [user_id for user_id in seed.user_ids if seed.memberships[user_id]]
+
+    def login(client: Client, rng: random.Random) -> bool:
+        email = rng.choice(seed.emails)
+        status, body = client.request(
+            "POST", "/api/login", body={"email": email, "password": PASSWORD}
+        )
+        return status == 200 and json.loads(body)["success"]
+
+    def access(client: Client, rng: random.Random) -> bool:
+        user_id = rng.choice(members)
+        project_id = rng.choice(seed.memberships[user_id])
+        status, _ = client.request(
+            "GET", f"/api/projects/{project_id}/access", seed.sessions[user_id]
+        )
+        return status == 204
+
+    def authorize(client: Client, rng: random.Random) -> bool:
+        pairs = []
+        for user_id in rng.choices(members, k=batch):
+            project_id = rng.choice(seed.memberships[user_id])
+            pairs.append(
+                {"session_id": seed.sessions[user_id], "project_id": project_id}
+            )
+        status, body = client.request(
+            "POST", "/internal/authorize", body={"pairs": pairs}
+        )
+        verdicts = json.loads(body)["data"]["verdicts"] if status == 200 else {}
+        return all(
+            verdicts.get(pair["session_id"], {}).get(pair["project_id"])
+            for pair in pairs
+        )
+
+    def list_projects(client: Client, rng: random.Random) -> bool:
+        user_id = rng.choice(seed.user_ids)
+        status, _ = client.request("GET", "/api/projects", seed.sessions[user_id])
+        return status == 200
+
+    def churn(client: Client, rng: random.Random) -> bool:
+        user_id = rng.choice(members)
+        project_id = rng.choice(seed.memberships[user_id])
+        session_id = seed.sessions[user_id]
+        # A user outside of the seeded memberships, so removing them doesn't affect the other scenarios
+        email = f"churn{rng.randrange(len(seed.emails))}@example.com"
+        added, _ = client.request(
+            "POST", f"/api/projects/{project_id}/addUser", session_id, {"email": email}
+        )
+        removed, _ = client.request(
+            "POST",
+            f"/api/projects/{project_id}/removeUser",
+            session_id,
+            {"email": email},
+        )
+        return added == removed == 200
+
+    def autocomplete(client: Client, rng: random.Random) -> bool:
+        user_id = rng.choice(seed.user_ids)
+        prefix = rng.choice(seed.emails)[: rng.randint(1, 8)]
+        status, _ = client.request(
+            "GET",
+            f"/api/users/autocomplete?q={quote(prefix)}",
+            seed.sessions[user_id],
+        )
+        return status == 200
+
+    scenarios = {
+        "login": login,
+        "access": access,
+        "authorize": authorize,
+        "list": list_projects,
+        "churn": churn,
+        "autocomplete": autocomplete,
+    }
+    names, weights = list(MIX), list(MIX.values())
+
+    def mixed(client: Client, rng: random.Random) -> bool:
+        return scenarios[rng.choices(names, weights)[0]](client, rng)
+
+    scenarios["mixed"] = mixed
+    return scenarios
+
+
+def seed_churn_users(server: BenchServer, count: int) -> None:
+    """
+    Registers the users the churn scenario adds to and removes from projects.
+    """
+    from database.database import User
+
+    with server.database.engine.begin() as connection:
+        connection.execute(
+            User.__table__.insert(),
+            [
+                {
+                    "username": f"churn{i}",
+                    "email": f"churn{i}@example.com",
+                    "password": "",
+                }
+                for i in range(count)
+            ],
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--projects", type=int, default=1000)
+    parser.add_argument("--members", type=int, default=5, help="Users per project")
+    parser.add_argument("--requests", type=int, default=2000, help="Per scenario")
+    parser.add_argument("--login-requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=100, help="Pairs per authorize")
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        choices=[
+            "login",
+            "access",
+            "authorize",
+            "list",
+            "churn",
+            "autocomplete",
+            "mixed",
+        ],
+        default=["login", "access", "list", "churn", "mixed"],
+    )
+    parser.add_argument("--scrypt-n", type=int, default=DATABASE.SCRYPT_N)
+    parser.add_argument("--server", choices=["sync", "async"], default="sync")
+    parser.add_argument(
+        "--session-mode", choices=["database", "signed"], default="database"
+    )
+    parser.add_argument("--json", action="store_true", help="Print JSON lines")
+    args = parser.parse_args()
+
+    DATABASE.SCRYPT_N = args.scrypt_n
+    DATABASE.SESSION_MODE = args.session_mode
+    DATABASE.SESSION_SECRET = DATABASE.SESSION_SECRET or os.urandom(32).hex()
+    server = BenchServer(asynchronous=args.server == "async")
+    try:
+        seed = server.seed(args.users, args.projects, args.members)
+        seed_churn_users(server, args.users)
+        server.start()
+        scenarios = build_scenarios(seed, args.batch)
+
+        def connect() -> http.client.HTTPConnection:
+            return http.client.HTTPConnection(server.host, server.port)
+
+        for name in args.scenarios:
+            requests = args.login_requests if name == "login" else args.requests
+            result = measure(
+                name, scenarios[name], connect, requests, args.concurrency
+            ).to_dict()
+            result.update(
+                server=args.server,
+                session_mode=args.session_mode,
+                users=args.users,
+                projects=args.projects,
+                members=args.members,
+                concurrency=args.concurrency,
+            )
+            if args.json:
+                print(json.dumps(result))
+            else:
+                print(
+                    f"{name:>8}: {result['requests_per_second']:8.1f} req/s, "
+                    f"p50 {result['p50_ms']:7.1f} ms, p99 {result['p99_ms']:7.1f} ms, "
+                    f"{result['errors']} errors"
+                )
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
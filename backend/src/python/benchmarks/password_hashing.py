@@ -0,0 +1,78 @@
+"""
+Measures how many logins per second each password hashing cost setting allows.
+
+Every login verifies a password (see `PasswordHasher.verify`), issued from several request threads at once,
+while the amount of passwords hashed at the same time is bounded by the hasher's workers - like in the API.
+
+Usage::
+
+    python -m benchmarks.password_hashing [--logins 50] [--concurrency 8] [--workers 2] [--json]
+"""
+
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.const import DATABASE
+
+from database.passwords import PasswordHasher
+from benchmarks.harness import percentile
+
+SETTINGS: list[dict] = [
+    {"algorithm": "scrypt", "scrypt_n": 2**12},
+    {"algorithm": "scrypt", "scrypt_n": 2**13},
+    {"algorithm": "scrypt", "scrypt_n": 2**14},
+    {"algorithm": "scrypt", "scrypt_n": 2**15},
+    {"algorithm": "pbkdf2_sha256", "pbkdf2_iterations": 100_000},
+    {"algorithm": "pbkdf2_sha256", "pbkdf2_iterations": 300_000},
+    {"algorithm": "pbkdf2_sha256", "pbkdf2_iterations": 600_000},
+]
+
+
+def run(setting: dict, logins: int, concurrency: int, workers: int) -> dict:
+    hasher = PasswordHasher(**setting, workers=workers)
+    hashed = hasher.hash("correct horse battery staple")
+
+    def login(_) -> float:
+        start = time.perf_counter()
+        hasher.verify("correct horse battery staple", hashed)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as requests:
+        latencies = sorted(requests.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        **setting,
+        "logins": logins,
+        "logins_per_second": logins / elapsed,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=DATABASE.PASSWORD_HASH_WORKERS)
+    parser.add_argument("--json", action="store_true", help="Print JSON lines")
+    args = parser.parse_args()
+
+    for setting in SETTINGS:
+        result = run(setting, args.logins, args.concurrency, args.workers)
+        if args.json:
+            print(json.dumps(result))
+        else:
+            cost = setting.get("scrypt_n") or setting.get("pbkdf2_iterations")
+            print(
+                f"{setting['algorithm']:>14} {cost:>7}: "
+                f"{result['logins_per_second']:8.1f} logins/s, "
+                f"p50 {result['p50_ms']:7.1f} ms, p99 {result['p99_ms']:7.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Measures the latency of `Database.search_projects`, with the FTS5 index of the projects and with substring matching.
+
+A `Database` is created against a new temporary SQLite database seeded with projects made of random words,
+each allowed to one user, and to a "heavy" user that's allowed to a fraction of all of them.
+Every search runs in its own `session_scope`, like the API does, for random users and words:
+
+- rare: a word that few projects contain
+- common: a word that most projects contain
+- prefix: the first letters of a word
+- two words: two words that a project must both contain
+
+Usage::
+
+    python -m benchmarks.project_search [--projects 100000] [--users 1000] [--heavy 0.1] [--searches 500]
+        [--modes fts like] [--json]
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from utils.const import DATABASE
+
+from database import Database
+from database.models import AllowedUsers, Project, User
+from benchmarks.harness import percentile
+
+WORDS = [f"{a}{b}{c}" for a in "bcdfg" for b in "aeiou" for c in "klmnprst"]
+COMMON = "project"
+
+
+def seed(
+    database: Database, projects: int, users: int, heavy: float, rng: random.Random
+) -> tuple[list[int], int]:
+    """
+    Seeds the database with users, and projects each allowed to one of them, and some to the heavy user too.
+
+    Returns:
+        The ids of the users, and the id of the heavy user.
+    """
+    with database.engine.begin() as connection:
+        connection.execute(
+            User.__table__.insert(),
+            [
+                {
+                    "username": f"user{i}",
+                    "email": f"user{i}@example.com",
+                    "password": "",
+                }
+                for i in range(users + 1)
+            ],
+        )
+        user_ids = list(
+            connection.execute(
+                User.__table__.select().with_only_columns(User.id)
+            ).scalars()
+        )
+        heavy_id, user_ids = user_ids[0], user_ids[1:]
+        connection.execute(
+            Project.__table__.insert(),
+            [
+                {
+                    "project_id": Database.generate_id(),
+                    "name": " ".join(rng.choices(WORDS, k=2)),
+                    "description": " ".join(rng.choices(WORDS, k=8) + [COMMON]),
+                    "language": rng.choice(["python", "javascript", "rust", "go"]),
+                }
+                for _ in range(projects)
+            ],
+        )
+        project_ids = list(
+            connection.execute(
+                Project.__table__.select().with_only_columns(Project.id)
+            ).scalars()
+        )
+        connection.execute(
+            AllowedUsers.insert(),
+            [
+                {"user_id": rng.choice(user_ids), "project_id": project_id}
+                for project_id in project_ids
+            ]
+            + [
+                {"user_id": heavy_id, "project_id": project_id}
+                for project_id in rng.sample(project_ids, int(len(project_ids) * heavy))
+            ],
+        )
+    return user_ids, heavy_id
+
+
+def run(
+    database: Database,
+    full_text: bool,
+    user_ids: list[int],
+    heavy_id: int,
+    searches: int,
+) -> list[dict]:
+    database.full_text_search = full_text
+    kinds = {
+        "rare": lambda rng: [rng.choice(WORDS)],
+        "common": lambda rng: [COMMON],
+        "prefix": lambda rng: [rng.choice(WORDS)[:2]],
+        "two words": lambda rng: rng.sample(WORDS, 2),
+    }
+    results = []
+    for users, label in ((user_ids, "user"), ([heavy_id], "heavy user")):
+        for kind, terms_of in kinds.items():
+            rng = random.Random(kind)
+            latencies, found = [], 0
+            for _ in range(searches):
+                user_id, terms = rng.choice(users), terms_of(rng)
+                start = time.perf_counter()
+                with database.session_scope():
+                    found += len(database.search_projects(user_id, terms, 20))
+                latencies.append(time.perf_counter() - start)
+            latencies.sort()
+            results.append(
+                {
+                    "mode": "fts" if full_text else "like",
+                    "user": label,
+                    "search": kind,
+                    "p50_ms": percentile(latencies, 0.5) * 1000,
+                    "p99_ms": percentile(latencies, 0.99) * 1000,
+                    "results": found / searches,
+                }
+            )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--projects", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument(
+        "--heavy",
+        type=float,
+        default=0.1,
+        help="The fraction of the projects the heavy user is allowed to access",
+    )
+    parser.add_argument("--searches", type=int, default=500, help="Per search kind")
+    parser.add_argument(
+        "--modes", nargs="+", choices=["fts", "like"], default=["fts", "like"]
+    )
+    parser.add_argument("--json", action="store_true", help="Print JSON lines")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="collab-ide-bench-")
+    DATABASE.DB_PATH = os.path.join(directory, "bench.db")
+    DATABASE.URL = "sqlite:///" + DATABASE.DB_PATH
+    database = Database.get_instance()
+    try:
+        if "fts" in args.modes and not database.full_text_search:
+            parser.error("FTS5 is unavailable in this SQLite build")
+        user_ids, heavy_id = seed(
+            database, args.projects, args.users, args.heavy, random.Random(0)
+        )
+        for mode in args.modes:
+            for result in run(
+                database, mode == "fts", user_ids, heavy_id, args.searches
+            ):
+                if args.json:
+                    print(json.dumps(result))
+                else:
+                    print(
+                        f"{result['mode']:>4} {result['user']:>10} {result['search']:>9}: "
+                        f"p50 {result['p50_ms']:7.2f} ms, p99 {result['p99_ms']:7.2f} ms, "
+                        f"{result['results']:.1f} results"
+                    )
+    finally:
+        database.close()
+
+
+if __name__ == "__main__":
+    main()
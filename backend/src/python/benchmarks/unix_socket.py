@@ -0,0 +1,110 @@
+"""
+Compares the latency of the websocket handshake check over TCP and over a Unix domain socket (see `SERVER.UNIX_SOCKET`).
+
+`ApiServer` is booted against a temporary SQLite database seeded with users, projects and memberships,
+listening on a local port and on a Unix domain socket at the same time, and concurrent clients send
+`GET /api/projects/<id>/access` (the "access" scenario of `benchmarks.load_test`) over each transport:
+
+- keep-alive: every client reuses its connection
+- new: every request opens a new connection, like nginx (without upstream keepalive) and axios' default agent do
+
+Usage::
+
+    python -m benchmarks.unix_socket [--users 200] [--projects 1000] [--members 5] [--requests 5000]
+        [--concurrency 4] [--connections keep-alive new] [--transports tcp unix] [--server sync] [--json]
+"""
+
+import argparse
+import http.client
+import json
+import random
+
+from typing import Callable
+
+from benchmarks.harness import BenchServer, Client, UnixHTTPConnection, measure
+from benchmarks.load_test import build_scenarios
+
+
+def per_connection(
+    operation: Callable[[Client, random.Random], bool],
+    connect: Callable[[], http.client.HTTPConnection],
+) -> Callable[[Client, random.Random], bool]:
+    """
+    Wraps an operation to send its request on a new connection, rather than the client's keep-alive connection.
+    """
+
+    def run(_: Client, rng: random.Random) -> bool:
+        client = Client(connect)
+        try:
+            return operation(client, rng)
+        finally:
+            client.close()
+
+    return run
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--projects", type=int, default=1000)
+    parser.add_argument("--members", type=int, default=5, help="Users per project")
+    parser.add_argument("--requests", type=int, default=5000, help="Per measurement")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--connections",
+        nargs="+",
+        choices=["keep-alive", "new"],
+        default=["keep-alive", "new"],
+    )
+    parser.add_argument(
+        "--transports", nargs="+", choices=["tcp", "unix"], default=["tcp", "unix"]
+    )
+    parser.add_argument("--server", choices=["sync", "async"], default="sync")
+    parser.add_argument("--json", action="store_true", help="Print JSON lines")
+    args = parser.parse_args()
+
+    server = BenchServer(asynchronous=args.server == "async")
+    try:
+        seed = server.seed(args.users, args.projects, args.members)
+        server.start()
+        server.start_unix()
+        access = build_scenarios(seed, 1)["access"]
+
+        connectors: dict[str, Callable[[], http.client.HTTPConnection]] = {
+            "tcp": lambda: http.client.HTTPConnection(server.host, server.port),
+            "unix": lambda: UnixHTTPConnection(server.unix_socket),
+        }
+        # Warms up the caches of the database and the server, so the first measurement isn't slower
+        for transport in args.transports:
+            connect = connectors[transport]
+            measure("access", access, connect, args.requests // 10, args.concurrency)
+
+        for connections in args.connections:
+            for transport in args.transports:
+                connect = connectors[transport]
+                operation = access
+                if connections == "new":
+                    operation = per_connection(access, connect)
+                result = measure(
+                    "access", operation, connect, args.requests, args.concurrency
+                ).to_dict()
+                result.update(
+                    transport=transport,
+                    connections=connections,
+                    server=args.server,
+                    concurrency=args.concurrency,
+                )
+                if args.json:
+                    print(json.dumps(result))
+                else:
+                    print(
+                        f"{connections:>10} {transport:>4}: {result['requests_per_second']:8.1f} req/s, "
+                        f"p50 {result['p50_ms']:6.2f} ms, p99 {result['p99_ms']:6.2f} ms, "
+                        f"{result['errors']} errors"
+                    )
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
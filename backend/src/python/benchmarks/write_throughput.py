@@ -0,0 +1,206 @@
+"""
+Compares the write throughput of `Database` with per-request transactions and with the write queue.
+
+For each `DATABASE.WRITE_MODE`, a `Database` is created against a new temporary SQLite database seeded with users and projects,
+and concurrent request threads each run writes in their own `session_scope`, like the API does:
+
+- login: `add_session`
+- project: `add_project`
+- membership: `add_allowed_user` followed by `remove_allowed_user`, in two requests
+
+In the "direct" mode every request commits its own transaction, competing for SQLite's write lock,
+while in the "queue" mode the writes are handed to the writer thread, which commits them in groups (see `WriteQueue`).
+
+Usage::
+
+    python -m benchmarks.write_throughput [--users 200] [--projects 200] [--writes 2000] [--concurrency 16]
+        [--modes direct queue] [--operations login project membership] [--json]
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from typing import Callable
+
+from utils.const import DATABASE
+
+from database import Database
+from database.models import AllowedUsers, Project, User
+from benchmarks.harness import percentile
+
+
+def seed(database: Database, users: int, projects: int) -> tuple[list[int], list[int]]:
+    """
+    Seeds the database with users, and projects each allowed to one of them.
+
+    Returns:
+        The ids of the users and the ids of the projects (`Project.id`).
+    """
+    with database.engine.begin() as connection:
+        connection.execute(
+            User.__table__.insert(),
+            [
+                {
+                    "username": f"user{i}",
+                    "email": f"user{i}@example.com",
+                    "password": "",
+                }
+                for i in range(users)
+            ],
+        )
+        connection.execute(
+            Project.__table__.insert(),
+            [
+                {
+                    "project_id": Database.generate_id(),
+                    "name": f"project{i}",
+                    "description": "",
+                    "language": "python",
+                }
+                for i in range(projects)
+            ],
+        )
+        user_ids = list(
+            connection.execute(
+                User.__table__.select().with_only_columns(User.id)
+            ).scalars()
+        )
+        project_ids = list(
+            connection.execute(
+                Project.__table__.select().with_only_columns(Project.id)
+            ).scalars()
+        )
+        connection.execute(
+            AllowedUsers.insert(),
+            [
+                {"user_id": user_ids[i % len(user_ids)], "project_id": project_id}
+                for i, project_id in enumerate(project_ids)
+            ],
+        )
+    return user_ids, project_ids
+
+
+def build_operations(
+    database: Database, user_ids: list[int], project_ids: list[int]
+) -> dict[str, Callable[[random.Random], int]]:
+    """
+    Builds the write operations, each runs its requests and returns how many writes it made.
+    """
+
+    def login(rng: random.Random) -> int:
+        with database.session_scope():
+            database.add_session(rng.choice(user_ids))
+        return 1
+
+    def project(rng: random.Random) -> int:
+        with database.session_scope():
+            database.add_project("bench", "", "python", rng.choice(user_ids))
+        return 1
+
+    def membership(rng: random.Random) -> int:
+        project_id, user_id = rng.choice(project_ids), rng.choice(user_ids)
+        with database.session_scope():
+            database.add_allowed_user(project_id, user_id)
+        with database.session_scope():
+            database.remove_allowed_user(project_id, user_id)
+        return 2
+
+    return {"login": login, "project": project, "membership": membership}
+
+
+def run(
+    mode: str,
+    operations: list[str],
+    users: int,
+    projects: int,
+    writes: int,
+    concurrency: int,
+) -> dict:
+    directory = tempfile.mkdtemp(prefix="collab-ide-bench-")
+    DATABASE.DB_PATH = os.path.join(directory, "bench.db")
+    DATABASE.URL = "sqlite:///" + DATABASE.DB_PATH
+    DATABASE.WRITE_MODE = mode
+    database = Database.get_instance()
+    try:
+        user_ids, project_ids = seed(database, users, projects)
+        available = build_operations(database, user_ids, project_ids)
+
+        def request(i: int) -> tuple[float, int | None]:
+            rng = random.Random(i)
+            start = time.perf_counter()
+            try:
+                done = available[rng.choice(operations)](rng)
+            except Exception:
+                # e.g. "database is locked" once the busy timeout runs out
+                done = None
+            return time.perf_counter() - start, done
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as threads:
+            results = list(threads.map(request, range(writes)))
+        elapsed = time.perf_counter() - start
+        counters, _ = database.get_stats()
+    finally:
+        database.close()
+        Database.instance = None
+
+    latencies = sorted(latency for latency, _ in results)
+    done = sum(done for _, done in results if done is not None)
+    return {
+        "mode": mode,
+        "operations": operations,
+        "writes": done,
+        "writes_per_second": done / elapsed,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "errors": sum(done is None for _, done in results),
+        "commits": counters.get("write_queue_batches_total"),
+        "concurrency": concurrency,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--projects", type=int, default=200)
+    parser.add_argument("--writes", type=int, default=2000, help="Requests per mode")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--modes", nargs="+", choices=["direct", "queue"], default=["direct", "queue"]
+    )
+    parser.add_argument(
+        "--operations",
+        nargs="+",
+        choices=["login", "project", "membership"],
+        default=["login", "project", "membership"],
+    )
+    parser.add_argument("--json", action="store_true", help="Print JSON lines")
+    args = parser.parse_args()
+
+    for mode in args.modes:
+        result = run(
+            mode,
+            args.operations,
+            args.users,
+            args.projects,
+            args.writes,
+            args.concurrency,
+        )
+        if args.json:
+            print(json.dumps(result))
+        else:
+            commits = f", {result['commits']} commits" if result["commits"] else ""
+            print(
+                f"{mode:>6}: {result['writes_per_second']:8.1f} writes/s, "
+                f"p50 {result['p50_ms']:7.1f} ms, p99 {result['p99_ms']:7.1f} ms, "
+                f"{result['errors']} errors{commits}"
+            )
+
+
+if __name__ == "__main__":
+    main()
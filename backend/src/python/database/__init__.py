@@ -1,4 +1,15 @@
-from .database import Database, User, Session, Project
+from .database import Database, User, Session, Project, ProjectFile
+from .session_cache import SessionCache
 from sqlalchemy import or_, and_, not_
 
-__all__ = ["Database", "User", "Session", "Project", "or_", "and_", "not_"]
+__all__ = [
+    "Database",
+    "User",
+    "Session",
+    "Project",
+    "ProjectFile",
+    "SessionCache",
+    "or_",
+    "and_",
+    "not_",
+]
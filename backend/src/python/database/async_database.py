@@ -0,0 +1,854 @@
+import asyncio
+import contextvars
+import datetime
+
+from utils.const import DATABASE
+
+from . import queries
+from .authorization import BatchAuthorization
+from .database import CHANGED_PROJECTS, ENDED_SESSIONS, MEMBERSHIP_GENERATION, Database
+from .engine import create_async_database_engine, instrument_engine
+from .models import (
+    AllowedUsers,
+    Project,
+    ProjectFile,
+    RevokedSessionToken,
+    Session,
+    User,
+)
+from .session_tokens import SessionTokens
+
+from sqlalchemy import ColumnExpressionArgument, Table, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from typing import Any, Type, TypeVar
+
+from contextlib import asynccontextmanager
+
+tables = TypeVar("tables", User, Session, Project)
+
+
+class AsyncDatabase:
+    """
+    The asyncio counterpart of `Database`, used by `AsyncApiServer`.
+    It has the same methods as coroutines, and runs the same statements (see `queries`) through an async engine,
+    so waiting on the database doesn't hold a thread.
+
+    It's built on top of `Database`, and shares its caches, session accesses buffer, session tokens and password hasher.
+    `Database` still creates and migrates the schema, and its background threads flush the session accesses and reap expired sessions.
+    It writes within each request's transaction, so it requires the "direct" `DATABASE.WRITE_MODE`.
+    When attempting to use this class, it's required to use the `async with` statement, unless specified otherwise.
+    """
+
+    instance = None
+
+    def __init__(self, database: Database | None = None) -> None:
+        """
+        Args:
+            database: The database to build on, `Database.get_instance()` if None.
+        """
+        if AsyncDatabase.instance:
+            raise Exception("This class is a singleton!")
+
+        self.database = database or Database.get_instance()
+        if self.database.write_queue is not None:
+            # Its writes would bypass the writer thread, and compete with it for SQLite's write lock
+            raise ValueError(
+                f'AsyncDatabase doesn\'t support the "{DATABASE.WRITE_MODE}" write mode, only "direct"'
+            )
+        self.engine = create_async_database_engine(DATABASE.URL)
+        instrument_engine(self.engine.sync_engine)
+        # Rows are serialized within `session_scope`, but nothing may be lazily loaded after it
+        self.Session = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.session_cache = self.database.session_cache
+        self.session_touches = self.database.session_touches
+        self.password_hasher = self.database.password_hasher
+        self.session_tokens = self.database.session_tokens
+        self.membership_cache = self.database.membership_cache
+        self.user_directory_cache = self.database.user_directory_cache
+        # The session of the current task, the asyncio equivalent of `Database.Session`'s thread-local session
+        self.__session: contextvars.ContextVar[AsyncSession | None] = (
+            contextvars.ContextVar("async_database_session", default=None)
+        )
+
+    @staticmethod
+    def get_instance() -> "AsyncDatabase":
+        """
+        Gets the instance of the database.
+
+        Returns:
+            The instance of the database.
+        """
+        if not AsyncDatabase.instance:
+            AsyncDatabase.instance = AsyncDatabase()
+        return AsyncDatabase.instance
+
+    async def close(self) -> None:
+        """
+        Disposes of the async engine, and closes the underlying `Database`.
+
+        Note:
+            Does not require a database session.
+        """
+        await self.engine.dispose()
+        self.database.close()
+
+    def get_stats(self) -> tuple[dict[str, float], dict[str, float]]:
+        """
+        Gets the counters and the current state of the database's caches and connection pool, e.g. for monitoring.
+        Like `Database.get_stats`, but the connection pool is the async engine's.
+
+        Note:
+            Does not require a database session.
+
+        Returns:
+            The counters and the gauges, by metric name.
+        """
+        counters, gauges = self.database.get_stats()
+        pool = self.engine.sync_engine.pool
+        if isinstance(pool, QueuePool):
+            gauges.update(
+                db_pool_size=pool.size(),
+                db_pool_checked_out=pool.checkedout(),
+                db_pool_overflow=max(pool.overflow(), 0),
+            )
+        return counters, gauges
+
+    @asynccontextmanager
+    async def session_scope(self):
+        """
+        Provides a transactional scope around a series of operations, for the current task.
+        The members of projects changed, and the sessions deleted, within it are invalidated once it's committed
+        (see `Database.session_scope`).
+        """
+        session = self.Session()
+        session.info[CHANGED_PROJECTS] = set()
+        session.info[ENDED_SESSIONS] = set()
+        session.info[MEMBERSHIP_GENERATION] = self.membership_cache.generation
+        token = self.__session.set(session)
+        try:
+            yield None
+            await session.commit()
+            self.database.invalidate_memberships(session.info[CHANGED_PROJECTS])
+            self.database.invalidate_sessions(session.info[ENDED_SESSIONS])
+        except:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+            self.__session.reset(token)
+
+    async def add_user(self, username: str, email: str, password: str) -> User | None:
+        """
+        Adds a user to the database (see `Database.add_user`).
+
+        Args:
+            username: The username of the user.
+            email: The email of the user.
+            password: The password of the user.
+
+        Returns:
+            The user if the user was added successfully, None otherwise.
+        """
+        session = self.__in_session()
+
+        hashed_password = await asyncio.to_thread(self.password_hasher.hash, password)
+        values = {"username": username, "email": email, "password": hashed_password}
+
+        statement = queries.insert_on_conflict_do_nothing(
+            self.engine.dialect.name, User
+        )
+        if statement is not None and self.engine.dialect.insert_returning:
+            statement = statement.values(**values).returning(User)
+            return (await session.execute(statement)).scalar()
+
+        user = await self.select_from(
+            User,
+            or_(
+                User.username_normalized == User.normalize(username),
+                User.email_normalized == User.normalize(email),
+            ),
+        )
+        if user:
+            return None
+
+        user = User(**values)
+        session.add(user)
+        await session.flush()
+        return user
+
+    async def authenticate_user(self, email: str, password: str) -> User | None:
+        """
+        Gets the user with the given email, if the password matches (see `Database.authenticate_user`).
+        The password is verified on a thread, so the event loop keeps serving other requests meanwhile.
+
+        Args:
+            email: The email of the user.
+            password: The password of the user.
+
+        Returns:
+            The user if the email and password are correct, None otherwise.
+        """
+        self.__in_session()
+
+        user = await self.select_from(
+            User, User.email_normalized == User.normalize(email)
+        )
+        if not user or not await asyncio.to_thread(
+            self.password_hasher.verify, password, user.password
+        ):
+            return None
+
+        if self.password_hasher.needs_rehash(user.password):
+            user.password = await asyncio.to_thread(self.password_hasher.hash, password)
+        return user
+
+    async def add_session(self, user_id: int) -> Session | None:
+        """
+        Adds a session to the database.
+
+        Args:
+            user_id: The id of the user.
+
+        Returns:
+            The session if the session was added successfully, None otherwise.
+        """
+        session = self.__in_session()
+
+        row = Session(session_id=Database.generate_id(), user_id=user_id)
+        session.add(row)
+        await session.flush()
+        return row
+
+    async def start_session(self, user_id: int) -> str:
+        """
+        Starts a session for a user, according to `DATABASE.SESSION_MODE` (see `Database.start_session`).
+
+        Args:
+            user_id: The id of the user.
+
+        Returns:
+            The value of the session cookie - the session id or the token.
+        """
+        self.__in_session()
+
+        if self.session_tokens is not None:
+            return self.session_tokens.issue(user_id)
+        return (await self.add_session(user_id)).session_id
+
+    async def end_session(self, session_id: str) -> None:
+        """
+        Ends a session - deletes its `Session` row, or revokes it if it's a signed token (see `Database.end_session`).
+
+        Args:
+            session_id: The value of the session cookie.
+        """
+        self.__in_session()
+
+        if not self.__is_token(session_id):
+            await self.delete_from(Session, Session.session_id == session_id)
+            return
+
+        revoked = self.session_tokens.revoke(session_id)
+        if revoked:
+            token_id, expires_at = revoked
+            await self.__insert_ignoring_duplicates(
+                RevokedSessionToken.__table__,
+                [{"token_id": token_id, "expires_at": expires_at}],
+            )
+
+    def renew_session(self, session_id: str) -> str:
+        """
+        Gets the value to refresh the session cookie with, after the session was used (see `Database.renew_session`).
+
+        Note:
+            Does not require a database session.
+        """
+        return self.database.renew_session(session_id)
+
+    async def add_project(
+        self, name: str, description: str, language: str, user_id: int
+    ) -> Project | None:
+        """
+        Adds a project to the database.
+
+        Args:
+            name: The name of the project.
+            description: The description of the project.
+            language: The language of the project.
+            user_id: The id of the user. (The user that created the project)
+
+        Returns:
+            The project if the project was added successfully, None otherwise.
+        """
+        session = self.__in_session()
+
+        project = Project(
+            project_id=Database.generate_id(),
+            name=name,
+            description=description,
+            language=language,
+        )
+        session.add(project)
+        await session.flush()
+
+        await self.__insert_ignoring_duplicates(
+            AllowedUsers, [{"user_id": user_id, "project_id": project.id}]
+        )
+        await self.__reload_membership(project.id, user_id)
+        return project
+
+    async def add_allowed_user(self, project_id: int, user_id: int) -> None:
+        """
+        Allows a user to access a project, and bumps the project's revision (see `Database.add_allowed_user`).
+
+        Args:
+            project_id: The id of the project (`Project.id`). The project must exist.
+            user_id: The id of the user. The user must exist.
+        """
+        session = self.__in_session()
+
+        await self.__insert_ignoring_duplicates(
+            AllowedUsers, [{"user_id": user_id, "project_id": project_id}]
+        )
+        await session.execute(queries.bump_revision(project_id))
+        await self.__reload_membership(project_id, user_id)
+
+    async def remove_allowed_user(self, project_id: int, user_id: int) -> None:
+        """
+        Revokes a user's access to a project, and bumps the project's revision.
+
+        Args:
+            project_id: The id of the project (`Project.id`).
+            user_id: The id of the user.
+        """
+        session = self.__in_session()
+
+        await session.execute(queries.remove_allowed_users(project_id, [user_id]))
+        await session.execute(queries.bump_revision(project_id))
+        await self.__reload_membership(project_id, user_id)
+
+    async def add_allowed_users(
+        self, project_id: int, emails: list[str]
+    ) -> dict[str, str]:
+        """
+        Allows many users to access a project at once (see `Database.add_allowed_users`).
+
+        Args:
+            project_id: The id of the project (`Project.id`). The project must exist.
+            emails: The emails of the users.
+
+        Returns:
+            The result for each email - "added", "already_allowed" or "not_found".
+        """
+        session = self.__in_session()
+
+        members = await self.__get_members_by_email(project_id, emails)
+        added = list(
+            dict.fromkeys(
+                user_id for user_id, allowed in members.values() if not allowed
+            )
+        )
+        if added:
+            await self.__insert_ignoring_duplicates(
+                AllowedUsers,
+                [{"user_id": user_id, "project_id": project_id} for user_id in added],
+            )
+            await session.execute(queries.bump_revision(project_id))
+            await self.__reload_membership(project_id, *added)
+
+        return {
+            email: (
+                "not_found"
+                if email not in members
+                else "already_allowed" if members[email][1] else "added"
+            )
+            for email in emails
+        }
+
+    async def remove_allowed_users(
+        self, project_id: int, emails: list[str]
+    ) -> dict[str, str]:
+        """
+        Revokes the access of many users to a project at once (see `Database.remove_allowed_users`).
+
+        Args:
+            project_id: The id of the project (`Project.id`).
+            emails: The emails of the users.
+
+        Returns:
+            The result for each email - "removed", "not_allowed" or "not_found".
+        """
+        session = self.__in_session()
+
+        members = await self.__get_members_by_email(project_id, emails)
+        removed = [user_id for user_id, allowed in members.values() if allowed]
+        if removed:
+            await session.execute(queries.remove_allowed_users(project_id, removed))
+            await session.execute(queries.bump_revision(project_id))
+            await self.__reload_membership(project_id, *removed)
+
+        return {
+            email: (
+                "not_found"
+                if email not in members
+                else "removed" if members[email][1] else "not_allowed"
+            )
+            for email in emails
+        }
+
+    async def get_project_files(self, project_id: int) -> list[ProjectFile]:
+        """
+        Gets the files of a project, ordered by their names (see `Database.get_project_files`).
+
+        Args:
+            project_id: The id of the project (`Project.id`).
+
+        Returns:
+            The files of the project.
+        """
+        session = self.__in_session()
+
+        return list(
+            (await session.execute(queries.project_files(project_id))).scalars()
+        )
+
+    async def add_project_file(self, project_id: int, name: str) -> ProjectFile | None:
+        """
+        Adds a file to a project (see `Database.add_project_file`).
+
+        Args:
+            project_id: The id of the project (`Project.id`). The project must exist.
+            name: The name of the file.
+
+        Returns:
+            The file if it was added successfully, None if the project already has a file with that name.
+        """
+        session = self.__in_session()
+
+        values = {"project_id": project_id, "name": name}
+
+        statement = queries.insert_on_conflict_do_nothing(
+            self.engine.dialect.name, ProjectFile
+        )
+        if statement is not None and self.engine.dialect.insert_returning:
+            statement = statement.values(**values).returning(ProjectFile)
+            return (await session.execute(statement)).scalar()
+
+        if (await session.execute(select(ProjectFile).filter_by(**values))).first():
+            return None
+
+        project_file = ProjectFile(**values)
+        session.add(project_file)
+        await session.flush()
+        return project_file
+
+    async def remove_project_file(self, project_id: int, name: str) -> bool:
+        """
+        Removes a file from a project.
+
+        Args:
+            project_id: The id of the project (`Project.id`).
+            name: The name of the file.
+
+        Returns:
+            True if the file was removed, False if the project has no file with that name.
+        """
+        session = self.__in_session()
+
+        result = await session.execute(queries.remove_project_files(project_id, [name]))
+        return result.rowcount > 0
+
+    async def import_project_files(self, files: list[tuple[str, str]]) -> int:
+        """
+        Adds files to projects in bulk (see `Database.import_project_files`).
+
+        Args:
+            files: The (public project id, file name) of every file.
+
+        Returns:
+            The amount of files whose project exists.
+        """
+        session = self.__in_session()
+
+        result = await session.execute(
+            queries.projects_by_public_id(list({project_id for project_id, _ in files}))
+        )
+        ids = dict(result.all())
+        rows = [
+            {"project_id": ids[project_id], "name": name}
+            for project_id, name in files
+            if project_id in ids
+        ]
+        await self.__insert_ignoring_duplicates(ProjectFile.__table__, rows)
+        return len(rows)
+
+    async def __get_members_by_email(
+        self, project_id: int, emails: list[str]
+    ) -> dict[str, tuple[int, bool]]:
+        normalized = {email: User.normalize(email) for email in emails}
+        result = await self.__in_session().execute(
+            queries.members_by_email(project_id, list(set(normalized.values())))
+        )
+        found = {email: (user_id, allowed) for email, user_id, allowed in result}
+        return {
+            email: found[normalized[email]]
+            for email in emails
+            if normalized[email] in found
+        }
+
+    async def __insert_ignoring_duplicates(
+        self, table: Table, rows: list[dict[str, Any]]
+    ) -> None:
+        if not rows:
+            return
+
+        session = self.__in_session()
+        statement = queries.insert_on_conflict_do_nothing(
+            self.engine.dialect.name, table
+        )
+        if statement is None:
+            # Without ON CONFLICT support, rows that already exist are skipped beforehand
+            rows = [
+                row
+                for row in rows
+                if not (await session.execute(select(table).filter_by(**row))).first()
+            ]
+            if not rows:
+                return
+            statement = table.insert()
+        await session.execute(statement, rows)
+
+    async def __reload_membership(self, project_id: int, *user_ids: int) -> None:
+        # The statements above bypass the ORM, so already loaded rows are out of date.
+        # Unlike `Database`, expired attributes can't be lazily loaded later on, so the project is reloaded right away.
+        session = self.__in_session()
+        session.info.setdefault(CHANGED_PROJECTS, set()).add(project_id)
+        project = session.identity_map.get(session.identity_key(Project, project_id))
+        if project is not None:
+            await session.refresh(
+                project, ["allowed_users", "revision", "last_updated_at"]
+            )
+        for user_id in user_ids:
+            user = session.identity_map.get(session.identity_key(User, user_id))
+            if user is not None:
+                session.expire(user, ["projects"])
+
+    async def get_user_by_email(self, email: str) -> User | None:
+        """
+        Gets a user by their email, case-insensitively (see `Database.get_user_by_email`).
+
+        Args:
+            email: The email of the user.
+
+        Returns:
+            The user if it exists, None otherwise.
+        """
+        session = self.__in_session()
+
+        return (
+            await session.execute(queries.user_by_email(User.normalize(email)))
+        ).scalar()
+
+    async def search_users(self, prefix: str, limit: int) -> list[dict[str, Any]]:
+        """
+        Finds the users whose username or email start with a prefix (see `Database.search_users`).
+
+        Args:
+            prefix: The start of the username or email.
+            limit: The maximum amount of users to get, up to `DATABASE.USER_DIRECTORY_LIMIT`.
+
+        Returns:
+            The users (as `User.to_dict` does), ordered by their username.
+        """
+        session = self.__in_session()
+
+        prefix = User.normalize(prefix)
+        users = self.user_directory_cache.get(prefix)
+        if users is None:
+            rows = (
+                await session.execute(
+                    queries.users_by_prefix(prefix, DATABASE.USER_DIRECTORY_LIMIT)
+                )
+            ).all()
+            users, complete = queries.first_users(rows, DATABASE.USER_DIRECTORY_LIMIT)
+            self.user_directory_cache.put(prefix, users, complete)
+        return users[:limit]
+
+    async def get_project(self, project_id: str) -> Project | None:
+        """
+        Gets a project along with its allowed users.
+
+        Args:
+            project_id: The public id of the project (`Project.project_id`).
+
+        Returns:
+            The project if it exists, None otherwise.
+        """
+        session = self.__in_session()
+
+        return (await session.execute(queries.project(project_id))).scalar()
+
+    async def get_project_version(
+        self, project_id: str, user_id: int
+    ) -> tuple[int, datetime.datetime] | None:
+        """
+        Gets the revision of a project the user is allowed to access (see `Database.get_project_version`).
+
+        Args:
+            project_id: The public id of the project (`Project.project_id`).
+            user_id: The id of the user.
+
+        Returns:
+            The project's revision and the time it was last updated,
+            or None if the project doesn't exist or the user isn't allowed to access it.
+        """
+        session = self.__in_session()
+
+        query = queries.project_version(project_id, user_id)
+        row = (await session.execute(query)).first()
+        return (row[0], row[1]) if row else None
+
+    async def get_user_projects_version(
+        self,
+        user_id: int,
+        limit: int | None = None,
+        after: tuple[datetime.datetime, int] | None = None,
+        language: str | None = None,
+        name: str | None = None,
+    ) -> tuple[str, datetime.datetime | None]:
+        """
+        Gets a version of a page of the projects a user is allowed to access (see `Database.get_user_projects_version`).
+
+        Args:
+            user_id: The id of the user.
+            limit, after, language, name: The page, as passed to `get_user_projects`.
+
+        Returns:
+            The version - a hexadecimal string, and the last time one of the projects was updated (None if there are none).
+        """
+        session = self.__in_session()
+
+        query = queries.user_projects_revisions(user_id, limit, after, language, name)
+        return queries.projects_version((await session.execute(query)).all())
+
+    async def get_user_projects(
+        self,
+        user_id: int,
+        limit: int | None = None,
+        after: tuple[datetime.datetime, int] | None = None,
+        language: str | None = None,
+        name: str | None = None,
+        with_allowed_users: bool = True,
+    ) -> list[Project]:
+        """
+        Gets the projects a user is allowed to access, ordered by their creation time (see `Database.get_user_projects`).
+
+        Args:
+            user_id: The id of the user.
+            limit: The maximum amount of projects to get, None for all of them.
+            after: The (created_at, id) of the last project of the previous page, to get the projects that come after it.
+            language: Only get the projects with this language.
+            name: Only get the projects whose name contains this (case-insensitive).
+            with_allowed_users: Whether to load the allowed users of the projects.
+
+        Returns:
+            The user's projects.
+        """
+        session = self.__in_session()
+
+        query = queries.user_projects(
+            user_id, limit, after, language, name, with_allowed_users
+        )
+        return list((await session.execute(query)).scalars())
+
+    async def search_projects(
+        self,
+        user_id: int,
+        terms: list[str],
+        limit: int,
+        with_allowed_users: bool = True,
+    ) -> list[Project]:
+        """
+        Searches the projects a user is allowed to access (see `Database.search_projects`).
+
+        Args:
+            user_id: The id of the user.
+            terms: The words to search for.
+            limit: The maximum amount of projects to get.
+            with_allowed_users: Whether to load the allowed users of the projects.
+
+        Returns:
+            The matching projects.
+        """
+        session = self.__in_session()
+
+        query = queries.search_projects(
+            user_id,
+            terms,
+            limit,
+            self.database.full_text_search,
+            with_allowed_users,
+        )
+        return list((await session.execute(query)).scalars())
+
+    async def get_project_members(self, project_id: str) -> frozenset[int] | None:
+        """
+        Gets the ids of a project's allowed users, from the shared membership cache when possible
+        (see `Database.get_project_members`).
+
+        Args:
+            project_id: The public id of the project (`Project.project_id`).
+
+        Returns:
+            The ids of the project's allowed users if the project exists, None otherwise.
+        """
+        session = self.__in_session()
+
+        changed = session.info.get(CHANGED_PROJECTS, set())
+        cached = self.membership_cache.get(project_id)
+        if cached is not None and cached[0] not in changed:
+            return cached[1]
+
+        rows = (await session.execute(queries.project_members(project_id))).all()
+        if not rows:
+            return None
+        id = rows[0][0]
+        members = frozenset(user_id for _, user_id in rows if user_id is not None)
+        if id not in changed:
+            generation = session.info.get(
+                MEMBERSHIP_GENERATION, self.membership_cache.generation
+            )
+            self.membership_cache.put(project_id, id, members, generation)
+        return members
+
+    async def has_project_access(self, project_id: str, user_id: int) -> bool:
+        """
+        Checks if a user is allowed to access a project, with a set lookup in the project's members.
+
+        Args:
+            project_id: The public id of the project (`Project.project_id`).
+            user_id: The id of the user.
+
+        Returns:
+            True if the user is one of the project's allowed users, False otherwise.
+        """
+        members = await self.get_project_members(project_id)
+        return members is not None and user_id in members
+
+    async def authorize_sessions(
+        self, pairs: list[tuple[str, str]]
+    ) -> dict[str, dict[str, bool]]:
+        """
+        Checks if many sessions may access projects at once (see `Database.authorize_sessions`).
+
+        Args:
+            pairs: The (session id, project id) pairs to check, project ids are the public `Project.project_id`.
+
+        Returns:
+            Whether each session may access each of its projects, by session id and then project id.
+        """
+        session = self.__in_session()
+
+        authorization = BatchAuthorization(
+            pairs, self.session_tokens, self.session_cache, self.session_touches
+        )
+        query = authorization.sessions_query()
+        if query is not None:
+            authorization.add_session_rows(await session.execute(query))
+        query = authorization.memberships_query()
+        if query is not None:
+            authorization.add_membership_rows(await session.execute(query))
+        return authorization.verdicts()
+
+    async def get_session_user_id(self, session_id: str) -> int | None:
+        """
+        Gets the id of the user that owns a session, if the session is valid (see `Database.get_session_user_id`).
+        Recently validated sessions are served from the shared session cache without awaiting the database.
+
+        Args:
+            session_id: The session id to validate.
+
+        Returns:
+            The id of the session's user if the session is valid, None otherwise.
+        """
+        self.__in_session()
+
+        if self.__is_token(session_id):
+            return self.session_tokens.verify(session_id)
+        if self.session_tokens is not None and not DATABASE.SIGNED_MODE_SESSION_ROWS:
+            return None
+
+        user_id = self.session_cache.get(session_id)
+        if user_id is not None:
+            self.session_touches.touch(session_id)
+            return user_id
+
+        session = await self.select_from(Session, Session.session_id == session_id)
+        if session is None:
+            return None
+
+        # An access that wasn't flushed yet is newer than the one in the database
+        last_accessed_at = max(
+            session.last_accessed_at,
+            self.session_touches.last_touch(session_id) or session.last_accessed_at,
+        )
+        if datetime.datetime.now() - last_accessed_at >= DATABASE.SESSION_IDLE_TIMEOUT:
+            await self.delete_from(Session, Session.session_id == session_id)
+            return None
+
+        self.session_touches.touch(session_id)
+        self.session_cache.put(session_id, session.user_id)
+        return session.user_id
+
+    async def select_from(
+        self, table: Type[tables], *filters: ColumnExpressionArgument[bool]
+    ) -> tables | None:
+        """
+        Gets the first column and row that matches the filters (see `Database.select_from`).
+
+        Args:
+            table: The table to select from.
+            *filters: The filters to apply to the WHERE clause.
+
+        Returns:
+            The found row if it exists, None otherwise.
+        """
+        session = self.__in_session()
+
+        return (await session.execute(select(table).filter(*filters))).scalar()
+
+    async def delete_from(
+        self, table: Type[tables], *filters: ColumnExpressionArgument[bool]
+    ) -> None:
+        """
+        Deletes a row from the database.
+        Deleting a session also removes it from the session cache,
+        and deleting a project deletes its files, and removes it from the membership cache once the session is committed.
+
+        Args:
+            table: The table to delete from.
+            *filters: The filters to apply to the WHERE clause.
+        """
+        session = self.__in_session()
+
+        row = await self.select_from(table, *filters)
+        if row:
+            if isinstance(row, Session):
+                self.session_cache.invalidate(row.session_id)
+                self.session_touches.discard(row.session_id)
+                session.info.setdefault(ENDED_SESSIONS, set()).add(row.session_id)
+            elif isinstance(row, Project):
+                session.info.setdefault(CHANGED_PROJECTS, set()).add(row.id)
+                await session.execute(queries.remove_project_files(row.id))
+            await session.delete(row)
+
+    def __is_token(self, session_id: str) -> bool:
+        return self.session_tokens is not None and SessionTokens.is_token(session_id)
+
+    def __in_session(self) -> AsyncSession:
+        session = self.__session.get()
+        if session is None:
+            raise Exception("Not in session")
+        return session
@@ -0,0 +1,164 @@
+import datetime
+
+from typing import Iterable
+
+from sqlalchemy import Row, Select, select
+
+from utils.const import DATABASE
+
+from .models import AllowedUsers, Project, Session
+from .session_cache import SessionCache
+from .session_tokens import SessionTokens
+from .session_touch import SessionTouchBuffer
+
+
+class BatchAuthorization:
+    """
+    Decides whether each of many (session id, project id) pairs may access the project,
+    e.g. for the sockets of a room that reconnects all at once.
+    It's shared by `Database.authorize_sessions` and `AsyncDatabase.authorize_sessions`, which execute its queries.
+
+    Sessions are resolved from memory when possible (signed tokens and the session cache), like in `Database.get_session_user_id`.
+    The remaining sessions are validated, and their memberships are fetched, with a single query (`sessions_query`),
+    and the memberships of the sessions resolved from memory with another one (`memberships_query`).
+    """
+
+    def __init__(
+        self,
+        pairs: Iterable[tuple[str, str]],
+        session_tokens: SessionTokens | None,
+        session_cache: SessionCache,
+        session_touches: SessionTouchBuffer,
+    ) -> None:
+        """
+        Args:
+            pairs: The (session id, project id) pairs to authorize, project ids are the public `Project.project_id`.
+            session_tokens: The signed session tokens, None if they're disabled.
+            session_cache: The cache of validated sessions.
+            session_touches: The buffer the accesses to valid sessions are recorded in.
+        """
+        self.pairs = list(pairs)
+        self.project_ids = list({project_id for _, project_id in self.pairs})
+        self.session_cache = session_cache
+        self.session_touches = session_touches
+        # The user of every resolved session, None if the session is invalid
+        self.user_ids: dict[str, int | None] = {}
+        # The (user id, project id) pairs that are allowed
+        self.memberships: set[tuple[int, str]] = set()
+        self.__unresolved: list[str] = []
+        # The users whose memberships were already fetched with their sessions
+        self.__fetched: set[int] = set()
+
+        for session_id in {session_id for session_id, _ in self.pairs}:
+            if session_tokens is not None and (
+                SessionTokens.is_token(session_id)
+                or not DATABASE.SIGNED_MODE_SESSION_ROWS
+            ):
+                # `verify` rejects the ids of `Session` rows
+                self.user_ids[session_id] = session_tokens.verify(session_id)
+                continue
+            user_id = session_cache.get(session_id)
+            if user_id is None:
+                self.__unresolved.append(session_id)
+                continue
+            session_touches.touch(session_id)
+            self.user_ids[session_id] = user_id
+
+    def sessions_query(self) -> Select | None:
+        """
+        Selects the (session id, user id, last accessed at, project id) of the sessions that weren't resolved from memory,
+        with a row for each of the requested projects the session's user may access (or a single row with no project).
+
+        Returns:
+            The query, or None if there's nothing to resolve.
+        """
+        if not self.__unresolved:
+            return None
+
+        projects = select(Project.id).where(Project.project_id.in_(self.project_ids))
+        return (
+            select(
+                Session.session_id,
+                Session.user_id,
+                Session.last_accessed_at,
+                Project.project_id,
+            )
+            .select_from(Session)
+            .outerjoin(
+                AllowedUsers,
+                (AllowedUsers.c.user_id == Session.user_id)
+                & AllowedUsers.c.project_id.in_(projects.scalar_subquery()),
+            )
+            .outerjoin(Project, Project.id == AllowedUsers.c.project_id)
+            .where(Session.session_id.in_(self.__unresolved))
+        )
+
+    def add_session_rows(self, rows: Iterable[Row]) -> None:
+        """
+        Validates the sessions returned by `sessions_query`, and records their memberships.
+        Valid sessions are cached and touched, sessions that weren't found or are idle for too long are invalid.
+        """
+        now = datetime.datetime.now()
+        for session_id in self.__unresolved:
+            self.user_ids[session_id] = None
+        for session_id, user_id, last_accessed_at, project_id in rows:
+            # An access that wasn't flushed yet is newer than the one in the database
+            last_touch = self.session_touches.last_touch(session_id)
+            if last_touch is not None and last_touch > last_accessed_at:
+                last_accessed_at = last_touch
+            if now - last_accessed_at >= DATABASE.SESSION_IDLE_TIMEOUT:
+                continue
+
+            self.__fetched.add(user_id)
+            if self.user_ids[session_id] is None:
+                self.user_ids[session_id] = user_id
+                self.session_cache.put(session_id, user_id)
+                self.session_touches.touch(session_id)
+            if project_id is not None:
+                self.memberships.add((user_id, project_id))
+        self.__unresolved = []
+
+    def memberships_query(self) -> Select | None:
+        """
+        Selects the (user id, project id) memberships of the users of the sessions resolved from memory.
+
+        Returns:
+            The query, or None if there are no such users.
+        """
+        user_ids = {
+            user_id
+            for user_id in self.user_ids.values()
+            if user_id is not None and user_id not in self.__fetched
+        }
+        if not user_ids:
+            return None
+
+        return (
+            select(AllowedUsers.c.user_id, Project.project_id)
+            .join(Project, Project.id == AllowedUsers.c.project_id)
+            .where(
+                AllowedUsers.c.user_id.in_(user_ids),
+                Project.project_id.in_(self.project_ids),
+            )
+        )
+
+    def add_membership_rows(self, rows: Iterable[Row]) -> None:
+        """
+        Records the memberships returned by `memberships_query`.
+        """
+        self.memberships.update((user_id, project_id) for user_id, project_id in rows)
+
+    def verdicts(self) -> dict[str, dict[str, bool]]:
+        """
+        Gets the verdicts, once the queries' rows were added.
+
+        Returns:
+            Whether each session may access each of its projects, by session id and then project id.
+        """
+        verdicts: dict[str, dict[str, bool]] = {}
+        for session_id, project_id in self.pairs:
+            user_id = self.user_ids.get(session_id)
+            verdicts.setdefault(session_id, {})[project_id] = (
+                user_id is not None and (user_id, project_id) in self.memberships
+            )
+        return verdicts
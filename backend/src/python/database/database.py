@@ -1,156 +1,70 @@
+import atexit
 import datetime
 import os
+import threading
 from hashlib import sha256
 
 from utils.const import DATABASE
 
+from . import queries
+from .authorization import BatchAuthorization
+from .engine import (
+    create_database_engine,
+    create_read_only_engine,
+    create_writer_engine,
+    instrument_engine,
+)
+from .membership_broadcast import MembershipBroadcast
+from .membership_cache import MembershipCache
+from .migrations import PROJECT_SEARCH_TABLE, migrate
+from .models import (
+    AllowedUsers,
+    Base,
+    Lease,
+    Project,
+    ProjectFile,
+    RevokedSessionToken,
+    Session,
+    User,
+)
+from .passwords import PasswordHasher
+from .session_cache import SessionCache
+from .session_tokens import SessionTokens
+from .session_touch import SessionTouchBuffer
+from .user_directory_cache import UserDirectoryCache
+from .write_queue import WriteQueue
+
 from sqlalchemy import (
-    Column,
     ColumnExpressionArgument,
-    DateTime,
-    ForeignKey,
-    Integer,
-    String,
+    Connection,
+    Engine,
+    Row,
+    Select,
     Table,
-    create_engine,
+    func,
+    insert,
+    inspect,
     or_,
     select,
     update,
     delete,
 )
-from sqlalchemy.orm import (
-    DeclarativeBase,
-    sessionmaker,
-    relationship,
-    scoped_session,
-    Mapped,
-)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.orm import Session as OrmSession, sessionmaker, scoped_session
 
-from typing import List, Type, TypeVar, Any
+from typing import Callable, Iterable, Type, TypeVar, Any
 
 from contextlib import contextmanager
 
-
-class Base(DeclarativeBase):
-    pass
-
-
-AllowedUsers = Table(
-    "allowed_users",
-    Base.metadata,
-    Column("user_id", Integer, ForeignKey("users.id")),
-    Column("project_id", Integer, ForeignKey("projects.id")),
-)
-
-
-class Session(Base):
-    """
-    A class that represents a session in the database.
-    It's used for authenticating users upon attempted access to the website.
-    """
-
-    __tablename__ = "sessions"
-
-    id = Column(Integer, primary_key=True, nullable=False)
-    session_id = Column(String, nullable=False, unique=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    created_at = Column(DateTime, default=datetime.datetime.now(), nullable=False)
-    last_accessed_at = Column(DateTime, default=datetime.datetime.now(), nullable=False)
-
-    def __repr__(self) -> str:
-        return f"<Session(session_id={self.session_id}, user_id={self.user_id}, created_at={self.created_at}, last_accessed_at={self.last_accessed_at})>"
-
-    def to_dict(self) -> dict[str, Any]:
-        """
-        Returns the session as a dictionary.
-        """
-        return {
-            "id": self.id,
-            "session_id": self.session_id,
-            "user_id": self.user_id,
-            "created_at": self.created_at,
-            "last_accessed_at": self.last_accessed_at,
-        }
-
-
-class User(Base):
-    """
-    A class that represents a user in the database.
-    """
-
-    __tablename__ = "users"
-
-    id = Column(Integer, primary_key=True, nullable=False)
-    username = Column(String, nullable=False, unique=True)
-    email = Column(String, nullable=False, unique=True)
-    password = Column(String, nullable=False)
-
-    projects: Mapped[List["Project"]] = relationship(
-        "Project",
-        secondary="allowed_users",
-        back_populates="allowed_users",
-    )
-
-    def __repr__(self) -> str:
-        return f"<User(username={self.username}, email={self.email})>"
-
-    def to_dict(self) -> dict[str, Any]:
-        """
-        Returns the user as a dictionary.
-        """
-        return {
-            "id": self.id,
-            "username": self.username,
-            "email": self.email,
-        }
-
-
-class Project(Base):
-    """
-    A class that represents a project in the database.
-    It's used for storing project information.
-    """
-
-    __tablename__ = "projects"
-
-    id = Column(Integer, primary_key=True, nullable=False)
-    project_id = Column(String, nullable=False, unique=True)
-    name = Column(String, nullable=False)
-    description = Column(String, nullable=False)
-    language = Column(String, nullable=False)
-    created_at = Column(DateTime, default=datetime.datetime.now(), nullable=False)
-
-    allowed_users: Mapped[List["User"]] = relationship(
-        "User",
-        secondary="allowed_users",
-        back_populates="projects",
-    )
-
-    def __repr__(self) -> str:
-        return f"<Project(project_id={self.project_id}, name={self.name}, description={self.description}, language={self.language}, created_at={self.created_at})>"
-
-    def to_dict(self) -> dict[str, Any]:
-        """
-        Returns the project as a dictionary.
-        """
-        return {
-            "id": self.id,
-            "project_id": self.project_id,
-            "name": self.name,
-            "description": self.description,
-            "language": self.language,
-            "created_at": self.created_at,
-            "allowed_users": self.get_allowed_users(),
-        }
-
-    def get_allowed_users(self) -> list[dict[str, Any]]:
-        """
-        Returns the allowed users of the project as a list of dictionaries.
-        """
-        return [user.to_dict() for user in self.allowed_users]
-
-
 tables = TypeVar("tables", User, Session, Project)
+T = TypeVar("T")
+
+# The `info` keys of the sessions of `Database.session_scope` (and `AsyncDatabase.session_scope`)
+CHANGED_PROJECTS = "changed_projects"
+# The key of the sessions (`Session.session_id`) deleted within a `session_scope`, in `OrmSession.info`
+ENDED_SESSIONS = "ended_sessions"
+MEMBERSHIP_GENERATION = "membership_generation"
 
 
 class Database:
@@ -166,9 +80,92 @@ class Database:
         if Database.instance:
             raise Exception("This class is a singleton!")
 
-        self.engine = create_engine("sqlite:///" + DATABASE.DB_PATH, echo=False)
+        self.engine = create_database_engine(DATABASE.URL)
+        instrument_engine(self.engine)
         Base.metadata.create_all(self.engine)
-        self.Session = scoped_session(sessionmaker(bind=self.engine))
+        migrate(self.engine, Base.metadata)
+        # Whether projects are searched with the FTS5 index, see `search_projects`
+        self.full_text_search = inspect(self.engine).has_table(PROJECT_SEARCH_TABLE)
+        self.write_queue, self.read_engine = self.__create_write_queue()
+        self.Session = scoped_session(sessionmaker(bind=self.read_engine))
+        self.session_cache = SessionCache(
+            DATABASE.SESSION_CACHE_SIZE,
+            DATABASE.SESSION_CACHE_TTL.total_seconds(),
+        )
+        self.session_touches = SessionTouchBuffer(DATABASE.SESSION_TOUCH_GRANULARITY)
+        self.password_hasher = PasswordHasher(
+            DATABASE.PASSWORD_HASH_ALGORITHM,
+            scrypt_n=DATABASE.SCRYPT_N,
+            scrypt_r=DATABASE.SCRYPT_R,
+            scrypt_p=DATABASE.SCRYPT_P,
+            pbkdf2_iterations=DATABASE.PBKDF2_ITERATIONS,
+            workers=DATABASE.PASSWORD_HASH_WORKERS,
+        )
+        self.session_tokens = self.__create_session_tokens()
+        self.__last_revocation_id = 0
+        self.membership_cache = MembershipCache(
+            DATABASE.MEMBERSHIP_CACHE_SIZE,
+            DATABASE.MEMBERSHIP_CACHE_TTL.total_seconds(),
+        )
+        self.user_directory_cache = UserDirectoryCache(
+            DATABASE.USER_DIRECTORY_CACHE_SIZE,
+            DATABASE.USER_DIRECTORY_CACHE_TTL.total_seconds(),
+        )
+        self.membership_broadcast = (
+            MembershipBroadcast(
+                DATABASE.MEMBERSHIP_BROADCAST_DIR,
+                lambda ids: self.membership_cache.invalidate(*ids),
+                lambda session_ids: self.session_cache.invalidate(*session_ids),
+            )
+            if DATABASE.MEMBERSHIP_BROADCAST_DIR
+            else None
+        )
+
+        # The id this process holds leases with (see `acquire_lease`)
+        self.lease_holder = f"{os.getpid()}-{os.urandom(8).hex()}"
+        self.__held_leases: set[str] = set()
+        self.__closed = threading.Event()
+        self.__background_tasks: list[threading.Thread] = []
+        self.__run_periodically(
+            "session-touch-flusher",
+            DATABASE.SESSION_TOUCH_FLUSH_INTERVAL,
+            self.flush_session_touches,
+        )
+        self.__run_periodically(
+            "session-reaper", DATABASE.SESSION_REAP_INTERVAL, self.__reap_sessions
+        )
+        if self.session_tokens is not None:
+            self.sync_session_revocations()
+            self.__run_periodically(
+                "session-revocation-sync",
+                DATABASE.SESSION_REVOCATION_SYNC_INTERVAL,
+                self.sync_session_revocations,
+            )
+        atexit.register(self.close)
+
+    @staticmethod
+    def __create_session_tokens() -> SessionTokens | None:
+        if DATABASE.SESSION_MODE == "database":
+            return None
+        if DATABASE.SESSION_MODE != "signed":
+            raise ValueError(f"Unknown session mode: {DATABASE.SESSION_MODE}")
+        if not DATABASE.SESSION_SECRET:
+            raise ValueError("The signed session mode requires SESSION_SECRET")
+        return SessionTokens(
+            DATABASE.SESSION_SECRET.encode(), DATABASE.SESSION_IDLE_TIMEOUT
+        )
+
+    def __create_write_queue(self) -> tuple[WriteQueue | None, Engine]:
+        # Gets the write queue and the engine requests read through, according to `DATABASE.WRITE_MODE`
+        if DATABASE.WRITE_MODE == "direct":
+            return None, self.engine
+        if DATABASE.WRITE_MODE != "queue":
+            raise ValueError(f"Unknown write mode: {DATABASE.WRITE_MODE}")
+        writer_engine = create_writer_engine(DATABASE.URL)
+        instrument_engine(writer_engine)
+        read_engine = create_read_only_engine(DATABASE.URL)
+        instrument_engine(read_engine)
+        return WriteQueue(writer_engine, DATABASE.WRITE_QUEUE_MAX_BATCH), read_engine
 
     @staticmethod
     def get_instance() -> "Database":
@@ -182,15 +179,95 @@ class Database:
             Database.instance = Database()
         return Database.instance
 
+    def close(self) -> None:
+        """
+        Stops the background workers, flushes the pending session accesses and disposes of the engine.
+        It's registered to run at exit, and it's safe to call more than once.
+
+        Note:
+            Does not require a database session.
+        """
+        if self.__closed.is_set():
+            return
+        self.__closed.set()
+        for task in self.__background_tasks:
+            task.join()
+        self.flush_session_touches()
+        for name in list(self.__held_leases):
+            self.release_lease(name)
+        if self.write_queue is not None:
+            self.write_queue.close()
+            self.write_queue.engine.dispose()
+            self.read_engine.dispose()
+        if self.membership_broadcast is not None:
+            self.membership_broadcast.close()
+        self.engine.dispose()
+
+    def get_stats(self) -> tuple[dict[str, float], dict[str, float]]:
+        """
+        Gets the counters and the current state of the database's caches and connection pool, e.g. for monitoring.
+
+        Note:
+            Does not require a database session.
+
+        Returns:
+            The counters and the gauges, by metric name.
+        """
+        cache = self.session_cache.stats()
+        memberships = self.membership_cache.stats()
+        directory = self.user_directory_cache.stats()
+        counters = {
+            "session_cache_hits_total": cache["hits"],
+            "session_cache_misses_total": cache["misses"],
+            "session_cache_evictions_total": cache["evictions"],
+            "membership_cache_hits_total": memberships["hits"],
+            "membership_cache_misses_total": memberships["misses"],
+            "membership_cache_evictions_total": memberships["evictions"],
+            "user_directory_cache_hits_total": directory["hits"],
+            "user_directory_cache_misses_total": directory["misses"],
+            "user_directory_cache_evictions_total": directory["evictions"],
+        }
+        gauges = {
+            "session_cache_size": cache["size"],
+            "membership_cache_size": memberships["size"],
+            "user_directory_cache_size": directory["size"],
+            "session_touches_pending": len(self.session_touches),
+        }
+        if self.session_tokens is not None:
+            gauges["session_tokens_revoked"] = len(self.session_tokens)
+        if self.write_queue is not None:
+            counters.update(
+                write_queue_operations_total=self.write_queue.operations,
+                write_queue_batches_total=self.write_queue.batches,
+            )
+            gauges["write_queue_pending"] = len(self.write_queue)
+
+        pool = self.read_engine.pool
+        if isinstance(pool, QueuePool):
+            gauges.update(
+                db_pool_size=pool.size(),
+                db_pool_checked_out=pool.checkedout(),
+                db_pool_overflow=max(pool.overflow(), 0),
+            )
+        return counters, gauges
+
     @contextmanager
     def session_scope(self):
         """
         Provides a transactional scope around a series of operations.
+        The members of projects changed within it are invalidated in `self.membership_cache` once it's committed,
+        and the sessions deleted within it in the other workers' session caches.
         """
         session = self.Session()
+        session.info[CHANGED_PROJECTS] = set()
+        session.info[ENDED_SESSIONS] = set()
+        # Members loaded within the scope may predate invalidations made after it began
+        session.info[MEMBERSHIP_GENERATION] = self.membership_cache.generation
         try:
             yield None
             session.commit()
+            self.invalidate_memberships(session.info[CHANGED_PROJECTS])
+            self.invalidate_sessions(session.info[ENDED_SESSIONS])
         except:
             session.rollback()
             raise
@@ -198,12 +275,49 @@ class Database:
             session.close()
             self.Session.remove()
 
+    def invalidate_memberships(self, project_ids: set[int]) -> None:
+        """
+        Removes projects whose members changed from `self.membership_cache`, and tells the other workers to do the same.
+        It's called by `session_scope` once the changes are committed.
+
+        Note:
+            Does not require a database session.
+
+        Args:
+            project_ids: The ids of the projects (`Project.id`).
+        """
+        if not project_ids:
+            return
+        self.membership_cache.invalidate(*project_ids)
+        if self.membership_broadcast is not None:
+            self.membership_broadcast.publish(list(project_ids))
+
+    def invalidate_sessions(self, session_ids: Iterable[str]) -> None:
+        """
+        Removes deleted sessions from `self.session_cache`, and tells the other workers to do the same,
+        so a session that ended on one worker isn't served from another one's cache until it expires there.
+        It's called once the deletions are committed.
+
+        Note:
+            Does not require a database session.
+
+        Args:
+            session_ids: The ids of the sessions (`Session.session_id`).
+        """
+        session_ids = list(session_ids)
+        if not session_ids:
+            return
+        self.session_cache.invalidate(*session_ids)
+        self.session_touches.discard(*session_ids)
+        if self.membership_broadcast is not None:
+            self.membership_broadcast.publish_sessions(session_ids)
+
     def add_user(self, username: str, email: str, password: str) -> User | None:
         """
         Adds a user to the database.
 
         Note:
-        The password is hashed inside this method.
+        The password is hashed inside this method, using `self.password_hasher`.
 
         Args:
             username: The username of the user.
@@ -215,19 +329,65 @@ class Database:
         """
         self.__in_session()
 
-        # Check if the user already exists
-        user = self.select_from(User, or_(User.username == username, User.email == email))
-        if user:
-            return None
+        hashed_password = self.password_hasher.hash(password)
+        values = {"username": username, "email": email, "password": hashed_password}
 
-        hashed_password = self.hash_sha256(password)
-        user = User(username=username, email=email, password=hashed_password)
-        self.Session.add(user)
+        statement = queries.insert_on_conflict_do_nothing(
+            self.engine.dialect.name, User
+        )
+        if statement is not None and self.engine.dialect.insert_returning:
+            # The unique indexes on the normalized username and email take the place of an existence check
+            statement = statement.values(**values).returning(User)
+            return self.__attach(
+                self.__write(lambda db_session: db_session.execute(statement).scalar())
+            )
+
+        def add(db_session: OrmSession) -> User | None:
+            # Check if the user already exists, regardless of case
+            query = select(User).where(
+                or_(
+                    User.username_normalized == User.normalize(username),
+                    User.email_normalized == User.normalize(email),
+                )
+            )
+            if db_session.execute(query).first():
+                return None
 
-        user = self.select_from(User, User.username == username)
-        if user:
+            user = User(**values)
+            db_session.add(user)
+            db_session.flush()
             return user
-        return None
+
+        return self.__attach(self.__write(add))
+
+    def authenticate_user(self, email: str, password: str) -> User | None:
+        """
+        Gets the user with the given email (regardless of case), if the password matches.
+        If the user's password hash is outdated (e.g. a legacy SHA-256 hash), it's replaced with a new one.
+
+        Args:
+            email: The email of the user.
+            password: The password of the user.
+
+        Returns:
+            The user if the email and password are correct, None otherwise.
+        """
+        self.__in_session()
+
+        user = self.select_from(User, User.email_normalized == User.normalize(email))
+        if not user or not self.password_hasher.verify(password, user.password):
+            return None
+
+        if self.password_hasher.needs_rehash(user.password):
+            user_id, hashed_password = user.id, self.password_hasher.hash(password)
+            self.__write(
+                lambda db_session: db_session.execute(
+                    update(User)
+                    .where(User.id == user_id)
+                    .values(password=hashed_password)
+                )
+            )
+        return user
 
     def add_session(self, user_id: int) -> Session | None:
         """
@@ -241,14 +401,116 @@ class Database:
         """
         self.__in_session()
 
-        session_id = self.generate_id()
-        session = Session(session_id=session_id, user_id=user_id)
-        self.Session.add(session)
+        session = Session(session_id=self.generate_id(), user_id=user_id)
 
-        session = self.select_from(Session, Session.session_id == session_id)
-        if session:
+        def add(db_session: OrmSession) -> Session:
+            db_session.add(session)
+            db_session.flush()
             return session
-        return None
+
+        return self.__attach(self.__write(add))
+
+    def start_session(self, user_id: int) -> str:
+        """
+        Starts a session for a user, according to `DATABASE.SESSION_MODE`:
+        adds a `Session` row, or issues a signed token (see `SessionTokens`) without touching the database.
+
+        Args:
+            user_id: The id of the user.
+
+        Returns:
+            The value of the session cookie - the session id or the token.
+        """
+        self.__in_session()
+
+        if self.session_tokens is not None:
+            return self.session_tokens.issue(user_id)
+        return self.add_session(user_id).session_id
+
+    def end_session(self, session_id: str) -> None:
+        """
+        Ends a session - deletes its `Session` row, or revokes it if it's a signed token,
+        along with the tokens it was renewed from and into (see `SessionTokens.renew`).
+        A revoked token is rejected by this worker right away, and by the other workers once they sync (see `sync_session_revocations`).
+
+        Args:
+            session_id: The value of the session cookie.
+        """
+        self.__in_session()
+
+        if not self.__is_token(session_id):
+            self.delete_from(Session, Session.session_id == session_id)
+            return
+
+        revoked = self.session_tokens.revoke(session_id)
+        if revoked:
+            token_id, expires_at = revoked
+            self.__write(
+                lambda db_session: self.__insert_ignoring_duplicates(
+                    db_session,
+                    RevokedSessionToken.__table__,
+                    [{"token_id": token_id, "expires_at": expires_at}],
+                )
+            )
+
+    def renew_session(self, session_id: str) -> str:
+        """
+        Gets the value to refresh the session cookie with, after the session was used.
+        Signed tokens that are older than `DATABASE.SESSION_TOKEN_RENEWAL` are replaced with new ones,
+        the same way using a `Session` extends its lifetime.
+
+        Note:
+            Does not require a database session.
+
+        Args:
+            session_id: The value of the (valid) session cookie.
+
+        Returns:
+            The session id or token to set in the cookie.
+        """
+        if not self.__is_token(session_id):
+            return session_id
+
+        expires_at = self.session_tokens.expires_at(session_id)
+        if expires_at is None:
+            return session_id
+        issued_at = expires_at - self.session_tokens.lifetime
+        if datetime.datetime.now() - issued_at < DATABASE.SESSION_TOKEN_RENEWAL:
+            return session_id
+        # The new token belongs to the same session, so logging out revokes both
+        return self.session_tokens.renew(session_id) or session_id
+
+    def sync_session_revocations(self) -> int:
+        """
+        Loads the tokens revoked (by any worker) since the last sync into the in-memory revocation list.
+        It's called periodically by a background thread in the "signed" session mode.
+
+        Note:
+            Does not require a database session - it runs in its own transaction,
+            so it mustn't be called from within `session_scope`.
+
+        Returns:
+            The amount of revocations that were loaded.
+        """
+        if self.session_tokens is None:
+            return 0
+
+        query = select(
+            RevokedSessionToken.id,
+            RevokedSessionToken.token_id,
+            RevokedSessionToken.expires_at,
+        ).where(
+            RevokedSessionToken.id > self.__last_revocation_id,
+            RevokedSessionToken.expires_at > datetime.datetime.now(),
+        )
+        with self.engine.connect() as connection:
+            rows = connection.execute(query).all()
+        if rows:
+            self.__last_revocation_id = max(row[0] for row in rows)
+        self.session_tokens.add_revocations(
+            {token_id: int(expires_at.timestamp()) for _, token_id, expires_at in rows}
+        )
+        return len(rows)
 
     def add_project(
         self, name: str, description: str, language: str, user_id: int
@@ -276,39 +538,572 @@ class Database:
             description=description,
             language=language,
         )
-        self.Session.add(project)
 
-        project = self.select_from(Project, Project.project_id == project_id)
-        if project:
-            self.add_allowed_user(project.id, user_id)
+        def add(db_session: OrmSession) -> Project:
+            db_session.add(project)
+            db_session.flush()
+            self.__insert_ignoring_duplicates(
+                db_session,
+                AllowedUsers,
+                [{"user_id": user_id, "project_id": project.id}],
+            )
             return project
 
-        return None
+        project = self.__attach(self.__write(add))
+        self.__expire_membership(project.id, user_id)
+        return project
 
     def add_allowed_user(self, project_id: int, user_id: int) -> None:
+        """
+        Allows a user to access a project, and bumps the project's revision.
+        Adding a user that is already allowed doesn't add them again.
+
+        Args:
+            project_id: The id of the project (`Project.id`). The project must exist.
+            user_id: The id of the user. The user must exist.
+        """
         self.__in_session()
 
-        project = self.select_from(Project, Project.id == project_id)
-        user = self.select_from(User, User.id == user_id)
-        if project and user:
-            statement = AllowedUsers.insert().values(
-                user_id=user_id, project_id=project_id
+        def add(db_session: OrmSession) -> None:
+            self.__insert_ignoring_duplicates(
+                db_session,
+                AllowedUsers,
+                [{"user_id": user_id, "project_id": project_id}],
             )
-            self.Session.execute(statement)
+            db_session.execute(queries.bump_revision(project_id))
+
+        self.__write(add)
+        self.__expire_membership(project_id, user_id)
 
     def remove_allowed_user(self, project_id: int, user_id: int) -> None:
+        """
+        Revokes a user's access to a project, and bumps the project's revision.
+
+        Args:
+            project_id: The id of the project (`Project.id`).
+            user_id: The id of the user.
+        """
+        self.__in_session()
+
+        def remove(db_session: OrmSession) -> None:
+            db_session.execute(queries.remove_allowed_users(project_id, [user_id]))
+            db_session.execute(queries.bump_revision(project_id))
+
+        self.__write(remove)
+        self.__expire_membership(project_id, user_id)
+
+    def add_allowed_users(self, project_id: int, emails: list[str]) -> dict[str, str]:
+        """
+        Allows many users to access a project at once, and bumps the project's revision if any were added.
+        The users are resolved with a single query, and added with a single statement.
+
+        Args:
+            project_id: The id of the project (`Project.id`). The project must exist.
+            emails: The emails of the users.
+
+        Returns:
+            The result for each email - "added", "already_allowed" or "not_found".
+        """
+        self.__in_session()
+
+        members = self.__get_members_by_email(project_id, emails)
+        # Differently cased emails of the same user are added once
+        added = list(
+            dict.fromkeys(
+                user_id for user_id, allowed in members.values() if not allowed
+            )
+        )
+        if added:
+
+            def add(db_session: OrmSession) -> None:
+                self.__insert_ignoring_duplicates(
+                    db_session,
+                    AllowedUsers,
+                    [
+                        {"user_id": user_id, "project_id": project_id}
+                        for user_id in added
+                    ],
+                )
+                db_session.execute(queries.bump_revision(project_id))
+
+            self.__write(add)
+            self.__expire_membership(project_id, *added)
+
+        return {
+            email: (
+                "not_found"
+                if email not in members
+                else "already_allowed" if members[email][1] else "added"
+            )
+            for email in emails
+        }
+
+    def remove_allowed_users(
+        self, project_id: int, emails: list[str]
+    ) -> dict[str, str]:
+        """
+        Revokes the access of many users to a project at once, and bumps the project's revision if any were removed.
+        The users are resolved with a single query, and removed with a single statement.
+
+        Args:
+            project_id: The id of the project (`Project.id`).
+            emails: The emails of the users.
+
+        Returns:
+            The result for each email - "removed", "not_allowed" or "not_found".
+        """
+        self.__in_session()
+
+        members = self.__get_members_by_email(project_id, emails)
+        removed = [user_id for user_id, allowed in members.values() if allowed]
+        if removed:
+
+            def remove(db_session: OrmSession) -> None:
+                db_session.execute(queries.remove_allowed_users(project_id, removed))
+                db_session.execute(queries.bump_revision(project_id))
+
+            self.__write(remove)
+            self.__expire_membership(project_id, *removed)
+
+        return {
+            email: (
+                "not_found"
+                if email not in members
+                else "removed" if members[email][1] else "not_allowed"
+            )
+            for email in emails
+        }
+
+    def get_project_files(self, project_id: int) -> list[ProjectFile]:
+        """
+        Gets the files of a project, ordered by their names.
+        They're loaded with a single range scan of the (project_id, name) index, however many projects there are.
+
+        Args:
+            project_id: The id of the project (`Project.id`).
+
+        Returns:
+            The files of the project.
+        """
+        self.__in_session()
+
+        return list(self.Session.execute(queries.project_files(project_id)).scalars())
+
+    def add_project_file(self, project_id: int, name: str) -> ProjectFile | None:
+        """
+        Adds a file to a project.
+
+        Args:
+            project_id: The id of the project (`Project.id`). The project must exist.
+            name: The name of the file.
+
+        Returns:
+            The file if it was added successfully, None if the project already has a file with that name.
+        """
+        self.__in_session()
+
+        values = {"project_id": project_id, "name": name}
+
+        statement = queries.insert_on_conflict_do_nothing(
+            self.engine.dialect.name, ProjectFile
+        )
+        if statement is not None and self.engine.dialect.insert_returning:
+            # The unique constraint on (project_id, name) takes the place of an existence check
+            statement = statement.values(**values).returning(ProjectFile)
+            return self.__attach(
+                self.__write(lambda db_session: db_session.execute(statement).scalar())
+            )
+
+        def add(db_session: OrmSession) -> ProjectFile | None:
+            query = select(ProjectFile).filter_by(**values)
+            if db_session.execute(query).first():
+                return None
+
+            project_file = ProjectFile(**values)
+            db_session.add(project_file)
+            db_session.flush()
+            return project_file
+
+        return self.__attach(self.__write(add))
+
+    def remove_project_file(self, project_id: int, name: str) -> bool:
+        """
+        Removes a file from a project.
+
+        Args:
+            project_id: The id of the project (`Project.id`).
+            name: The name of the file.
+
+        Returns:
+            True if the file was removed, False if the project has no file with that name.
+        """
+        self.__in_session()
+
+        statement = queries.remove_project_files(project_id, [name])
+        return self.__write(
+            lambda db_session: db_session.execute(statement).rowcount > 0
+        )
+
+    def import_project_files(self, files: list[tuple[str, str]]) -> int:
+        """
+        Adds files to projects in bulk, e.g. when the realtime servers register the files they already store.
+        Files that already exist, and files of projects that don't exist, are skipped.
+
+        Args:
+            files: The (public project id, file name) of every file.
+
+        Returns:
+            The amount of files whose project exists.
+        """
+        self.__in_session()
+
+        ids = dict(
+            self.Session.execute(
+                queries.projects_by_public_id(
+                    list({project_id for project_id, _ in files})
+                )
+            ).all()
+        )
+        rows = [
+            {"project_id": ids[project_id], "name": name}
+            for project_id, name in files
+            if project_id in ids
+        ]
+        if rows:
+            self.__write(
+                lambda db_session: self.__insert_ignoring_duplicates(
+                    db_session, ProjectFile.__table__, rows
+                )
+            )
+        return len(rows)
+
+    def __get_members_by_email(
+        self, project_id: int, emails: list[str]
+    ) -> dict[str, tuple[int, bool]]:
+        # Maps every email of an existing user to their id, and whether they're allowed to access the project.
+        # Emails are matched case-insensitively, through the normalized email index.
+        normalized = {email: User.normalize(email) for email in emails}
+        query = queries.members_by_email(project_id, list(set(normalized.values())))
+        found = {
+            email: (user_id, allowed)
+            for email, user_id, allowed in self.Session.execute(query)
+        }
+        return {
+            email: found[normalized[email]]
+            for email in emails
+            if normalized[email] in found
+        }
+
+    def __write(self, operation: Callable[[OrmSession], T]) -> T:
+        # Runs a write in the current session, or on the writer thread of `self.write_queue` if it's enabled.
+        # Queued writes are committed once they return, so the current (read-only) transaction is ended to see them,
+        # which also expires the rows loaded by the current session, like a commit would.
+        if self.write_queue is None:
+            return operation(self.Session)
+        result = self.write_queue.submit(operation)
+        self.Session.rollback()
+        return result
+
+    def __write_in_own_transaction(
+        self, operation: Callable[[Connection | OrmSession], T]
+    ) -> T:
+        # Runs a write outside of any request (e.g. of a background thread) in its own transaction,
+        # or on the writer thread of `self.write_queue` if it's enabled, so it never competes with it for the write lock.
+        if self.write_queue is None:
+            with self.engine.begin() as connection:
+                return operation(connection)
+        return self.write_queue.submit(operation)
+
+    def __attach(self, row: T) -> T:
+        # Rows added through `self.write_queue` belong to the writer's session,
+        # they're merged into the current one without loading them again
+        if row is None or self.write_queue is None:
+            return row
+        return self.Session.merge(row, load=False)
+
+    def __insert_ignoring_duplicates(
+        self, db_session: OrmSession, table: Table, rows: list[dict[str, Any]]
+    ) -> None:
+        if not rows:
+            return
+
+        statement = queries.insert_on_conflict_do_nothing(
+            self.engine.dialect.name, table
+        )
+        if statement is None:
+            # Without ON CONFLICT support, rows that already exist are skipped beforehand
+            rows = [
+                row
+                for row in rows
+                if not db_session.execute(select(table).filter_by(**row)).first()
+            ]
+            if not rows:
+                return
+            statement = table.insert()
+        db_session.execute(statement, rows)
+
+    def __expire_membership(self, project_id: int, *user_ids: int) -> None:
+        if self.write_queue is not None:
+            # The change is committed already, and `__write` expired the rows of the current session
+            self.invalidate_memberships({project_id})
+            return
+
+        self.Session.info.setdefault(CHANGED_PROJECTS, set()).add(project_id)
+        # The statements above bypass the ORM, so already loaded collections have to be reloaded
+        project = self.Session.identity_map.get(
+            self.Session.identity_key(Project, project_id)
+        )
+        if project is not None:
+            self.Session.expire(
+                project, ["allowed_users", "revision", "last_updated_at"]
+            )
+        for user_id in user_ids:
+            user = self.Session.identity_map.get(
+                self.Session.identity_key(User, user_id)
+            )
+            if user is not None:
+                self.Session.expire(user, ["projects"])
+
+    def get_user_by_email(self, email: str) -> User | None:
+        """
+        Gets a user by their email, case-insensitively, through the normalized email index.
+
+        Args:
+            email: The email of the user.
+
+        Returns:
+            The user if it exists, None otherwise.
+        """
+        self.__in_session()
+
+        return self.Session.execute(
+            queries.user_by_email(User.normalize(email))
+        ).scalar()
+
+    def search_users(self, prefix: str, limit: int) -> list[dict[str, Any]]:
+        """
+        Finds the users whose username or email start with a prefix (case-insensitively), for autocompleting them.
+        The first `DATABASE.USER_DIRECTORY_LIMIT` users are read from the normalized username and email indexes alone,
+        and cached in `self.user_directory_cache` - which also answers the longer prefixes typed next, when it has every match.
+
+        Args:
+            prefix: The start of the username or email.
+            limit: The maximum amount of users to get, up to `DATABASE.USER_DIRECTORY_LIMIT`.
+
+        Returns:
+            The users (as `User.to_dict` does), ordered by their username.
+        """
+        self.__in_session()
+
+        prefix = User.normalize(prefix)
+        users = self.user_directory_cache.get(prefix)
+        if users is None:
+            rows = self.Session.execute(
+                queries.users_by_prefix(prefix, DATABASE.USER_DIRECTORY_LIMIT)
+            ).all()
+            users, complete = queries.first_users(rows, DATABASE.USER_DIRECTORY_LIMIT)
+            self.user_directory_cache.put(prefix, users, complete)
+        return users[:limit]
+
+    def get_project(self, project_id: str) -> Project | None:
+        """
+        Gets a project along with its allowed users.
+        The allowed users are loaded eagerly, so checking access and serializing the project costs a constant amount of queries.
+
+        Args:
+            project_id: The public id of the project (`Project.project_id`).
+
+        Returns:
+            The project if it exists, None otherwise.
+        """
+        self.__in_session()
+
+        return self.Session.execute(queries.project(project_id)).scalar()
+
+    def get_project_version(
+        self, project_id: str, user_id: int
+    ) -> tuple[int, datetime.datetime] | None:
+        """
+        Gets the revision of a project the user is allowed to access, without loading the project.
+
+        Args:
+            project_id: The public id of the project (`Project.project_id`).
+            user_id: The id of the user.
+
+        Returns:
+            The project's revision and the time it was last updated,
+            or None if the project doesn't exist or the user isn't allowed to access it.
+        """
+        self.__in_session()
+
+        row = self.Session.execute(queries.project_version(project_id, user_id)).first()
+        return (row[0], row[1]) if row else None
+
+    def get_user_projects_version(
+        self,
+        user_id: int,
+        limit: int | None = None,
+        after: tuple[datetime.datetime, int] | None = None,
+        language: str | None = None,
+        name: str | None = None,
+    ) -> tuple[str, datetime.datetime | None]:
+        """
+        Gets a version of a page of the projects a user is allowed to access, without loading the projects.
+        The version changes whenever a project is added to or removed from the page, or one of its projects changes.
+        It's computed from the page's rows alone (with the same index range scan as `get_user_projects`),
+        so its cost scales with the page rather than with the amount of projects the user has.
+
+        Args:
+            user_id: The id of the user.
+            limit, after, language, name: The page, as passed to `get_user_projects`.
+
+        Returns:
+            The version - a hexadecimal string, and the last time one of the projects was updated (None if there are none).
+        """
+        self.__in_session()
+
+        query = queries.user_projects_revisions(user_id, limit, after, language, name)
+        return queries.projects_version(self.Session.execute(query).all())
+
+    def get_user_projects(
+        self,
+        user_id: int,
+        limit: int | None = None,
+        after: tuple[datetime.datetime, int] | None = None,
+        language: str | None = None,
+        name: str | None = None,
+        with_allowed_users: bool = True,
+    ) -> list[Project]:
+        """
+        Gets the projects a user is allowed to access, ordered by their creation time.
+        The allowed users of all the projects are loaded together, so listing N projects costs two queries rather than N + 1.
+
+        Args:
+            user_id: The id of the user.
+            limit: The maximum amount of projects to get, None for all of them.
+            after: The (created_at, id) of the last project of the previous page, to get the projects that come after it.
+            language: Only get the projects with this language.
+            name: Only get the projects whose name contains this (case-insensitive).
+            with_allowed_users: Whether to load the allowed users of the projects.
+
+        Returns:
+            The user's projects.
+        """
+        self.__in_session()
+
+        query = queries.user_projects(
+            user_id, limit, after, language, name, with_allowed_users
+        )
+        return list(self.Session.execute(query).scalars())
+
+    def search_projects(
+        self,
+        user_id: int,
+        terms: list[str],
+        limit: int,
+        with_allowed_users: bool = True,
+    ) -> list[Project]:
+        """
+        Searches the projects a user is allowed to access, for the ones whose name, description or language contain every term.
+        When `self.full_text_search` is enabled (SQLite with FTS5), the terms are matched as words (the last one as a prefix)
+        through the FTS5 index of the projects, and the best matches come first. Otherwise, they're matched as substrings,
+        and the oldest projects come first.
+
+        Args:
+            user_id: The id of the user.
+            terms: The words to search for.
+            limit: The maximum amount of projects to get.
+            with_allowed_users: Whether to load the allowed users of the projects.
+
+        Returns:
+            The matching projects.
+        """
+        self.__in_session()
+
+        query = queries.search_projects(
+            user_id, terms, limit, self.full_text_search, with_allowed_users
+        )
+        return list(self.Session.execute(query).scalars())
+
+    def get_project_members(self, project_id: str) -> frozenset[int] | None:
+        """
+        Gets the ids of a project's allowed users, without loading the project.
+        They're served from `self.membership_cache` when possible, otherwise they're loaded with a single query and cached.
+        Projects changed within the current session are always loaded, since they're invalidated only once it's committed.
+
+        Args:
+            project_id: The public id of the project (`Project.project_id`).
+
+        Returns:
+            The ids of the project's allowed users if the project exists, None otherwise.
+        """
         self.__in_session()
 
-        statement = delete(AllowedUsers).where(
-            (AllowedUsers.c.user_id == user_id)
-            & (AllowedUsers.c.project_id == project_id)
+        changed = self.Session.info.get(CHANGED_PROJECTS, set())
+        cached = self.membership_cache.get(project_id)
+        if cached is not None and cached[0] not in changed:
+            return cached[1]
+
+        rows = self.Session.execute(queries.project_members(project_id)).all()
+        if not rows:
+            return None
+        id = rows[0][0]
+        members = frozenset(user_id for _, user_id in rows if user_id is not None)
+        if id not in changed:
+            generation = self.Session.info.get(
+                MEMBERSHIP_GENERATION, self.membership_cache.generation
+            )
+            self.membership_cache.put(project_id, id, members, generation)
+        return members
+
+    def has_project_access(self, project_id: str, user_id: int) -> bool:
+        """
+        Checks if a user is allowed to access a project.
+        Unlike loading the project and its allowed users, this is a set lookup in the project's cached members
+        (see `get_project_members`).
+
+        Args:
+            project_id: The public id of the project (`Project.project_id`).
+            user_id: The id of the user.
+
+        Returns:
+            True if the user is one of the project's allowed users, False otherwise.
+        """
+        members = self.get_project_members(project_id)
+        return members is not None and user_id in members
+
+    def authorize_sessions(
+        self, pairs: list[tuple[str, str]]
+    ) -> dict[str, dict[str, bool]]:
+        """
+        Checks if many sessions may access projects at once, like `get_session_user_id` followed by `has_project_access`.
+        The sessions that aren't cached are validated along with their memberships in a single query,
+        and the memberships of the cached ones are fetched with another one (see `BatchAuthorization`).
+        Unlike `validate_session`, expired sessions aren't deleted, they're left to the reaper.
+
+        Args:
+            pairs: The (session id, project id) pairs to check, project ids are the public `Project.project_id`.
+
+        Returns:
+            Whether each session may access each of its projects, by session id and then project id.
+        """
+        self.__in_session()
+
+        authorization = BatchAuthorization(
+            pairs, self.session_tokens, self.session_cache, self.session_touches
         )
-        self.Session.execute(statement)
+        query = authorization.sessions_query()
+        if query is not None:
+            authorization.add_session_rows(self.Session.execute(query))
+        query = authorization.memberships_query()
+        if query is not None:
+            authorization.add_membership_rows(self.Session.execute(query))
+        return authorization.verdicts()
 
     def validate_session(self, session_id: str) -> bool:
         """
         Validates a session by checking if it exists AND if it hasn't expired.
-        Updates the session's last_accessed_at field if the session is valid.
+        Records an access to the session if it's valid (see `flush_session_touches`).
         Otherwise, deletes the session from the database.
 
         Args:
@@ -319,24 +1114,288 @@ class Database:
         """
         self.__in_session()
 
+        return self.__validate_session(session_id) is not None
+
+    def get_session_user_id(self, session_id: str) -> int | None:
+        """
+        Gets the id of the user that owns a session, if the session is valid.
+        Recently validated sessions are served from `self.session_cache` without touching the database,
+        otherwise the session is validated like in `validate_session` and then cached.
+
+        Args:
+            session_id: The session id to validate.
+
+        Returns:
+            The id of the session's user if the session is valid, None otherwise.
+        """
+        self.__in_session()
+
+        if self.__is_token(session_id):
+            # Signed tokens are verified from memory
+            return self.session_tokens.verify(session_id)
+        if self.session_tokens is not None and not DATABASE.SIGNED_MODE_SESSION_ROWS:
+            return None
+
+        user_id = self.session_cache.get(session_id)
+        if user_id is not None:
+            self.session_touches.touch(session_id)
+            return user_id
+
+        session = self.__validate_session(session_id)
+        if session is None:
+            return None
+
+        self.session_cache.put(session_id, session.user_id)
+        return session.user_id
+
+    def __validate_session(self, session_id: str) -> Session | None:
         session = self.select_from(Session, Session.session_id == session_id)
         if session:
-            last_accessed_at = session.last_accessed_at
+            # An access that wasn't flushed yet is newer than the one in the database
+            last_accessed_at = max(
+                session.last_accessed_at,
+                self.session_touches.last_touch(session_id) or session.last_accessed_at,
+            )
             # The time passed since the session was last accessed is less than the session idle timeout
             if (
                 datetime.datetime.now() - last_accessed_at
             ) < DATABASE.SESSION_IDLE_TIMEOUT:
+                self.session_touches.touch(session_id)
+                return session
+
+            self.delete_from(Session, Session.session_id == session_id)
+        return None
+
+    def flush_session_touches(self) -> int:
+        """
+        Writes the buffered session accesses to the sessions' last_accessed_at field.
+        The sessions are updated in batches of `UPDATE ... WHERE session_id IN (...)`, one batch per access time.
+        It's called periodically by a background thread, and when the database is closed.
+
+        Note:
+            Does not require a database session - it runs in its own transaction,
+            so it mustn't be called from within `session_scope`.
+
+        Returns:
+            The amount of sessions that were flushed.
+        """
+        batches = self.session_touches.drain()
+        if not batches:
+            return 0
+
+        try:
+            self.__write_in_own_transaction(
+                lambda executor: self.__touch_sessions(executor, batches)
+            )
+        except:
+            self.session_touches.restore(batches)
+            raise
+        return sum(len(session_ids) for session_ids in batches.values())
+
+    @staticmethod
+    def __touch_sessions(
+        executor: Connection | OrmSession,
+        batches: dict[datetime.datetime, list[str]],
+    ) -> None:
+        for accessed_at, session_ids in batches.items():
+            for i in range(0, len(session_ids), 500):
                 statement = (
                     update(Session)
-                    .where(Session.session_id == session_id)
-                    .values(last_accessed_at=datetime.datetime.now())
+                    .where(
+                        Session.session_id.in_(session_ids[i : i + 500]),
+                        Session.last_accessed_at < accessed_at,
+                    )
+                    .values(last_accessed_at=accessed_at)
+                    .execution_options(synchronize_session=False)
+                )
+                executor.execute(statement)
+
+    def reap_sessions(
+        self,
+        batch_size: int = DATABASE.SESSION_REAP_BATCH_SIZE,
+        max_batches: int = DATABASE.SESSION_REAP_MAX_BATCHES,
+        max_per_user: int | None = DATABASE.MAX_SESSIONS_PER_USER,
+    ) -> int:
+        """
+        Deletes expired sessions, and optionally the sessions exceeding a per-user limit.
+        Sessions are deleted in batches, each in its own short transaction, so the write lock is never held for long.
+        It's called periodically by a background thread.
+
+        Note:
+            Does not require a database session - it runs in its own transactions,
+            so it mustn't be called from within `session_scope`.
+
+        Args:
+            batch_size: The maximum amount of sessions deleted per transaction.
+            max_batches: The maximum amount of batches (of each kind) per call.
+            max_per_user: The maximum amount of sessions a user may have, None for no limit.
+                The least recently accessed sessions are deleted first.
+
+        Returns:
+            The amount of sessions that were deleted.
+        """
+        # Pending accesses are flushed first, so sessions that are still in use aren't considered expired
+        self.flush_session_touches()
+        # Accesses buffered by other workers may be up to a flush interval late
+        cutoff = (
+            datetime.datetime.now()
+            - DATABASE.SESSION_IDLE_TIMEOUT
+            - DATABASE.SESSION_TOUCH_FLUSH_INTERVAL
+        )
+        expired = (
+            select(Session.id, Session.session_id)
+            .where(Session.last_accessed_at < cutoff)
+            .limit(batch_size)
+        )
+        removed = self.__delete_sessions_in_batches(expired, max_batches)
+
+        if max_per_user is not None:
+            ranked = select(
+                Session.id,
+                Session.session_id,
+                func.row_number()
+                .over(
+                    partition_by=Session.user_id,
+                    order_by=(Session.last_accessed_at.desc(), Session.id.desc()),
                 )
-                self.Session.execute(statement)
+                .label("rank"),
+            ).subquery()
+            excess = (
+                select(ranked.c.id, ranked.c.session_id)
+                .where(ranked.c.rank > max_per_user)
+                .limit(batch_size)
+            )
+            removed += self.__delete_sessions_in_batches(excess, max_batches)
+
+        return removed
+
+    def __delete_sessions_in_batches(self, query: Select, max_batches: int) -> int:
+        removed = 0
+        for _ in range(max_batches):
+            rows = self.__write_in_own_transaction(
+                lambda executor: self.__delete_sessions(executor, query)
+            )
+            if not rows:
+                break
+
+            self.invalidate_sessions(row[1] for row in rows)
+            removed += len(rows)
+        return removed
+
+    @staticmethod
+    def __delete_sessions(
+        executor: Connection | OrmSession, query: Select
+    ) -> list[Row[Any]]:
+        # Deletes the sessions the query selects (their id first), and returns its rows
+        rows = executor.execute(query).all()
+        if rows:
+            executor.execute(
+                delete(Session)
+                .where(Session.id.in_([row[0] for row in rows]))
+                .execution_options(synchronize_session=False)
+            )
+        return rows
+
+    def acquire_lease(self, name: str, duration: datetime.timedelta) -> bool:
+        """
+        Takes (or renews) a lease on a background task, unless another process holds it and it hasn't expired yet.
+        The holder must renew it before it expires, by calling this method again.
+
+        Note:
+            Does not require a database session - it runs in its own transaction.
+
+        Args:
+            name: The name of the task.
+            duration: How long the lease is held for.
 
+        Returns:
+            True if this process holds the lease now, False otherwise.
+        """
+        now = datetime.datetime.now()
+
+        def acquire(executor: Connection | OrmSession) -> bool:
+            renewed = executor.execute(
+                update(Lease)
+                .where(
+                    Lease.name == name,
+                    or_(Lease.holder == self.lease_holder, Lease.expires_at < now),
+                )
+                .values(holder=self.lease_holder, expires_at=now + duration)
+                .execution_options(synchronize_session=False)
+            )
+            if renewed.rowcount:
                 return True
+            if executor.execute(select(Lease.name).where(Lease.name == name)).first():
+                return False
+            executor.execute(
+                insert(Lease).values(
+                    name=name, holder=self.lease_holder, expires_at=now + duration
+                )
+            )
+            return True
 
-            self.delete_from(Session, Session.session_id == session_id)
-        return False
+        try:
+            acquired = self.__write_in_own_transaction(acquire)
+        except IntegrityError:
+            # Another process created the lease at the same time
+            acquired = False
+        if acquired:
+            self.__held_leases.add(name)
+        else:
+            self.__held_leases.discard(name)
+        return acquired
+
+    def release_lease(self, name: str) -> None:
+        """
+        Gives up a lease taken with `acquire_lease`, so another process can take it over right away.
+
+        Note:
+            Does not require a database session - it runs in its own transaction.
+
+        Args:
+            name: The name of the task.
+        """
+        self.__held_leases.discard(name)
+        self.__write_in_own_transaction(
+            lambda executor: executor.execute(
+                delete(Lease)
+                .where(Lease.name == name, Lease.holder == self.lease_holder)
+                .execution_options(synchronize_session=False)
+            )
+        )
+
+    def __reap_sessions(self) -> None:
+        # Every worker runs this task, but only the holder of the lease reaps - the others would only compete with it.
+        # It's held for two intervals, so the holder renews it in time, and another worker takes over if the holder is gone.
+        if not self.acquire_lease("session-reaper", DATABASE.SESSION_REAP_INTERVAL * 2):
+            return
+
+        removed = self.reap_sessions()
+        if removed:
+            print(f"[session-reaper] Removed {removed} sessions")
+
+        # Revocations of tokens that expired anyway aren't needed anymore
+        self.__write_in_own_transaction(
+            lambda executor: executor.execute(
+                delete(RevokedSessionToken)
+                .where(RevokedSessionToken.expires_at < datetime.datetime.now())
+                .execution_options(synchronize_session=False)
+            )
+        )
+
+    def __run_periodically(
+        self, name: str, interval: datetime.timedelta, task: Callable[[], Any]
+    ) -> None:
+        def run() -> None:
+            while not self.__closed.wait(interval.total_seconds()):
+                try:
+                    task()
+                except Exception as e:
+                    print(f"[{name}] {type(e).__name__}: {e}")
+
+        thread = threading.Thread(target=run, name=name, daemon=True)
+        thread.start()
+        self.__background_tasks.append(thread)
 
     def select_from(
         self, table: Type[tables], *filters: ColumnExpressionArgument[bool]
@@ -386,6 +1445,8 @@ class Database:
         Deletes a row from the database.
 
         Internally, it calls the `self.select_from` method to get the row to delete.
+        Deleting a session also removes it from `self.session_cache`,
+        and deleting a project deletes its files, and removes it from `self.membership_cache` once the session is committed.
 
         Args:
             table: The table to delete from.
@@ -394,8 +1455,40 @@ class Database:
         self.__in_session()
 
         row = self.select_from(table, *filters)
-        if row:
+        if not row:
+            return
+
+        session_id = row.session_id if isinstance(row, Session) else None
+        if session_id is not None:
+            self.session_cache.invalidate(session_id)
+            self.session_touches.discard(session_id)
+        if self.write_queue is None:
+            if session_id is not None:
+                # The other workers are told once the deletion is committed
+                self.Session.info.setdefault(ENDED_SESSIONS, set()).add(session_id)
+            if isinstance(row, Project):
+                self.Session.info.setdefault(CHANGED_PROJECTS, set()).add(row.id)
+                self.Session.execute(queries.remove_project_files(row.id))
             self.Session.delete(row)
+            return
+
+        identity = inspect(row).identity
+
+        def delete_row(db_session: OrmSession) -> None:
+            row = db_session.get(table, identity)
+            if row is not None:
+                if isinstance(row, Project):
+                    db_session.execute(queries.remove_project_files(row.id))
+                db_session.delete(row)
+
+        self.__write(delete_row)
+        if table is Project:
+            self.invalidate_memberships({identity[0]})
+        if session_id is not None:
+            self.invalidate_sessions([session_id])
+
+    def __is_token(self, session_id: str) -> bool:
+        return self.session_tokens is not None and SessionTokens.is_token(session_id)
 
     def __in_session(self):
         if not self.Session:
@@ -421,6 +1514,7 @@ class Database:
     def hash_sha256(password: str) -> str:
         """
         Hashes a password using the SHA-256 algorithm.
+        Passwords are no longer stored this way (see `PasswordHasher`), but older hashes are still accepted.
 
         Note:
             Does not require a database session.
@@ -0,0 +1,221 @@
+import time
+from typing import Any
+
+from sqlalchemy import Engine, create_engine, event, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import (
+    AsyncAdaptedQueuePool,
+    Pool,
+    PoolProxiedConnection,
+    QueuePool,
+)
+
+from utils.const import DATABASE
+from utils.metrics import Metrics
+
+# The asyncio drivers used by `create_async_database_engine`, by the driver of the synchronous URL
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+
+class _TimedCheckouts(Pool):
+    """
+    Reports how long every checkout from the pool took to `Metrics` - including waiting for a connection
+    when all of them are checked out, and opening a new one.
+    SQLAlchemy's `checkout` event only fires once a connection is handed out, so `connect` is timed instead.
+    """
+
+    def connect(self) -> PoolProxiedConnection:
+        started_at = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            Metrics.get_instance().record_pool_checkout(
+                time.perf_counter() - started_at
+            )
+
+
+class TimedQueuePool(_TimedCheckouts, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckouts, AsyncAdaptedQueuePool):
+    pass
+
+
+def create_database_engine(url: str = DATABASE.URL) -> Engine:
+    """
+    Creates the engine used by `Database`, tuned according to `DATABASE`.
+
+    SQLite databases get the `DATABASE.SQLITE_PRAGMAS` applied to every new connection
+    (WAL journaling, relaxed syncing, a busy timeout instead of immediate `database is locked` errors, etc.).
+    File databases, as well as any other database, use a `QueuePool` sized for the threads of a worker (see `TimedQueuePool`).
+
+    Args:
+        url: The SQLAlchemy URL of the database.
+
+    Returns:
+        The engine.
+    """
+    engine = create_engine(url, **_engine_options(url, TimedQueuePool))
+    if make_url(url).get_backend_name() == "sqlite":
+        _apply_sqlite_pragmas(engine)
+    return engine
+
+
+def create_writer_engine(url: str = DATABASE.URL) -> Engine:
+    """
+    Creates the engine of `WriteQueue`'s writer thread, tuned like the one of `create_database_engine` but with a single connection.
+
+    SQLite transactions begin with BEGIN IMMEDIATE, so the write lock is taken up front rather than on the first write.
+    pysqlite's own transaction handling is disabled for that, which also makes SAVEPOINTs (`begin_nested`) work.
+
+    Args:
+        url: The SQLAlchemy URL of the database.
+
+    Returns:
+        The engine.
+    """
+    options = _engine_options(url, TimedQueuePool)
+    if "poolclass" in options:
+        options.update(pool_size=1, max_overflow=0)
+    engine = create_engine(url, **options)
+    if make_url(url).get_backend_name() == "sqlite":
+        _apply_sqlite_pragmas(engine)
+
+        @event.listens_for(engine, "connect")
+        def disable_pysqlite_transactions(dbapi_connection, connection_record) -> None:
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(engine, "begin")
+        def begin_immediate(connection) -> None:
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return engine
+
+
+def create_read_only_engine(url: str = DATABASE.URL) -> Engine:
+    """
+    Creates the engine `Database` reads through when its writes go through a `WriteQueue`.
+    SQLite file databases are opened read-only, so a write that bypasses the queue fails instead of taking the write lock.
+    Other databases are opened like in `create_database_engine`.
+
+    Args:
+        url: The SQLAlchemy URL of the database.
+
+    Returns:
+        The engine.
+    """
+    parsed_url = make_url(url)
+    if parsed_url.get_backend_name() == "sqlite" and parsed_url.database not in (
+        None,
+        "",
+        ":memory:",
+    ):
+        parsed_url = parsed_url.set(
+            database=f"file:{parsed_url.database}",
+            query={**parsed_url.query, "mode": "ro", "uri": "true"},
+        )
+        url = parsed_url.render_as_string(hide_password=False)
+    return create_database_engine(url)
+
+
+def create_async_database_engine(url: str = DATABASE.URL) -> AsyncEngine:
+    """
+    Creates the engine used by `AsyncDatabase`, tuned like the one of `create_database_engine`.
+    The URL's driver is replaced with an asyncio one (see `to_async_url`), e.g. SQLite is accessed through aiosqlite.
+
+    Args:
+        url: The SQLAlchemy URL of the database, the same one `Database` uses.
+
+    Returns:
+        The engine.
+    """
+    url = to_async_url(url)
+    engine = create_async_engine(
+        url, **_engine_options(url, TimedAsyncAdaptedQueuePool)
+    )
+    if make_url(url).get_backend_name() == "sqlite":
+        _apply_sqlite_pragmas(engine.sync_engine)
+    return engine
+
+
+def to_async_url(url: str) -> str:
+    """
+    Gets the URL of the same database with an asyncio driver, if it doesn't specify one already.
+
+    Args:
+        url: A SQLAlchemy URL, e.g. "sqlite:///database.db".
+
+    Returns:
+        The URL with an asyncio driver, e.g. "sqlite+aiosqlite:///database.db".
+    """
+    parsed_url = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed_url.drivername)
+    if driver is None:
+        return url
+    return parsed_url.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def _engine_options(url: str, poolclass: type[Pool]) -> dict[str, Any]:
+    parsed_url = make_url(url)
+    is_sqlite = parsed_url.get_backend_name() == "sqlite"
+    in_memory = is_sqlite and parsed_url.database in (None, "", ":memory:")
+
+    options: dict[str, Any] = {"echo": False}
+    if not in_memory:
+        options.update(
+            poolclass=poolclass,
+            pool_size=DATABASE.POOL_SIZE,
+            max_overflow=DATABASE.POOL_MAX_OVERFLOW,
+            pool_timeout=DATABASE.POOL_TIMEOUT,
+            pool_recycle=DATABASE.POOL_RECYCLE,
+        )
+    if not is_sqlite:
+        options.update(pool_pre_ping=True)
+    return options
+
+
+def _apply_sqlite_pragmas(engine: Engine) -> None:
+    @event.listens_for(engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        for name, value in DATABASE.SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Reports every statement the engine executes, and every `database is locked` error, to `Metrics`.
+
+    Args:
+        engine: The engine to instrument.
+    """
+    metrics = Metrics.get_instance()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(
+        connection, cursor, statement, parameters, context, executemany
+    ) -> None:
+        connection.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(
+        connection, cursor, statement, parameters, context, executemany
+    ) -> None:
+        started_at = connection.info["query_started_at"].pop()
+        metrics.record_query(statement, time.perf_counter() - started_at)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context) -> None:
+        if context.connection is not None:
+            started = context.connection.info.get("query_started_at")
+            if started:
+                started.pop()
+        if "database is locked" in str(context.original_exception):
+            metrics.record_lock_error()
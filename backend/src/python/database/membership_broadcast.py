@@ -0,0 +1,163 @@
+import atexit
+import os
+import shutil
+import socket
+import tempfile
+import threading
+
+from typing import Callable
+
+
+class MembershipBroadcast:
+    """
+    Pushes membership invalidations to the other workers on the same machine, so their `MembershipCache` doesn't
+    serve members that changed until the entries expire - and the same for ended sessions and their `SessionCache`.
+
+    Every worker binds a Unix datagram socket named after its pid in a shared directory,
+    and publishing sends a datagram with the changed project ids (or the ended session ids) to every other socket in it.
+    Sockets left behind by workers that died are removed when sending to them fails.
+    Sending never blocks - a worker whose socket is full misses the invalidation, and its entries expire instead.
+    """
+
+    # Ids are sent as comma-separated text after a byte telling their kind, in datagrams of up to this many bytes
+    MAX_DATAGRAM_SIZE = 8192
+    PROJECTS = b"p"
+    SESSIONS = b"s"
+
+    def __init__(
+        self,
+        directory: str,
+        on_invalidate: Callable[[list[int]], None],
+        on_sessions_ended: Callable[[list[str]], None] | None = None,
+    ):
+        """
+        Args:
+            directory: The directory the workers' sockets are in. It's created if it doesn't exist.
+            on_invalidate: Called (on the listener thread) with the ids of the projects changed by another worker.
+            on_sessions_ended: Called (on the listener thread) with the ids of the sessions another worker ended.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.path = os.path.join(directory, f"{os.getpid()}.sock")
+        self.__on_invalidate = on_invalidate
+        self.__on_sessions_ended = on_sessions_ended
+        self.__closed = threading.Event()
+
+        if os.path.exists(self.path):
+            # Left behind by a previous process with the same pid
+            os.unlink(self.path)
+        self.__socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.__socket.bind(self.path)
+        self.__socket.settimeout(1.0)
+        self.__sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.__sender.setblocking(False)
+        self.__listener = threading.Thread(
+            target=self.__listen, name="membership-broadcast", daemon=True
+        )
+        self.__listener.start()
+
+    @staticmethod
+    def share_between_workers() -> None:
+        """
+        Makes the workers started after this call (forked or spawned) broadcast to each other,
+        through a new temporary directory, unless `DATABASE.MEMBERSHIP_BROADCAST_DIR` is configured already.
+        It's called by the production servers' master process, and the directory is removed once it exits.
+        """
+        from utils.const import DATABASE
+
+        if DATABASE.MEMBERSHIP_BROADCAST_DIR:
+            return
+        directory = tempfile.mkdtemp(prefix="collab-ide-broadcast-")
+        # Forked workers inherit the setting, spawned ones read it from the environment
+        DATABASE.MEMBERSHIP_BROADCAST_DIR = os.environ["MEMBERSHIP_BROADCAST_DIR"] = (
+            directory
+        )
+        master = os.getpid()
+
+        def remove() -> None:
+            # Forked workers run the exit handlers of the master too
+            if os.getpid() == master:
+                shutil.rmtree(directory, ignore_errors=True)
+
+        atexit.register(remove)
+
+    def publish(self, ids: list[int]) -> None:
+        """
+        Tells the other workers that the members of projects changed.
+
+        Args:
+            ids: The ids of the projects (`Project.id`).
+        """
+        self.__send(self.__encode(self.PROJECTS, [str(id) for id in ids]))
+
+    def publish_sessions(self, session_ids: list[str]) -> None:
+        """
+        Tells the other workers that sessions ended.
+
+        Args:
+            session_ids: The ids of the sessions (`Session.session_id`).
+        """
+        self.__send(self.__encode(self.SESSIONS, session_ids))
+
+    def __send(self, datagrams: list[bytes]) -> None:
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.endswith(".sock") or path == self.path:
+                continue
+            try:
+                for datagram in datagrams:
+                    self.__sender.sendto(datagram, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # The worker is gone
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            except OSError as e:
+                print(f"[membership-broadcast] {type(e).__name__}: {e}")
+
+    def close(self) -> None:
+        """
+        Stops listening and removes this worker's socket. It's safe to call more than once.
+        """
+        if self.__closed.is_set():
+            return
+        self.__closed.set()
+        self.__listener.join()
+        self.__socket.close()
+        self.__sender.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __listen(self) -> None:
+        while not self.__closed.is_set():
+            try:
+                datagram = self.__socket.recv(self.MAX_DATAGRAM_SIZE)
+            except socket.timeout:
+                continue
+            except OSError as e:
+                print(f"[membership-broadcast] {type(e).__name__}: {e}")
+                continue
+            kind, ids = datagram[:1], datagram[1:].split(b",")
+            try:
+                if kind == self.PROJECTS:
+                    self.__on_invalidate([int(id) for id in ids])
+                elif kind == self.SESSIONS and self.__on_sessions_ended is not None:
+                    self.__on_sessions_ended([id.decode() for id in ids])
+            except ValueError:
+                continue
+
+    def __encode(self, kind: bytes, ids: list[str]) -> list[bytes]:
+        # Splits the ids into datagrams that fit in `MAX_DATAGRAM_SIZE`, each starting with their kind
+        datagrams, current = [], b""
+        for id in ids:
+            encoded = id.encode()
+            if current and len(current) + 1 + len(encoded) > self.MAX_DATAGRAM_SIZE - 1:
+                datagrams.append(kind + current)
+                current = b""
+            current = current + b"," + encoded if current else encoded
+        if current:
+            datagrams.append(kind + current)
+        return datagrams
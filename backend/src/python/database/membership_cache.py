@@ -0,0 +1,66 @@
+from .session_cache import TTLCache
+
+
+class MembershipCache(TTLCache[str, tuple[int, frozenset[int]]]):
+    """
+    A bounded, thread-safe TTL/LRU cache that maps projects to the ids of their allowed users.
+    It's used for checking access to a project with a set lookup, instead of loading the project's allowed users.
+
+    Entries are keyed by the public id of the project (`Project.project_id`), and hold its id (`Project.id`) and members.
+    Its `ttl` is the amount of seconds cached members are trusted, in case an invalidation was missed (e.g. made by another worker).
+
+    Entries are invalidated by `Database` once a change to a project's members is committed.
+    Every invalidation bumps `generation`, so a set of members loaded before it isn't cached after it (see `put`).
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        super().__init__(max_size, ttl)
+        self.generation = 0
+        # The public id of every cached project, by id
+        self.__public_ids: dict[int, str] = {}
+
+    def put(  # type: ignore[override]
+        self, project_id: str, id: int, members: frozenset[int], generation: int
+    ) -> None:
+        """
+        Caches the members of a project, unless an invalidation happened since they were loaded.
+
+        Args:
+            project_id: The public id of the project (`Project.project_id`).
+            id: The id of the project (`Project.id`).
+            members: The ids of the project's allowed users.
+            generation: The value of `generation` from before the members were loaded.
+        """
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            if generation != self.generation:
+                return
+            super().put(project_id, (id, members))
+            self.__public_ids[id] = project_id
+
+    def invalidate(self, *ids: int) -> None:  # type: ignore[override]
+        """
+        Removes projects from the cache.
+
+        Args:
+            *ids: The ids of the projects (`Project.id`).
+        """
+        with self._lock:
+            self.generation += 1
+            super().invalidate(
+                *(self.__public_ids[id] for id in ids if id in self.__public_ids)
+            )
+
+    def clear(self) -> None:
+        """
+        Removes all projects from the cache.
+        """
+        with self._lock:
+            self.generation += 1
+            super().clear()
+            self.__public_ids.clear()
+
+    def _removed(self, project_id: str, value: tuple[int, frozenset[int]]) -> None:
+        self.__public_ids.pop(value[0], None)
@@ -0,0 +1,190 @@
+from sqlalchemy import (
+    Connection,
+    Engine,
+    MetaData,
+    Table,
+    bindparam,
+    func,
+    inspect,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.exc import OperationalError
+
+# The FTS5 index of the projects' name, description and language, see `queries.search_projects`
+PROJECT_SEARCH_TABLE = "projects_fts"
+
+
+def migrate(engine: Engine, metadata: MetaData) -> None:
+    """
+    Brings an existing database up to date with the models.
+    `MetaData.create_all` only creates missing tables, so changes to existing tables are applied here.
+    Every step checks the current schema first, so it's safe to run on every startup.
+
+    Args:
+        engine: The engine of the database.
+        metadata: The metadata of the models.
+    """
+    with engine.begin() as connection:
+        allowed_users = metadata.tables["allowed_users"]
+        if not inspect(connection).get_pk_constraint("allowed_users")[
+            "constrained_columns"
+        ]:
+            _rebuild_allowed_users(connection, allowed_users)
+        _add_project_revisions(connection)
+        _add_normalized_user_columns(connection, metadata)
+        _check_normalized_users(connection, metadata)
+        _create_missing_indexes(connection, metadata)
+        if connection.dialect.name == "sqlite":
+            _create_project_search(connection)
+
+
+def _rebuild_allowed_users(connection: Connection, allowed_users: Table) -> None:
+    # Older databases have no primary key on allowed_users, and may contain duplicate rows.
+    # The table is recreated with the new definition, keeping one copy of every row.
+    connection.execute(text("ALTER TABLE allowed_users RENAME TO allowed_users_old"))
+    allowed_users.create(connection)
+    connection.execute(
+        text(
+            "INSERT INTO allowed_users (user_id, project_id) "
+            "SELECT DISTINCT user_id, project_id FROM allowed_users_old "
+            "WHERE user_id IS NOT NULL AND project_id IS NOT NULL"
+        )
+    )
+    connection.execute(text("DROP TABLE allowed_users_old"))
+
+
+def _add_project_revisions(connection: Connection) -> None:
+    columns = {column["name"] for column in inspect(connection).get_columns("projects")}
+    if "revision" not in columns:
+        connection.execute(
+            text("ALTER TABLE projects ADD COLUMN revision INTEGER NOT NULL DEFAULT 1")
+        )
+    if "last_updated_at" not in columns:
+        # SQLite can't add a column with a non-constant default, so existing rows are filled in afterwards
+        connection.execute(
+            text("ALTER TABLE projects ADD COLUMN last_updated_at DATETIME")
+        )
+        connection.execute(text("UPDATE projects SET last_updated_at = created_at"))
+
+
+def _add_normalized_user_columns(connection: Connection, metadata: MetaData) -> None:
+    columns = {column["name"] for column in inspect(connection).get_columns("users")}
+    if "username_normalized" in columns and "email_normalized" in columns:
+        return
+    for column in ("username_normalized", "email_normalized"):
+        if column not in columns:
+            connection.execute(
+                text(
+                    f"ALTER TABLE users ADD COLUMN {column} VARCHAR NOT NULL DEFAULT ''"
+                )
+            )
+    # Filled in like `User.normalize` does, rather than with SQL's lower(), which only lowercases ASCII in SQLite
+    users = metadata.tables["users"]
+    rows = connection.execute(select(users.c.id, users.c.username, users.c.email)).all()
+    if rows:
+        connection.execute(
+            update(users)
+            .where(users.c.id == bindparam("user_id"))
+            .values(
+                username_normalized=bindparam("normalized_username"),
+                email_normalized=bindparam("normalized_email"),
+            ),
+            [
+                {
+                    "user_id": id,
+                    "normalized_username": username.lower(),
+                    "normalized_email": email.lower(),
+                }
+                for id, username, email in rows
+            ],
+        )
+
+
+def _check_normalized_users(connection: Connection, metadata: MetaData) -> None:
+    # Older databases may have users whose usernames or emails only differ in case.
+    # The migration stops on them, rather than picking which account keeps the address - they must be resolved by hand.
+    indexes = {index["name"] for index in inspect(connection).get_indexes("users")}
+    users = metadata.tables["users"]
+    collisions = []
+    for column in ("username", "email"):
+        if f"uq_users_{column}_normalized" in indexes:
+            continue
+        normalized = users.c[f"{column}_normalized"]
+        duplicated = select(normalized).group_by(normalized).having(func.count() > 1)
+        ids: dict[str, list[int]] = {}
+        for value, id in connection.execute(
+            select(normalized, users.c.id)
+            .where(normalized.in_(duplicated))
+            .order_by(normalized, users.c.id)
+        ):
+            ids.setdefault(value, []).append(id)
+        collisions += [f"{column} {value!r} (user ids {ids[value]})" for value in ids]
+    if collisions:
+        raise RuntimeError(
+            "Users whose usernames or emails only differ in case must be merged or renamed before migrating: "
+            + ", ".join(collisions)
+        )
+
+
+def _create_project_search(connection: Connection) -> None:
+    # The index only holds the projects' text, and reads it from projects (an external content table),
+    # so it's kept in sync by the triggers on projects alone - a search is restricted to the user's projects
+    # by joining allowed_users, and membership changes don't touch the index.
+    existing = connection.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": PROJECT_SEARCH_TABLE},
+    ).scalar()
+    if existing is not None:
+        if "members" not in existing:
+            return
+        # Older databases also indexed the members of every project, with triggers on allowed_users
+        for name in ("insert", "delete", "update", "allow", "disallow"):
+            connection.execute(
+                text(f"DROP TRIGGER IF EXISTS {PROJECT_SEARCH_TABLE}_{name}")
+            )
+        connection.execute(text(f"DROP TABLE {PROJECT_SEARCH_TABLE}"))
+    try:
+        connection.execute(
+            text(
+                f"CREATE VIRTUAL TABLE {PROJECT_SEARCH_TABLE} USING fts5("
+                "name, description, language, content='projects', content_rowid='id', "
+                "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+        )
+    except OperationalError as e:
+        print(f"[migrate] Project search is disabled, FTS5 is unavailable: {e}")
+        return
+
+    # An external content index is told the previous values of the rows it removes
+    remove_old = (
+        f"INSERT INTO {PROJECT_SEARCH_TABLE} ({PROJECT_SEARCH_TABLE}, rowid, name, description, language) "
+        "VALUES ('delete', old.id, old.name, old.description, old.language);"
+    )
+    add_new = (
+        f"INSERT INTO {PROJECT_SEARCH_TABLE} (rowid, name, description, language) "
+        "VALUES (new.id, new.name, new.description, new.language);"
+    )
+    triggers = {
+        "insert": f"AFTER INSERT ON projects BEGIN {add_new} END",
+        "delete": f"AFTER DELETE ON projects BEGIN {remove_old} END",
+        "update": "AFTER UPDATE OF name, description, language ON projects "
+        f"BEGIN {remove_old} {add_new} END",
+    }
+    for name, trigger in triggers.items():
+        connection.execute(
+            text(f"CREATE TRIGGER {PROJECT_SEARCH_TABLE}_{name} {trigger}")
+        )
+    # Indexes the projects that already exist
+    connection.execute(
+        text(
+            f"INSERT INTO {PROJECT_SEARCH_TABLE} ({PROJECT_SEARCH_TABLE}) VALUES ('rebuild')"
+        )
+    )
+
+
+def _create_missing_indexes(connection: Connection, metadata: MetaData) -> None:
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
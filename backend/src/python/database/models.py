@@ -0,0 +1,278 @@
+import datetime
+from operator import attrgetter
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Table,
+    UniqueConstraint,
+)
+from sqlalchemy.orm import DeclarativeBase, Mapped, relationship
+
+from typing import Any, Callable, Collection, List
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+AllowedUsers = Table(
+    "allowed_users",
+    Base.metadata,
+    Column("user_id", Integer, ForeignKey("users.id"), primary_key=True),
+    Column("project_id", Integer, ForeignKey("projects.id"), primary_key=True),
+    # The primary key covers lookups by user, this one covers lookups by project
+    Index("ix_allowed_users_project_id_user_id", "project_id", "user_id"),
+)
+
+
+class Session(Base):
+    """
+    A class that represents a session in the database.
+    It's used for authenticating users upon attempted access to the website.
+    """
+
+    __tablename__ = "sessions"
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    session_id = Column(String, nullable=False, unique=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.datetime.now, nullable=False)
+    last_accessed_at = Column(DateTime, default=datetime.datetime.now, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<Session(session_id={self.session_id}, user_id={self.user_id}, created_at={self.created_at}, last_accessed_at={self.last_accessed_at})>"
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Returns the session as a dictionary.
+        """
+        return {
+            "id": self.id,
+            "session_id": self.session_id,
+            "user_id": self.user_id,
+            "created_at": self.created_at,
+            "last_accessed_at": self.last_accessed_at,
+        }
+
+
+class RevokedSessionToken(Base):
+    """
+    A class that represents a signed session token that was revoked before it expired (see `SessionTokens`).
+    It's used for sharing revocations between workers.
+    """
+
+    __tablename__ = "revoked_session_tokens"
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    token_id = Column(String, nullable=False, unique=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    # Ids are never reused, workers load the revocations made since the last id they've seen
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    def __repr__(self) -> str:
+        return f"<RevokedSessionToken(token_id={self.token_id}, expires_at={self.expires_at})>"
+
+
+class Lease(Base):
+    """
+    A class that represents a background task that only one process may run at a time, e.g. reaping sessions.
+    The process that holds it renews it whenever it runs the task, and the others take it over once it expires.
+    """
+
+    __tablename__ = "leases"
+
+    name = Column(String, primary_key=True, nullable=False)
+    holder = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<Lease(name={self.name}, holder={self.holder}, expires_at={self.expires_at})>"
+
+
+def _normalized(column: str) -> Callable[[Any], str]:
+    # A default that normalizes another column of the inserted row (see `User.normalize`)
+    return lambda context: User.normalize(context.get_current_parameters()[column])
+
+
+class User(Base):
+    """
+    A class that represents a user in the database.
+    """
+
+    __tablename__ = "users"
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    username = Column(String, nullable=False, unique=True)
+    email = Column(String, nullable=False, unique=True)
+    password = Column(String, nullable=False)
+    # The username and email as they're looked up - case-insensitively, and by prefix for autocompletion
+    username_normalized = Column(
+        String, nullable=False, default=_normalized("username")
+    )
+    email_normalized = Column(String, nullable=False, default=_normalized("email"))
+
+    # Usernames and emails are unique regardless of case (see `database.migrations._check_normalized_users`)
+    # Autocompletion reads the covering indexes alone (they cover `to_dict`), and stops after the first matches
+    __table_args__ = (
+        Index("uq_users_username_normalized", "username_normalized", unique=True),
+        Index("uq_users_email_normalized", "email_normalized", unique=True),
+        Index(
+            "ix_users_username_normalized",
+            "username_normalized",
+            "id",
+            "username",
+            "email",
+        ),
+        Index(
+            "ix_users_email_normalized", "email_normalized", "id", "username", "email"
+        ),
+    )
+
+    projects: Mapped[List["Project"]] = relationship(
+        "Project",
+        secondary="allowed_users",
+        back_populates="allowed_users",
+    )
+
+    def __repr__(self) -> str:
+        return f"<User(username={self.username}, email={self.email})>"
+
+    @staticmethod
+    def normalize(value: str) -> str:
+        """
+        Normalizes a username or an email for lookups, so they're case-insensitive.
+        """
+        return value.lower()
+
+    # The fields of `to_dict`, read with a single getter built once
+    FIELDS = ("id", "username", "email")
+    __values = attrgetter(*FIELDS)
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Returns the user as a (new) dictionary.
+        """
+        return dict(zip(User.FIELDS, User.__values(self)))
+
+
+class Project(Base):
+    """
+    A class that represents a project in the database.
+    It's used for storing project information.
+    """
+
+    __tablename__ = "projects"
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    project_id = Column(String, nullable=False, unique=True)
+    name = Column(String, nullable=False)
+    description = Column(String, nullable=False)
+    language = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.now, nullable=False)
+    # Bumped whenever the project's allowed users change, used for the ETags of the project endpoints
+    revision = Column(Integer, default=1, nullable=False)
+    last_updated_at = Column(DateTime, default=datetime.datetime.now, nullable=False)
+
+    # The order projects are listed (and paginated) in
+    __table_args__ = (Index("ix_projects_created_at_id", "created_at", "id"),)
+
+    allowed_users: Mapped[List["User"]] = relationship(
+        "User",
+        secondary="allowed_users",
+        back_populates="projects",
+    )
+
+    def __repr__(self) -> str:
+        return f"<Project(project_id={self.project_id}, name={self.name}, description={self.description}, language={self.language}, created_at={self.created_at})>"
+
+    FIELDS = (
+        "id",
+        "project_id",
+        "name",
+        "description",
+        "language",
+        "created_at",
+        "last_updated_at",
+        "allowed_users",
+    )
+
+    # The fields that are columns, read with a single getter built once
+    __columns = FIELDS[:-1]
+    __values = attrgetter(*__columns)
+
+    def to_dict(
+        self,
+        fields: Collection[str] | None = None,
+        users: dict[int, dict[str, Any]] | None = None,
+    ) -> dict[str, Any]:
+        """
+        Returns the project as a (new) dictionary.
+
+        Args:
+            fields: The fields to include (out of `Project.FIELDS`), all of them if None.
+                The allowed users are only loaded if they're included.
+            users: The users already serialized for the same response, by id (see `get_allowed_users`).
+        """
+        project = dict(zip(Project.__columns, Project.__values(self)))
+        if fields is None:
+            project["allowed_users"] = self.get_allowed_users(users)
+            return project
+
+        if "allowed_users" in fields:
+            project["allowed_users"] = self.get_allowed_users(users)
+        return {field: project[field] for field in fields if field in project}
+
+    def get_allowed_users(
+        self, users: dict[int, dict[str, Any]] | None = None
+    ) -> list[dict[str, Any]]:
+        """
+        Returns the allowed users of the project as a list of dictionaries.
+
+        Args:
+            users: The users already serialized for the same response, by id.
+                A list of projects passes the same dictionary for all of them,
+                so a user that's allowed to many of them is serialized once. It's filled with the missing users.
+        """
+        if users is None:
+            return [user.to_dict() for user in self.allowed_users]
+        return [
+            users.get(user.id) or users.setdefault(user.id, user.to_dict())
+            for user in self.allowed_users
+        ]
+
+
+class ProjectFile(Base):
+    """
+    A class that represents a file of a project in the database.
+    It's used for listing a project's files, while their contents are kept by the realtime servers (in Yjs documents).
+    """
+
+    __tablename__ = "project_files"
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    name = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.now, nullable=False)
+
+    # A project's files are listed (in order) with a range scan of this constraint's index
+    __table_args__ = (
+        UniqueConstraint("project_id", "name", name="uq_project_files_project_id_name"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<ProjectFile(project_id={self.project_id}, name={self.name}, created_at={self.created_at})>"
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Returns the file as a dictionary.
+        """
+        return {
+            "name": self.name,
+            "created_at": self.created_at,
+        }
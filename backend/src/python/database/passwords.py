@@ -0,0 +1,151 @@
+import hashlib
+import hmac
+import os
+import threading
+
+
+class PasswordHasher:
+    """
+    A class that hashes and verifies passwords using a configurable key derivation function (scrypt or PBKDF2).
+
+    Hashes are stored as `$`-separated strings that carry their algorithm and cost parameters, e.g.::
+
+        scrypt$16384$8$1$<salt>$<hash>
+        pbkdf2_sha256$600000$<salt>$<hash>
+
+    Hashes created before this class existed are unsalted SHA-256 hexadecimal digests.
+    They are still accepted by `verify`, and reported by `needs_rehash`.
+
+    Deriving keys is slow on purpose, so only `workers` keys are derived at the same time, on the calling threads,
+    and the others wait for their turn. A burst of logins therefore queues up instead of occupying every CPU core,
+    while hashlib releases the GIL so the threads serving other requests keep running.
+    """
+
+    ALGORITHMS = ("scrypt", "pbkdf2_sha256")
+
+    def __init__(
+        self,
+        algorithm: str = "scrypt",
+        scrypt_n: int = 2**14,
+        scrypt_r: int = 8,
+        scrypt_p: int = 1,
+        pbkdf2_iterations: int = 600_000,
+        workers: int = 2,
+    ) -> None:
+        """
+        Args:
+            algorithm: The algorithm new hashes are created with, one of `PasswordHasher.ALGORITHMS`.
+            scrypt_n: The CPU/memory cost of scrypt, a power of 2.
+            scrypt_r: The block size of scrypt.
+            scrypt_p: The parallelization of scrypt.
+            pbkdf2_iterations: The amount of iterations of PBKDF2.
+            workers: The amount of passwords that may be hashed at the same time.
+        """
+        if algorithm not in self.ALGORITHMS:
+            raise ValueError(f"Unknown password hashing algorithm: {algorithm}")
+
+        self.algorithm = algorithm
+        self.scrypt_n = scrypt_n
+        self.scrypt_r = scrypt_r
+        self.scrypt_p = scrypt_p
+        self.pbkdf2_iterations = pbkdf2_iterations
+        self.__slots = threading.BoundedSemaphore(workers)
+
+    def hash(self, password: str) -> str:
+        """
+        Hashes a password with the configured algorithm and a random salt.
+
+        Args:
+            password: The password to hash.
+
+        Returns:
+            The hash, including the algorithm, its parameters and the salt.
+        """
+        salt = os.urandom(16)
+        if self.algorithm == "scrypt":
+            parameters = [self.scrypt_n, self.scrypt_r, self.scrypt_p]
+        else:
+            parameters = [self.pbkdf2_iterations]
+
+        key = self.__derive(self.algorithm, parameters, password, salt)
+        fields = [self.algorithm, *map(str, parameters), salt.hex(), key.hex()]
+        return "$".join(fields)
+
+    def verify(self, password: str, hashed: str) -> bool:
+        """
+        Checks if a password matches a hash.
+
+        Args:
+            password: The password to check.
+            hashed: The stored hash - either created by `hash`, or a legacy SHA-256 digest.
+
+        Returns:
+            True if the password matches, False otherwise (including when the hash is malformed).
+        """
+        # Compared as bytes - `compare_digest` refuses strings with non-ASCII characters
+        if self.__is_legacy(hashed):
+            digest = hashlib.sha256(password.encode()).hexdigest()
+            return hmac.compare_digest(digest.encode(), hashed.encode())
+
+        algorithm, *fields = hashed.split("$")
+        if algorithm not in self.ALGORITHMS or len(fields) < 3:
+            return False
+        *parameters, salt, expected = fields
+
+        try:
+            key = self.__derive(
+                algorithm, [int(p) for p in parameters], password, bytes.fromhex(salt)
+            )
+        except (ValueError, OverflowError):
+            # e.g. a parameter that isn't a number, the wrong amount of them, or a salt that isn't hex
+            return False
+        return hmac.compare_digest(key.hex().encode(), expected.encode())
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """
+        Checks if a hash was created with a different algorithm or different parameters than the configured ones.
+
+        Args:
+            hashed: The stored hash.
+
+        Returns:
+            True if the password should be hashed again (after it was verified), False otherwise.
+        """
+        if self.__is_legacy(hashed):
+            return True
+
+        algorithm, *fields = hashed.split("$")
+        if algorithm != self.algorithm:
+            return True
+        if algorithm == "scrypt":
+            return fields[:3] != [
+                str(self.scrypt_n),
+                str(self.scrypt_r),
+                str(self.scrypt_p),
+            ]
+        return fields[:1] != [str(self.pbkdf2_iterations)]
+
+    def __derive(
+        self, algorithm: str, parameters: list[int], password: str, salt: bytes
+    ) -> bytes:
+        if algorithm == "scrypt":
+            n, r, p = parameters
+            with self.__slots:
+                return hashlib.scrypt(
+                    password.encode(),
+                    salt=salt,
+                    n=n,
+                    r=r,
+                    p=p,
+                    # scrypt needs 128 * r * n bytes, the default limit is too low for higher costs
+                    maxmem=256 * r * n + 2**20,
+                    dklen=32,
+                )
+
+        (iterations,) = parameters
+        with self.__slots:
+            return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+
+    @staticmethod
+    def __is_legacy(hashed: str) -> bool:
+        return "$" not in hashed
@@ -0,0 +1,315 @@
+"""
+The statements shared by `Database` and `AsyncDatabase`, so both run exactly the same SQL.
+"""
+
+import datetime
+from hashlib import sha1
+
+from typing import Any, Sequence
+
+from sqlalchemy import (
+    CompoundSelect,
+    Delete,
+    Insert,
+    Select,
+    Table,
+    Update,
+    column,
+    delete,
+    func,
+    literal,
+    literal_column,
+    or_,
+    select,
+    table,
+    tuple_,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import selectinload
+
+from .migrations import PROJECT_SEARCH_TABLE
+from .models import AllowedUsers, Base, Project, ProjectFile, User
+
+# The weights of the name, description and language columns in the ranking of `search_projects`
+SEARCH_WEIGHTS = (10.0, 1.0, 5.0)
+
+
+def insert_on_conflict_do_nothing(
+    dialect: str, table: Table | type[Base]
+) -> Insert | None:
+    """
+    Gets an INSERT that skips the rows that violate a unique constraint, or None if the dialect doesn't support it.
+    """
+    if dialect == "sqlite":
+        return sqlite.insert(table).on_conflict_do_nothing()
+    elif dialect == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing()
+    return None
+
+
+def remove_allowed_users(project_id: int, user_ids: Sequence[int]) -> Delete:
+    return delete(AllowedUsers).where(
+        AllowedUsers.c.project_id == project_id,
+        AllowedUsers.c.user_id.in_(user_ids),
+    )
+
+
+def members_by_email(project_id: int, emails: list[str]) -> Select:
+    """
+    Selects the (normalized email, id, allowed) of the users with the given normalized emails (see `User.normalize`),
+    where allowed is whether they may access the project.
+    """
+    return (
+        select(User.email_normalized, User.id, AllowedUsers.c.project_id.is_not(None))
+        .outerjoin(
+            AllowedUsers,
+            (AllowedUsers.c.user_id == User.id)
+            & (AllowedUsers.c.project_id == project_id),
+        )
+        .where(User.email_normalized.in_(emails))
+    )
+
+
+def user_by_email(email: str) -> Select:
+    """
+    Selects the user with the given normalized email (see `User.normalize`).
+    """
+    return select(User).where(User.email_normalized == email).order_by(User.id).limit(1)
+
+
+def users_by_prefix(prefix: str, limit: int) -> CompoundSelect:
+    """
+    Selects the (id, username, email, scan) of the first users whose normalized username starts with
+    the prefix (scan 0), and of the first users whose normalized email does (scan 1),
+    each with a range scan of a covering index.
+    """
+    # Every string that starts with the prefix sorts between these
+    start, end = prefix, prefix + "\U0010ffff"
+    scans = []
+    for scan, normalized in enumerate(
+        (User.username_normalized, User.email_normalized)
+    ):
+        scans.append(
+            select(
+                User.id,
+                User.username,
+                User.email,
+                literal(scan).label("scan"),
+            )
+            .where(normalized >= start, normalized < end)
+            .order_by(normalized)
+            .limit(limit)
+            .subquery()
+            .select()
+        )
+    return union_all(*scans)
+
+
+def first_users(rows: Sequence[Any], limit: int) -> tuple[list[dict[str, Any]], bool]:
+    """
+    Combines the rows of `users_by_prefix` into the first users ordered by their username,
+    and whether they're all the users that match the prefix.
+    """
+    users: dict[int, dict[str, Any]] = {}
+    for id, username, email, _ in sorted(
+        rows, key=lambda row: (User.normalize(row[1]), row[0])
+    ):
+        users.setdefault(id, {"id": id, "username": username, "email": email})
+    # Unless a scan stopped at the limit, every user that matches was found
+    complete = all(sum(row[3] == scan for row in rows) < limit for scan in range(2))
+    return list(users.values())[:limit], complete
+
+
+def bump_revision(project_id: int) -> Update:
+    return (
+        update(Project)
+        .where(Project.id == project_id)
+        .values(
+            revision=Project.revision + 1,
+            last_updated_at=datetime.datetime.now(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def project(project_id: str) -> Select:
+    """
+    Selects a project along with its allowed users.
+    """
+    return (
+        select(Project)
+        .where(Project.project_id == project_id)
+        .options(selectinload(Project.allowed_users))
+    )
+
+
+def project_version(project_id: str, user_id: int) -> Select:
+    """
+    Selects the (revision, last_updated_at) of a project, if the user is allowed to access it.
+    """
+    return (
+        select(Project.revision, Project.last_updated_at)
+        .join(AllowedUsers, AllowedUsers.c.project_id == Project.id)
+        .where(Project.project_id == project_id, AllowedUsers.c.user_id == user_id)
+    )
+
+
+def user_projects_revisions(
+    user_id: int,
+    limit: int | None = None,
+    after: tuple[datetime.datetime, int] | None = None,
+    language: str | None = None,
+    name: str | None = None,
+) -> Select:
+    """
+    Selects the (id, revision, last_updated_at) of the projects `user_projects` selects, without loading them.
+    """
+    return user_projects(
+        user_id, limit, after, language, name, with_allowed_users=False
+    ).with_only_columns(Project.id, Project.revision, Project.last_updated_at)
+
+
+def projects_version(
+    rows: Sequence[Any],
+) -> tuple[str, datetime.datetime | None]:
+    """
+    Combines the rows of `user_projects_revisions` into a version of the projects list and its last update time.
+    """
+    version = sha1(",".join(f"{id}:{revision}" for id, revision, _ in rows).encode())
+    last_updated_at = max((row[2] for row in rows), default=None)
+    return version.hexdigest(), last_updated_at
+
+
+def user_projects(
+    user_id: int,
+    limit: int | None = None,
+    after: tuple[datetime.datetime, int] | None = None,
+    language: str | None = None,
+    name: str | None = None,
+    with_allowed_users: bool = True,
+) -> Select:
+    """
+    Selects the projects a user is allowed to access, ordered by their creation time (see `Database.get_user_projects`).
+    """
+    query = (
+        select(Project)
+        .join(AllowedUsers, AllowedUsers.c.project_id == Project.id)
+        .where(AllowedUsers.c.user_id == user_id)
+        .order_by(Project.created_at, Project.id)
+    )
+    if after is not None:
+        query = query.where(tuple_(Project.created_at, Project.id) > tuple_(*after))
+    if language is not None:
+        query = query.where(Project.language == language)
+    if name is not None:
+        query = query.where(Project.name.icontains(name, autoescape=True))
+    if limit is not None:
+        query = query.limit(limit)
+    if with_allowed_users:
+        query = query.options(selectinload(Project.allowed_users))
+    return query
+
+
+def search_expression(terms: Sequence[str]) -> str:
+    """
+    Builds the FTS5 query of `search_projects`, which matches the projects that contain every term.
+    Every term is quoted, so it's taken literally rather than as FTS5 syntax, and the last one is matched as a prefix,
+    so results show up while the last word is being typed.
+    """
+    phrases = ['"' + term.replace('"', '""') + '"' for term in terms]
+    phrases[-1] += "*"
+    return " ".join(phrases)
+
+
+def search_projects(
+    user_id: int,
+    terms: Sequence[str],
+    limit: int,
+    full_text: bool,
+    with_allowed_users: bool = True,
+) -> Select:
+    """
+    Selects the projects a user is allowed to access whose name, description or language contain every term
+    (see `Database.search_projects`).
+
+    With `full_text`, the terms are matched as words (and the last one as a prefix) with the FTS5 index of the projects,
+    and the projects are ranked by relevance (bm25), weighing their columns by `SEARCH_WEIGHTS`.
+    Otherwise (e.g. FTS5 is unavailable), the terms are matched as substrings and the projects are ordered by their creation time.
+    """
+    if full_text:
+        # The matches of the index are restricted to the user's projects with allowed_users' primary key
+        index = table(PROJECT_SEARCH_TABLE, column("rowid"))
+        rank = func.bm25(literal_column(PROJECT_SEARCH_TABLE), *SEARCH_WEIGHTS)
+        query = (
+            select(Project)
+            .join(index, index.c.rowid == Project.id)
+            .join(
+                AllowedUsers,
+                (AllowedUsers.c.project_id == Project.id)
+                & (AllowedUsers.c.user_id == user_id),
+            )
+            .where(literal_column(PROJECT_SEARCH_TABLE).match(search_expression(terms)))
+            .order_by(rank, Project.id)
+        )
+    else:
+        query = (
+            select(Project)
+            .join(AllowedUsers, AllowedUsers.c.project_id == Project.id)
+            .where(AllowedUsers.c.user_id == user_id)
+        )
+        for term in terms:
+            query = query.where(
+                or_(
+                    Project.name.icontains(term, autoescape=True),
+                    Project.description.icontains(term, autoescape=True),
+                    Project.language.icontains(term, autoescape=True),
+                )
+            )
+        query = query.order_by(Project.created_at, Project.id)
+    query = query.limit(limit)
+    if with_allowed_users:
+        query = query.options(selectinload(Project.allowed_users))
+    return query
+
+
+def project_members(project_id: str) -> Select:
+    """
+    Selects the (id, allowed user id) of a project, with a single row with no user if it has no allowed users.
+    """
+    return (
+        select(Project.id, AllowedUsers.c.user_id)
+        .outerjoin(AllowedUsers, AllowedUsers.c.project_id == Project.id)
+        .where(Project.project_id == project_id)
+    )
+
+
+def project_files(project_id: int) -> Select:
+    """
+    Selects the files of a project, ordered by their names.
+    """
+    return (
+        select(ProjectFile)
+        .where(ProjectFile.project_id == project_id)
+        .order_by(ProjectFile.name)
+    )
+
+
+def remove_project_files(project_id: int, names: Sequence[str] | None = None) -> Delete:
+    """
+    Deletes the files of a project with the given names, or all of them if None.
+    """
+    statement = delete(ProjectFile).where(ProjectFile.project_id == project_id)
+    if names is not None:
+        statement = statement.where(ProjectFile.name.in_(names))
+    return statement
+
+
+def projects_by_public_id(project_ids: Sequence[str]) -> Select:
+    """
+    Selects the (project_id, id) of the projects with the given public ids.
+    """
+    return select(Project.project_id, Project.id).where(
+        Project.project_id.in_(project_ids)
+    )
@@ -0,0 +1,135 @@
+import threading
+import time
+from collections import OrderedDict
+
+from typing import Any, Generic, TypeVar
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """
+    A bounded, thread-safe TTL/LRU cache, with hit, miss and eviction counters.
+    The caches of `Database` are built on it, adding what they need on top with the same lock (see `_lock`).
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        """
+        Args:
+            max_size: The maximum amount of entries kept in the cache. The least recently used entry is evicted first.
+            ttl: The amount of seconds an entry is served before it expires.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # The (value, expiry) of every entry, the least recently used first
+        self._entries: OrderedDict[K, tuple[V, float]] = OrderedDict()
+        # Reentrant, so subclasses can hold it around the methods of this class
+        self._lock = threading.RLock()
+
+    def get(self, key: K) -> V | None:
+        """
+        Gets the value of an entry, and marks it as the most recently used.
+
+        Args:
+            key: The key of the entry.
+
+        Returns:
+            The value if the entry is cached and hasn't expired, None otherwise.
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: K, value: V) -> None:
+        """
+        Caches an entry, evicting the least recently used ones if the cache is full.
+
+        Args:
+            key: The key of the entry.
+            value: The value of the entry.
+        """
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                evicted_key, (evicted, _) = self._entries.popitem(last=False)
+                self._removed(evicted_key, evicted)
+                self.evictions += 1
+
+    def invalidate(self, *keys: K) -> None:
+        """
+        Removes entries from the cache.
+
+        Args:
+            *keys: The keys of the entries.
+        """
+        with self._lock:
+            for key in keys:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._removed(key, entry[0])
+
+    def clear(self) -> None:
+        """
+        Removes all entries from the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns the cache's counters as a dictionary.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _lookup(self, key: K) -> V | None:
+        """
+        Gets the value of an entry without counting the lookup or marking the entry as used, removing it if it expired.
+        The caller must hold `_lock`.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self._removed(key, value)
+            return None
+        return value
+
+    def _removed(self, key: K, value: V) -> None:
+        """
+        Called with `_lock` held whenever an entry expires, is evicted or is invalidated - but not on `clear`.
+        """
+
+
+class SessionCache(TTLCache[str, int]):
+    """
+    A bounded, thread-safe TTL/LRU cache that maps session ids to user ids.
+    It's used for skipping the database on requests whose session was recently validated.
+
+    Its `ttl` is the amount of seconds a cached session is trusted before it has to be validated against the database again.
+    """
@@ -0,0 +1,160 @@
+import base64
+import datetime
+import hashlib
+import hmac
+import os
+import threading
+import time
+
+
+class SessionTokens:
+    """
+    Issues and verifies stateless session tokens - HMAC-SHA256 signed strings carrying a user id and an expiry time,
+    so a session can be validated without reading the database. They have the format::
+
+        <user id>.<expiry (unix time)>.<token id>.<signature>
+
+    The token id identifies the session: a renewed token keeps the id of the token it replaces,
+    so revoking it revokes every copy of the session, including the ones issued before the last renewal.
+    Tokens can't be deleted like `Session` rows, so logging out revokes them instead:
+    their id is kept in a thread-safe in-memory revocation list until any copy would have expired anyway.
+    `Database` shares the revocations between workers through the `revoked_session_tokens` table.
+    """
+
+    def __init__(self, secret: bytes, lifetime: datetime.timedelta) -> None:
+        """
+        Args:
+            secret: The key tokens are signed with. Every worker must use the same one.
+            lifetime: How long a token is valid for after it was issued.
+        """
+        self.lifetime = lifetime
+        self.__secret = secret
+        # The expiry time of every revoked token, by token id
+        self.__revoked: dict[str, int] = {}
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return len(self.__revoked)
+
+    @staticmethod
+    def is_token(value: str) -> bool:
+        """
+        Checks if a cookie value looks like a signed token, rather than the id of a `Session` row.
+        """
+        return value.count(".") == 3
+
+    def issue(self, user_id: int, token_id: str | None = None) -> str:
+        """
+        Issues a new token for a user.
+
+        Args:
+            user_id: The id of the user.
+            token_id: The id of the session the token belongs to, a new session if None.
+
+        Returns:
+            The token.
+        """
+        expires_at = int(time.time() + self.lifetime.total_seconds())
+        payload = f"{user_id}.{expires_at}.{token_id or os.urandom(8).hex()}"
+        return f"{payload}.{self.__sign(payload)}"
+
+    def renew(self, token: str) -> str | None:
+        """
+        Issues a new token for the same session as a valid token, with a new expiry time.
+
+        Args:
+            token: The token to renew.
+
+        Returns:
+            The new token, or None if the token isn't valid.
+        """
+        claims = self.__decode(token)
+        if claims is None or self.verify(token) is None:
+            return None
+        user_id, _, token_id = claims
+        return self.issue(user_id, token_id)
+
+    def verify(self, token: str) -> int | None:
+        """
+        Checks that a token was issued by us, hasn't expired and wasn't revoked.
+
+        Args:
+            token: The token to verify.
+
+        Returns:
+            The id of the token's user if the token is valid, None otherwise.
+        """
+        claims = self.__decode(token)
+        if claims is None:
+            return None
+
+        user_id, expires_at, token_id = claims
+        if expires_at <= time.time():
+            return None
+        with self.__lock:
+            if token_id in self.__revoked:
+                return None
+        return user_id
+
+    def expires_at(self, token: str) -> datetime.datetime | None:
+        """
+        Gets the expiry time of a token, if its signature is valid.
+        """
+        claims = self.__decode(token)
+        return datetime.datetime.fromtimestamp(claims[1]) if claims else None
+
+    def revoke(self, token: str) -> tuple[str, datetime.datetime] | None:
+        """
+        Revokes a token, along with every other copy of its session (see `renew`),
+        until any of them would have expired.
+
+        Args:
+            token: The token to revoke.
+
+        Returns:
+            The token's id and the expiry time of the revocation, or None if the token isn't valid anyway.
+        """
+        claims = self.__decode(token)
+        if claims is None or claims[1] <= time.time():
+            return None
+
+        # A copy renewed just now is the last one to expire
+        token_id = claims[2]
+        expires_at = int(time.time() + self.lifetime.total_seconds())
+        self.add_revocations({token_id: expires_at})
+        return token_id, datetime.datetime.fromtimestamp(expires_at)
+
+    def add_revocations(self, revocations: dict[str, int]) -> None:
+        """
+        Adds tokens revoked elsewhere (e.g. by another worker) to the revocation list, and forgets expired ones.
+
+        Args:
+            revocations: The expiry time (unix time) of every revoked token, by token id.
+        """
+        now = time.time()
+        with self.__lock:
+            self.__revoked.update(revocations)
+            self.__revoked = {
+                token_id: expires_at
+                for token_id, expires_at in self.__revoked.items()
+                if expires_at > now
+            }
+
+    def __decode(self, token: str) -> tuple[int, int, str] | None:
+        # Gets the (user id, expiry, token id) of a token whose signature is valid
+        payload, _, signature = token.rpartition(".")
+        # Compared as bytes - `compare_digest` refuses strings with non-ASCII characters
+        if not self.is_token(token) or not hmac.compare_digest(
+            self.__sign(payload).encode(), signature.encode()
+        ):
+            return None
+        user_id, expires_at, token_id = payload.split(".")
+        try:
+            return int(user_id), int(expires_at), token_id
+        except ValueError:
+            return None
+
+    def __sign(self, payload: str) -> str:
+        digest = hmac.new(self.__secret, payload.encode(), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
@@ -0,0 +1,96 @@
+import datetime
+import threading
+
+
+class SessionTouchBuffer:
+    """
+    A thread-safe buffer of pending `Session.last_accessed_at` updates.
+    Session accesses are recorded in memory and written to the database in batches by `Database.flush_session_touches`,
+    so validating a session doesn't require a write transaction.
+    """
+
+    def __init__(self, granularity: datetime.timedelta) -> None:
+        """
+        Args:
+            granularity: The precision of the recorded access times.
+                Accesses are rounded down to it, so all the sessions touched within the same window share one UPDATE.
+        """
+        self.granularity = granularity
+        self.__pending: dict[str, datetime.datetime] = {}
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return len(self.__pending)
+
+    def touch(self, session_id: str) -> None:
+        """
+        Records an access to a session.
+
+        Args:
+            session_id: The session id that was accessed.
+        """
+        accessed_at = self.__round_down(datetime.datetime.now())
+        with self.__lock:
+            self.__pending[session_id] = accessed_at
+
+    def last_touch(self, session_id: str) -> datetime.datetime | None:
+        """
+        Gets the latest access to a session that wasn't written to the database yet.
+
+        Args:
+            session_id: The session id to look up.
+
+        Returns:
+            The (rounded down) time of the access if there is one pending, None otherwise.
+        """
+        with self.__lock:
+            return self.__pending.get(session_id)
+
+    def discard(self, *session_ids: str) -> None:
+        """
+        Drops the pending accesses of sessions, e.g. after they were deleted.
+
+        Args:
+            *session_ids: The session ids to drop.
+        """
+        with self.__lock:
+            for session_id in session_ids:
+                self.__pending.pop(session_id, None)
+
+    def drain(self) -> dict[datetime.datetime, list[str]]:
+        """
+        Removes all the pending accesses from the buffer.
+
+        Returns:
+            The pending session ids grouped by their access time.
+        """
+        with self.__lock:
+            pending, self.__pending = self.__pending, {}
+
+        batches: dict[datetime.datetime, list[str]] = {}
+        for session_id, accessed_at in pending.items():
+            batches.setdefault(accessed_at, []).append(session_id)
+        return batches
+
+    def restore(self, batches: dict[datetime.datetime, list[str]]) -> None:
+        """
+        Puts drained accesses back into the buffer, e.g. after a failed flush.
+        Accesses recorded since the drain take precedence.
+
+        Args:
+            batches: The batches returned by `drain`.
+        """
+        with self.__lock:
+            for accessed_at, session_ids in batches.items():
+                for session_id in session_ids:
+                    current = self.__pending.get(session_id)
+                    if current is None or current < accessed_at:
+                        self.__pending[session_id] = accessed_at
+
+    def __round_down(self, when: datetime.datetime) -> datetime.datetime:
+        step = self.granularity.total_seconds()
+        if step <= 0:
+            return when
+        timestamp = when.timestamp()
+        return datetime.datetime.fromtimestamp(timestamp - timestamp % step)
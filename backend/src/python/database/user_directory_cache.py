@@ -0,0 +1,62 @@
+from typing import Any
+
+from .models import User
+from .session_cache import TTLCache
+
+
+class UserDirectoryCache(TTLCache[str, tuple[tuple[dict[str, Any], ...], bool]]):
+    """
+    A bounded, thread-safe TTL/LRU cache that maps search prefixes to the users whose email or username start with them.
+    It's used for answering the repeated lookups of an autocomplete field without the database.
+
+    Every entry holds the first users that match (see `Database.search_users`), and whether they're all the users that match.
+    A longer prefix is answered from a complete entry of a shorter one, since the users that match it are among them -
+    so once a user has typed a few letters, the next ones don't reach the database.
+    Its `ttl` is the amount of seconds cached users are served, before users that registered since then show up.
+    """
+
+    def get(self, prefix: str) -> list[dict[str, Any]] | None:  # type: ignore[override]
+        """
+        Gets the users that match a prefix.
+
+        Args:
+            prefix: The normalized prefix (see `User.normalize`).
+
+        Returns:
+            The users, ordered by their username, if the prefix (or a shorter one) is cached, None otherwise.
+        """
+        with self._lock:
+            for length in range(len(prefix), 0, -1):
+                entry = self._lookup(prefix[:length])
+                if entry is None:
+                    continue
+                users, complete = entry
+                if length < len(prefix) and not complete:
+                    continue
+
+                self._entries.move_to_end(prefix[:length])
+                self.hits += 1
+                if length == len(prefix):
+                    return list(users)
+                return [
+                    user
+                    for user in users
+                    if User.normalize(user["username"]).startswith(prefix)
+                    or User.normalize(user["email"]).startswith(prefix)
+                ]
+
+            self.misses += 1
+            return None
+
+    def put(  # type: ignore[override]
+        self, prefix: str, users: list[dict[str, Any]], complete: bool
+    ) -> None:
+        """
+        Caches the users that match a prefix.
+
+        Args:
+            prefix: The normalized prefix (see `User.normalize`).
+            users: The first users that match the prefix, ordered by their username.
+            complete: Whether they're all the users that match the prefix.
+        """
+        super().put(prefix, (tuple(users), complete))
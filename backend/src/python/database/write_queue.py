@@ -0,0 +1,124 @@
+import contextvars
+import queue
+import threading
+from concurrent.futures import Future
+
+from sqlalchemy import Engine
+from sqlalchemy.orm import Session as OrmSession, sessionmaker
+
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class WriteQueue:
+    """
+    Serializes writes through a single writer thread that owns the write connection, and commits them in groups.
+
+    Threads submit operations - functions that write through the SQLAlchemy session they're given - and wait for them.
+    The writer takes every operation that's queued (up to `max_batch`), runs each one in its own SAVEPOINT,
+    and commits them all at once, so a burst of writes costs a single commit (and a single fsync) instead of one each,
+    and they never wait on each other for SQLite's write lock.
+    An operation that fails is rolled back alone, and its exception is raised to the thread that submitted it.
+    """
+
+    def __init__(self, engine: Engine, max_batch: int) -> None:
+        """
+        Args:
+            engine: The engine the writer writes through, see `create_writer_engine`.
+            max_batch: The maximum amount of operations committed together.
+        """
+        self.engine = engine
+        self.max_batch = max_batch
+        self.operations = 0
+        self.batches = 0
+        self.__Session = sessionmaker(bind=engine, expire_on_commit=False)
+        self.__queue: queue.SimpleQueue[
+            tuple[Callable[[OrmSession], Any], contextvars.Context, Future] | None
+        ] = queue.SimpleQueue()
+        self.__closed = False
+        self.__lock = threading.Lock()
+        self.__writer = threading.Thread(
+            target=self.__run, name="write-queue", daemon=True
+        )
+        self.__writer.start()
+
+    def __len__(self) -> int:
+        return self.__queue.qsize()
+
+    def submit(self, operation: Callable[[OrmSession], T]) -> T:
+        """
+        Runs a write operation on the writer thread, and waits until it's committed.
+        The operation must only use the session it's given, and return values that don't need it (e.g. ids, or loaded rows).
+
+        Args:
+            operation: The operation, called with the writer's session.
+
+        Returns:
+            What the operation returned.
+        """
+        future: Future = Future()
+        with self.__lock:
+            if self.__closed:
+                raise Exception("The write queue is closed")
+            # The operation's statements are attributed to the submitting request (see `Metrics`)
+            self.__queue.put((operation, contextvars.copy_context(), future))
+        return future.result()
+
+    def close(self) -> None:
+        """
+        Commits the queued operations and stops the writer. It's safe to call more than once.
+        """
+        with self.__lock:
+            if self.__closed:
+                return
+            self.__closed = True
+            self.__queue.put(None)
+        self.__writer.join()
+
+    def __run(self) -> None:
+        while True:
+            batch = [self.__queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.__queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            writes = [write for write in batch if write is not None]
+            if writes:
+                self.__commit(writes)
+            if len(writes) < len(batch):
+                return
+
+    def __commit(
+        self,
+        writes: list[tuple[Callable[[OrmSession], Any], contextvars.Context, Future]],
+    ) -> None:
+        results: list[tuple[Future, Any, BaseException | None]] = []
+        session = self.__Session()
+        try:
+            for operation, context, future in writes:
+                try:
+                    with session.begin_nested():
+                        result = context.run(operation, session)
+                    results.append((future, result, None))
+                except Exception as e:
+                    results.append((future, None, e))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"[write-queue] {type(e).__name__}: {e}")
+            for _, _, future in writes:
+                future.set_exception(e)
+            return
+        finally:
+            session.close()
+
+        self.operations += len(writes)
+        self.batches += 1
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
@@ -15,14 +15,33 @@ class Server:
 
 
 def main():
-    if len(sys.argv) > 1 and sys.argv[1] == "--dev":
+    if "--async" in sys.argv[1:]:
+        # The asyncio server variant, see `AsyncApiServer`
+        if "--dev" in sys.argv[1:]:
+            from api.async_api_server import AsyncApiServer
+
+            print("Starting the asyncio server in development mode")
+            AsyncApiServer().start(debug=True)
+        else:
+            from api.async_production_server import AsyncProductionServer
+
+            print("Starting the asyncio server in production mode")
+            AsyncProductionServer().run()
+    elif len(sys.argv) > 1 and sys.argv[1] == "--dev":
         print("Starting in development mode")
         server = Server()
         server.run(debug=True)
     else:
-        print("Starting in production mode")
-        server = Server()
-        server.run(debug=False)
+        try:
+            from api.production_server import ProductionServer
+        except ImportError:
+            # gunicorn isn't available (e.g. on Windows)
+            print("Starting in production mode (without gunicorn)")
+            server = Server()
+            server.run(debug=False)
+        else:
+            print("Starting in production mode")
+            ProductionServer().run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,99 @@
+import itertools
+import os
+
+import pytest
+from sqlalchemy import event
+
+from utils.const import DATABASE
+
+PASSWORD = "test-password"
+
+# Users are unique across the tests, which share the database
+_user_numbers = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def api(tmp_path_factory):
+    """
+    An `ApiServer` against a temporary SQLite database, shared by the whole run (`Database` is a singleton).
+    """
+    db_path = os.path.join(tmp_path_factory.mktemp("database"), "test.db")
+    DATABASE.DB_PATH = db_path
+    DATABASE.URL = "sqlite:///" + db_path
+    from api import ApiServer
+
+    return ApiServer()
+
+
+@pytest.fixture
+def client(api):
+    """
+    A client of the API that sends the session cookie it's given, rather than keeping cookies.
+    """
+    return Client(api.app.test_client(use_cookies=False))
+
+
+@pytest.fixture
+def queries(api):
+    """
+    Counts the statements the database executes, through any of its engines. Reset it with `queries.reset()`.
+    """
+    counter = QueryCounter()
+    engines = {api.database.engine, api.database.read_engine}
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", counter)
+    yield counter
+    for engine in engines:
+        event.remove(engine, "before_cursor_execute", counter)
+
+
+class QueryCounter:
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, *args) -> None:
+        self.count += 1
+
+    def reset(self) -> None:
+        self.count = 0
+
+
+class Client:
+    def __init__(self, client) -> None:
+        self.client = client
+
+    def request(self, method: str, path: str, session_id: str | None = None, **kwargs):
+        headers = kwargs.pop("headers", {})
+        if session_id is not None:
+            headers["Cookie"] = f"session_id={session_id}"
+        return self.client.open(path, method=method, headers=headers, **kwargs)
+
+    def register(self) -> tuple[str, str]:
+        """
+        Registers a new user, and returns their email and session id.
+        """
+        email = f"user{next(_user_numbers)}@example.com"
+        response = self.request(
+            "POST",
+            "/api/register",
+            json={
+                "email": email,
+                "username": email.split("@")[0],
+                "password": PASSWORD,
+            },
+        )
+        assert response.status_code == 200, response.json
+        for cookie in response.headers.getlist("Set-Cookie"):
+            if cookie.startswith("session_id="):
+                return email, cookie.split(";")[0].split("=", 1)[1]
+        raise AssertionError("No session cookie")
+
+    def create_project(self, session_id: str, name: str = "project") -> str:
+        response = self.request(
+            "POST",
+            "/api/projects",
+            session_id,
+            json={"name": name, "description": "description", "language": "python"},
+        )
+        assert response.status_code == 200, response.json
+        return response.json["data"]["project_id"]
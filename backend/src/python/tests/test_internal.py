@@ -0,0 +1,101 @@
+"""
+The /internal routes of the realtime servers, which require their shared secret.
+"""
+
+import pytest
+
+from utils.const import SERVER
+
+SECRET = "test-internal-secret"
+
+
+@pytest.fixture(autouse=True)
+def secret(monkeypatch):
+    monkeypatch.setattr(SERVER, "INTERNAL_SECRET", SECRET)
+
+
+def authorize(client, pairs, secret: str | None = SECRET):
+    headers = {"X-Internal-Secret": secret} if secret is not None else {}
+    return client.request(
+        "POST", "/internal/authorize", json={"pairs": pairs}, headers=headers
+    )
+
+
+def test_authorize(client):
+    _, owner = client.register()
+    _, other = client.register()
+    project_id = client.create_project(owner)
+
+    response = authorize(
+        client,
+        [
+            {"session_id": owner, "project_id": project_id},
+            {"session_id": other, "project_id": project_id},
+            {"session_id": "nope", "project_id": project_id},
+        ],
+    )
+    assert response.status_code == 200
+    assert response.json["data"]["verdicts"] == {
+        owner: {project_id: True},
+        other: {project_id: False},
+        "nope": {project_id: False},
+    }
+
+
+@pytest.mark.parametrize("secret", [None, "", "wrong"])
+def test_authorize_requires_the_secret(client, secret):
+    _, owner = client.register()
+    project_id = client.create_project(owner)
+
+    response = authorize(
+        client, [{"session_id": owner, "project_id": project_id}], secret
+    )
+    assert response.status_code == 403
+
+
+def test_authorize_is_disabled_without_a_secret(client, monkeypatch):
+    monkeypatch.setattr(SERVER, "INTERNAL_SECRET", None)
+    _, owner = client.register()
+    project_id = client.create_project(owner)
+
+    response = authorize(client, [{"session_id": owner, "project_id": project_id}])
+    assert response.status_code == 403
+
+
+def test_import_files(client):
+    _, owner = client.register()
+    project_id = client.create_project(owner)
+    files = [
+        {"project_id": project_id, "name": "imported.py"},
+        {"project_id": "missing", "name": "imported.py"},
+    ]
+
+    response = client.request(
+        "POST",
+        "/internal/projects/files",
+        json={"files": files},
+        headers={"X-Internal-Secret": SECRET},
+    )
+    assert response.status_code == 200
+    assert response.json["data"]["imported"] == 1
+    response = client.request("GET", f"/api/projects/{project_id}/files", owner)
+    assert "imported.py" in [file["name"] for file in response.json["data"]["files"]]
+
+
+@pytest.mark.parametrize("secret", [None, "wrong"])
+def test_import_files_requires_the_secret(client, secret):
+    _, owner = client.register()
+    project_id = client.create_project(owner)
+    headers = {"X-Internal-Secret": secret} if secret is not None else {}
+
+    response = client.request(
+        "POST",
+        "/internal/projects/files",
+        json={"files": [{"project_id": project_id, "name": "imported.py"}]},
+        headers=headers,
+    )
+    assert response.status_code == 403
+    response = client.request("GET", f"/api/projects/{project_id}/files", owner)
+    assert "imported.py" not in [
+        file["name"] for file in response.json["data"]["files"]
+    ]
@@ -0,0 +1,56 @@
+"""
+`FastJSONProvider`, which must write what Flask's default provider writes.
+"""
+
+import datetime
+import re
+
+import flask
+import pytest
+from flask.json.provider import DefaultJSONProvider
+
+from api import json_provider
+from api.json_provider import FastJSONProvider
+
+VALUES = {
+    "datetime": datetime.datetime(2026, 10, 18, 12, 30, 5, 123456),
+    "aware": datetime.datetime(
+        2026, 10, 18, 12, tzinfo=datetime.timezone(datetime.timedelta(hours=2))
+    ),
+    "date": datetime.date(2026, 10, 18),
+    "nested": [{"text": "ünïcode", "number": 1.5, "none": None}],
+}
+
+
+@pytest.fixture(params=[True, False], ids=["orjson", "json"])
+def provider(request, monkeypatch):
+    if request.param and json_provider.orjson is None:
+        pytest.skip("orjson isn't installed")
+    if not request.param:
+        monkeypatch.setattr(json_provider, "orjson", None)
+    return FastJSONProvider(flask.Flask(__name__))
+
+
+def test_writes_what_flask_writes(provider):
+    expected = DefaultJSONProvider(flask.Flask(__name__)).dumps(VALUES)
+    assert provider.loads(provider.dumps(VALUES)) == provider.loads(expected)
+    assert provider.loads(provider.dumps(VALUES))["datetime"] == (
+        "Sun, 18 Oct 2026 12:30:05 GMT"
+    )
+
+
+def test_writes_sets_and_integer_keys(provider):
+    assert provider.loads(provider.dumps({1: {3}})) == {"1": [3]}
+
+
+def test_responses_write_http_dates(client):
+    _, session_id = client.register()
+    project_id = client.create_project(session_id)
+
+    response = client.request("GET", f"/api/projects/{project_id}", session_id)
+    dates = [
+        value for key, value in response.json["data"].items() if key.endswith("_at")
+    ]
+    assert dates
+    for date in dates:
+        assert re.fullmatch(r"\w{3}, \d\d \w{3} \d{4} \d\d:\d\d:\d\d GMT", date)
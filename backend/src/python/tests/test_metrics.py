@@ -0,0 +1,58 @@
+"""
+/metrics, and the measurements of the requests it exposes.
+"""
+
+import re
+
+import pytest
+
+
+def responses(client, endpoint: str, method: str, status: int) -> int:
+    metrics = client.request("GET", "/metrics").get_data(as_text=True)
+    labels = f'endpoint="{endpoint}",method="{method}",status="{status}"'
+    match = re.search(
+        rf"^api_responses_total\{{{re.escape(labels)}\}} (\d+)$", metrics, re.M
+    )
+    return int(match.group(1)) if match else 0
+
+
+def test_requests_are_counted_by_status(client):
+    _, session_id = client.register()
+    before = responses(client, "/api/user", "GET", 200)
+
+    assert client.request("GET", "/api/user", session_id).status_code == 200
+    assert responses(client, "/api/user", "GET", 200) == before + 1
+
+
+@pytest.mark.parametrize("propagate", [False, True])
+def test_failed_requests_are_counted(api, client, monkeypatch, propagate):
+    _, session_id = client.register()
+    before = responses(client, "/api/user", "GET", 500)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("failed")
+
+    monkeypatch.setattr(api.database, "select_from", fail)
+    monkeypatch.setitem(api.app.config, "PROPAGATE_EXCEPTIONS", propagate)
+    if propagate:
+        with pytest.raises(RuntimeError):
+            client.request("GET", "/api/user", session_id)
+    else:
+        assert client.request("GET", "/api/user", session_id).status_code == 500
+    monkeypatch.undo()
+
+    assert responses(client, "/api/user", "GET", 500) == before + 1
+
+
+def test_pool_checkouts_are_measured(client):
+    def checkouts() -> int:
+        metrics = client.request("GET", "/metrics").get_data(as_text=True)
+        match = re.search(
+            r"^db_pool_checkout_duration_seconds_count (\d+)$", metrics, re.M
+        )
+        return int(match.group(1))
+
+    _, session_id = client.register()
+    before = checkouts()
+    assert client.request("GET", "/api/projects", session_id).status_code == 200
+    assert checkouts() > before
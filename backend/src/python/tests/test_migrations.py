@@ -0,0 +1,110 @@
+"""
+`migrate`, on a database created before it existed.
+"""
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from database.migrations import migrate
+from database.models import Base
+
+# The schema of the first release, whose allowed_users has no primary key
+BASELINE_SCHEMA = [
+    "CREATE TABLE users (id INTEGER NOT NULL, username VARCHAR NOT NULL, email VARCHAR NOT NULL, "
+    "password VARCHAR NOT NULL, PRIMARY KEY (id), UNIQUE (username), UNIQUE (email))",
+    "CREATE TABLE projects (id INTEGER NOT NULL, project_id VARCHAR NOT NULL, name VARCHAR NOT NULL, "
+    "description VARCHAR NOT NULL, language VARCHAR NOT NULL, created_at DATETIME NOT NULL, "
+    "PRIMARY KEY (id), UNIQUE (project_id))",
+    "CREATE TABLE allowed_users (user_id INTEGER, project_id INTEGER, "
+    "FOREIGN KEY(user_id) REFERENCES users (id), FOREIGN KEY(project_id) REFERENCES projects (id))",
+    "CREATE TABLE sessions (id INTEGER NOT NULL, session_id VARCHAR NOT NULL, user_id INTEGER NOT NULL, "
+    "created_at DATETIME NOT NULL, last_accessed_at DATETIME NOT NULL, PRIMARY KEY (id), "
+    "UNIQUE (session_id), FOREIGN KEY(user_id) REFERENCES users (id))",
+]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine("sqlite:///" + str(tmp_path / "baseline.db"))
+    with engine.begin() as connection:
+        for statement in BASELINE_SCHEMA:
+            connection.execute(text(statement))
+        connection.execute(
+            text(
+                "INSERT INTO users (id, username, email, password) VALUES "
+                "(1, 'Alice', 'Alice@Example.com', 'x'), (2, 'bob', 'bob@example.com', 'x')"
+            )
+        )
+        connection.execute(
+            text(
+                "INSERT INTO projects (id, project_id, name, description, language, created_at) VALUES "
+                "(1, 'p1', 'Zebra', 'Counts zebras', 'python', '2024-01-01 00:00:00'), "
+                "(2, 'p2', 'Other', 'Other things', 'go', '2024-01-02 00:00:00')"
+            )
+        )
+        connection.execute(
+            text(
+                "INSERT INTO allowed_users (user_id, project_id) VALUES "
+                "(1, 1), (1, 1), (2, 1), (1, 2), (1, 2), (1, 2), (NULL, 2)"
+            )
+        )
+    yield engine
+    engine.dispose()
+
+
+def upgrade(engine) -> None:
+    # Like `Database` does on startup
+    Base.metadata.create_all(engine)
+    migrate(engine, Base.metadata)
+
+
+def members(engine) -> list[tuple[int, int]]:
+    with engine.connect() as connection:
+        return connection.execute(
+            text("SELECT user_id, project_id FROM allowed_users ORDER BY 1, 2")
+        ).all()
+
+
+def test_duplicate_members_are_merged(engine):
+    upgrade(engine)
+
+    assert members(engine) == [(1, 1), (1, 2), (2, 1)]
+    assert inspect(engine).get_pk_constraint("allowed_users")[
+        "constrained_columns"
+    ] == ["user_id", "project_id"]
+    with pytest.raises(IntegrityError):
+        with engine.begin() as connection:
+            connection.execute(
+                text("INSERT INTO allowed_users (user_id, project_id) VALUES (1, 1)")
+            )
+
+
+def test_existing_rows_are_upgraded(engine):
+    upgrade(engine)
+
+    with engine.connect() as connection:
+        assert connection.execute(
+            text("SELECT email_normalized, username_normalized FROM users WHERE id = 1")
+        ).one() == ("alice@example.com", "alice")
+        assert connection.execute(
+            text("SELECT revision, last_updated_at FROM projects WHERE id = 1")
+        ).one() == (1, "2024-01-01 00:00:00")
+
+
+def test_migrating_again_changes_nothing(engine):
+    upgrade(engine)
+    with engine.connect() as connection:
+        schema = connection.execute(
+            text("SELECT type, name, sql FROM sqlite_master ORDER BY name")
+        ).all()
+
+    upgrade(engine)
+    assert members(engine) == [(1, 1), (1, 2), (2, 1)]
+    with engine.connect() as connection:
+        assert (
+            connection.execute(
+                text("SELECT type, name, sql FROM sqlite_master ORDER BY name")
+            ).all()
+            == schema
+        )
@@ -0,0 +1,73 @@
+"""
+`PasswordHasher`: its hashes, the legacy ones, and how many passwords it hashes at the same time.
+"""
+
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from database.passwords import PasswordHasher
+
+
+@pytest.fixture(
+    params=[
+        {"algorithm": "scrypt", "scrypt_n": 2**10},
+        {"algorithm": "pbkdf2_sha256", "pbkdf2_iterations": 1000},
+    ],
+    ids=["scrypt", "pbkdf2_sha256"],
+)
+def hasher(request):
+    return PasswordHasher(**request.param)
+
+
+def test_verify(hasher):
+    hashed = hasher.hash("pässword")
+    assert hashed.startswith(hasher.algorithm + "$")
+    assert hasher.verify("pässword", hashed)
+    assert not hasher.verify("password", hashed)
+    assert not hasher.needs_rehash(hashed)
+
+
+def test_legacy_hashes_are_verified_and_rehashed(hasher):
+    hashed = hashlib.sha256(b"password").hexdigest()
+    assert hasher.verify("password", hashed)
+    assert not hasher.verify("other", hashed)
+    assert hasher.needs_rehash(hashed)
+
+
+@pytest.mark.parametrize(
+    "hashed",
+    [
+        "scrypt$x$8$1$00$00",
+        "scrypt$1024$8$00$00",
+        "pbkdf2_sha256$1000$zz$00",
+        "md5$1$00$00",
+    ],
+)
+def test_malformed_hashes_are_rejected(hasher, hashed):
+    assert not hasher.verify("password", hashed)
+
+
+def test_hashes_at_most_workers_passwords_at_once(monkeypatch):
+    running = 0
+    most = 0
+    lock = threading.Lock()
+
+    def pbkdf2_hmac(*args):
+        nonlocal running, most
+        with lock:
+            running += 1
+            most = max(most, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+        return b"\0" * 32
+
+    monkeypatch.setattr(hashlib, "pbkdf2_hmac", pbkdf2_hmac)
+    hasher = PasswordHasher("pbkdf2_sha256", pbkdf2_iterations=1000, workers=2)
+    with ThreadPoolExecutor(max_workers=8) as threads:
+        list(threads.map(hasher.hash, ["password"] * 16))
+    assert most == 2
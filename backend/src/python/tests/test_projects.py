@@ -0,0 +1,284 @@
+"""
+The project endpoints: their conditional GETs, the pages of /api/projects, and the bulk membership changes.
+"""
+
+import pytest
+
+
+def add_member(client, session_id: str, project_id: str) -> str:
+    email, _ = client.register()
+    response = client.request(
+        "POST",
+        f"/api/projects/{project_id}/addUser",
+        session_id,
+        json={"email": email},
+    )
+    assert response.status_code == 200, response.json
+    return email
+
+
+@pytest.mark.parametrize("path", ["/api/projects", "/api/projects/{project_id}"])
+def test_a_current_etag_is_answered_with_304(client, path):
+    _, session_id = client.register()
+    path = path.format(project_id=client.create_project(session_id))
+
+    response = client.request("GET", path, session_id)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert response.headers["Last-Modified"]
+    assert response.headers["Cache-Control"] == "private, no-cache"
+
+    response = client.request("GET", path, session_id, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.get_data() == b""
+
+    response = client.request(
+        "GET", path, session_id, headers={"If-None-Match": '"outdated"'}
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("path", ["/api/projects", "/api/projects/{project_id}"])
+def test_changing_the_members_changes_the_etag(client, path):
+    _, session_id = client.register()
+    project_id = client.create_project(session_id)
+    path = path.format(project_id=project_id)
+    etag = client.request("GET", path, session_id).headers["ETag"]
+
+    email = add_member(client, session_id, project_id)
+    response = client.request("GET", path, session_id, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    etag = response.headers["ETag"]
+
+    response = client.request(
+        "POST",
+        f"/api/projects/{project_id}/removeUser",
+        session_id,
+        json={"email": email},
+    )
+    assert response.status_code == 200
+    response = client.request("GET", path, session_id, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_creating_and_deleting_projects_changes_the_list_etag(client):
+    _, session_id = client.register()
+    client.create_project(session_id)
+    etag = client.request("GET", "/api/projects", session_id).headers["ETag"]
+
+    project_id = client.create_project(session_id, "another")
+    response = client.request(
+        "GET", "/api/projects", session_id, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    response = client.request("DELETE", f"/api/projects/{project_id}", session_id)
+    assert response.status_code == 200
+    response = client.request(
+        "GET", "/api/projects", session_id, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert len(response.json["data"]["projects"]) == 1
+
+
+def test_every_page_has_its_own_etag(client):
+    _, session_id = client.register()
+    for i in range(3):
+        client.create_project(session_id, f"project {i}")
+
+    etags = {
+        client.request("GET", path, session_id).headers["ETag"]
+        for path in (
+            "/api/projects",
+            "/api/projects?limit=2",
+            "/api/projects?fields=name",
+        )
+    }
+    assert len(etags) == 3
+
+
+def test_an_etag_doesnt_grant_access(client):
+    _, owner = client.register()
+    _, other = client.register()
+    project_id = client.create_project(owner)
+    etag = client.request("GET", f"/api/projects/{project_id}", owner).headers["ETag"]
+
+    response = client.request(
+        "GET", f"/api/projects/{project_id}", other, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 403
+
+
+def list_projects(client, session_id: str, query: str = ""):
+    response = client.request("GET", f"/api/projects?{query}", session_id)
+    assert response.status_code == 200, response.json
+    return response.json["data"]
+
+
+def test_pages_follow_each_other(client):
+    _, session_id = client.register()
+    names = [f"project {i}" for i in range(5)]
+    for name in names:
+        client.create_project(session_id, name)
+
+    listed = []
+    data = list_projects(client, session_id, "limit=2")
+    while True:
+        assert len(data["projects"]) <= 2
+        listed += [project["name"] for project in data["projects"]]
+        if data["next_cursor"] is None:
+            break
+        data = list_projects(
+            client, session_id, f"limit=2&cursor={data['next_cursor']}"
+        )
+
+    assert listed == names
+    assert list_projects(client, session_id)["next_cursor"] is None
+
+
+def test_filters(client):
+    _, session_id = client.register()
+    for name, language in [
+        ("Web app", "typescript"),
+        ("Web scraper", "python"),
+        ("CLI", "python"),
+    ]:
+        response = client.request(
+            "POST",
+            "/api/projects",
+            session_id,
+            json={"name": name, "description": "description", "language": language},
+        )
+        assert response.json["success"], response.json
+
+    def names(query: str) -> list[str]:
+        return [p["name"] for p in list_projects(client, session_id, query)["projects"]]
+
+    assert names("language=python") == ["Web scraper", "CLI"]
+    assert names("name=web") == ["Web app", "Web scraper"]
+    assert names("name=WEB&language=python") == ["Web scraper"]
+    assert names("name=nothing") == []
+
+
+def test_fields(client):
+    _, session_id = client.register()
+    project_id = client.create_project(session_id)
+
+    (project,) = list_projects(client, session_id, "fields=project_id,name")["projects"]
+    assert project == {"project_id": project_id, "name": "project"}
+    (project,) = list_projects(client, session_id)["projects"]
+    assert len(project["allowed_users"]) == 1
+
+
+@pytest.mark.parametrize(
+    "query", ["limit=0", "limit=101", "limit=x", "cursor=nope", "fields=password"]
+)
+def test_invalid_parameters(client, query):
+    _, session_id = client.register()
+    response = client.request("GET", f"/api/projects?{query}", session_id)
+    assert response.status_code == 400
+
+
+def bulk(client, session_id: str, project_id: str, action: str, emails) -> dict:
+    response = client.request(
+        "POST",
+        f"/api/projects/{project_id}/{action}",
+        session_id,
+        json={"emails": emails},
+    )
+    assert response.status_code == 200, response.json
+    return response.json["data"]["results"]
+
+
+def member_emails(client, session_id: str, project_id: str) -> list[str]:
+    response = client.request("GET", f"/api/projects/{project_id}", session_id)
+    return sorted(user["email"] for user in response.json["data"]["allowed_users"])
+
+
+def test_add_and_remove_users(client):
+    owner_email, session_id = client.register()
+    project_id = client.create_project(session_id)
+    first, _ = client.register()
+    second, _ = client.register()
+
+    assert bulk(
+        client,
+        session_id,
+        project_id,
+        "addUsers",
+        [first, second, "nobody@example.com"],
+    ) == {first: "added", second: "added", "nobody@example.com": "not_found"}
+    assert member_emails(client, session_id, project_id) == sorted(
+        [owner_email, first, second]
+    )
+
+    assert bulk(
+        client, session_id, project_id, "removeUsers", [first, "nobody@example.com"]
+    ) == {first: "removed", "nobody@example.com": "not_found"}
+    assert member_emails(client, session_id, project_id) == sorted(
+        [owner_email, second]
+    )
+
+
+def test_bulk_changes_are_idempotent(client):
+    owner_email, session_id = client.register()
+    project_id = client.create_project(session_id)
+    email, _ = client.register()
+
+    assert bulk(client, session_id, project_id, "addUsers", [email]) == {email: "added"}
+    # The same user with a different case, and again
+    assert bulk(client, session_id, project_id, "addUsers", [email.upper(), email]) == {
+        email.upper(): "already_allowed",
+        email: "already_allowed",
+    }
+    assert member_emails(client, session_id, project_id) == sorted([owner_email, email])
+
+    assert bulk(client, session_id, project_id, "removeUsers", [email]) == {
+        email: "removed"
+    }
+    assert bulk(client, session_id, project_id, "removeUsers", [email]) == {
+        email: "not_allowed"
+    }
+
+
+def test_bulk_changes_require_access(client):
+    _, owner = client.register()
+    email, other = client.register()
+    project_id = client.create_project(owner)
+
+    for action in ("addUsers", "removeUsers"):
+        response = client.request(
+            "POST",
+            f"/api/projects/{project_id}/{action}",
+            other,
+            json={"emails": [email]},
+        )
+        assert response.status_code == 403
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {},
+        {"emails": []},
+        {"emails": "a@example.com"},
+        {"emails": [5]},
+        {"emails": [""]},
+        ["a@example.com"],
+        # Over `SERVER.MAX_BULK_SIZE`
+        {"emails": [f"user{i}@example.com" for i in range(101)]},
+    ],
+)
+def test_invalid_bulk_requests(client, body):
+    _, session_id = client.register()
+    project_id = client.create_project(session_id)
+
+    for action in ("addUsers", "removeUsers"):
+        response = client.request(
+            "POST", f"/api/projects/{project_id}/{action}", session_id, json=body
+        )
+        assert response.status_code == 400
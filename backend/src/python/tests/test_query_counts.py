@@ -0,0 +1,122 @@
+"""
+The project endpoints load a project's allowed users along with it, so their number of queries doesn't grow
+with the amount of projects or members (see `Database.get_user_projects` and `Database.get_project`).
+"""
+
+import pytest
+
+
+@pytest.fixture
+def owner(client):
+    return client.register()
+
+
+@pytest.fixture
+def member(client):
+    return client.register()
+
+
+def add_members(client, session_id: str, project_id: str, count: int) -> None:
+    for _ in range(count):
+        email, _ = client.register()
+        response = client.request(
+            "POST",
+            f"/api/projects/{project_id}/addUser",
+            session_id,
+            json={"email": email},
+        )
+        assert response.status_code == 200, response.json
+
+
+def load_membership(client, session_id: str, project_id: str) -> None:
+    # Loads the project's members into the membership cache, which the counted request would otherwise do
+    response = client.request("GET", f"/api/projects/{project_id}/access", session_id)
+    assert response.status_code == 204
+
+
+def count_queries(queries, client, method: str, path: str, session_id: str, **kwargs):
+    queries.reset()
+    response = client.request(method, path, session_id, **kwargs)
+    return queries.count, response
+
+
+@pytest.mark.parametrize("projects", [1, 20])
+def test_list_projects(client, queries, projects):
+    _, session_id = client.register()
+    for i in range(projects):
+        project_id = client.create_project(session_id, f"project {i}")
+        add_members(client, session_id, project_id, 2)
+
+    count, response = count_queries(queries, client, "GET", "/api/projects", session_id)
+    assert response.status_code == 200
+    assert len(response.json["data"]["projects"]) == projects
+    # The page's version, the projects, and their allowed users
+    assert count == 3
+
+
+@pytest.mark.parametrize("members", [0, 20])
+def test_get_project(client, queries, owner, members):
+    _, session_id = owner
+    project_id = client.create_project(session_id)
+    add_members(client, session_id, project_id, members)
+    load_membership(client, session_id, project_id)
+
+    count, response = count_queries(
+        queries, client, "GET", f"/api/projects/{project_id}", session_id
+    )
+    assert response.status_code == 200
+    assert len(response.json["data"]["allowed_users"]) == members + 1
+    # The project's version, the project, and its allowed users
+    assert count == 3
+
+
+def test_access(client, queries, owner):
+    _, session_id = owner
+    project_id = client.create_project(session_id)
+    add_members(client, session_id, project_id, 5)
+
+    path = f"/api/projects/{project_id}/access"
+    count, response = count_queries(queries, client, "GET", path, session_id)
+    assert response.status_code == 204
+    # The project's members, loaded into the membership cache
+    assert count == 1
+    # Served from the membership cache once it's loaded
+    count, response = count_queries(queries, client, "GET", path, session_id)
+    assert response.status_code == 204
+    assert count == 0
+
+
+@pytest.mark.parametrize("members", [0, 20])
+def test_add_and_remove_user(client, queries, owner, member, members):
+    _, session_id = owner
+    email, _ = member
+    project_id = client.create_project(session_id)
+    add_members(client, session_id, project_id, members)
+    load_membership(client, session_id, project_id)
+
+    # The project and its allowed users, the added user, the insert, the revision bump,
+    # and reloading the revision and the allowed users once they've changed
+    count, response = count_queries(
+        queries,
+        client,
+        "POST",
+        f"/api/projects/{project_id}/addUser",
+        session_id,
+        json={"email": email},
+    )
+    assert response.status_code == 200
+    assert len(response.json["data"]["allowed_users"]) == members + 2
+    assert count == 7
+
+    load_membership(client, session_id, project_id)
+    count, response = count_queries(
+        queries,
+        client,
+        "POST",
+        f"/api/projects/{project_id}/removeUser",
+        session_id,
+        json={"email": email},
+    )
+    assert response.status_code == 200
+    assert len(response.json["data"]["allowed_users"]) == members + 1
+    assert count == 7
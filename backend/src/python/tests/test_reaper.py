@@ -0,0 +1,104 @@
+"""
+The session reaper, and the lease that lets a single worker run it.
+"""
+
+import datetime
+
+import pytest
+from sqlalchemy import delete, select, update
+
+from database.models import Lease, Session
+
+from .conftest import PASSWORD
+
+LONG_AGO = datetime.datetime.now() - datetime.timedelta(days=365)
+
+
+def login(client, email: str) -> str:
+    response = client.request(
+        "POST", "/api/login", json={"email": email, "password": PASSWORD}
+    )
+    assert response.status_code == 200, response.json
+    return response.headers["Set-Cookie"].split(";")[0].split("=", 1)[1]
+
+
+def age(api, *session_ids: str, accessed_at: datetime.datetime = LONG_AGO) -> None:
+    api.database.flush_session_touches()
+    with api.database.engine.begin() as connection:
+        connection.execute(
+            update(Session)
+            .where(Session.session_id.in_(session_ids))
+            .values(last_accessed_at=accessed_at)
+        )
+
+
+def stored(api, *session_ids: str) -> set[str]:
+    with api.database.engine.connect() as connection:
+        rows = connection.execute(
+            select(Session.session_id).where(Session.session_id.in_(session_ids))
+        )
+        return {row[0] for row in rows}
+
+
+def test_reaps_expired_sessions(api, client):
+    _, expired = client.register()
+    _, active = client.register()
+    assert client.request("GET", "/api/user", expired).status_code == 200
+    age(api, expired)
+
+    assert api.database.reap_sessions() >= 1
+    assert stored(api, expired, active) == {active}
+    assert client.request("GET", "/api/user", expired).status_code == 401
+    assert client.request("GET", "/api/user", active).status_code == 200
+
+
+def test_reaps_in_batches(api, client):
+    session_ids = [client.register()[1] for _ in range(5)]
+    age(api, *session_ids)
+
+    api.database.reap_sessions(batch_size=2, max_batches=2)
+    assert len(stored(api, *session_ids)) == 1
+    api.database.reap_sessions(batch_size=2, max_batches=2)
+    assert stored(api, *session_ids) == set()
+
+
+def test_reaps_the_least_recently_used_sessions_over_the_limit(api, client):
+    email, oldest = client.register()
+    older = login(client, email)
+    newest = login(client, email)
+    now = datetime.datetime.now()
+    age(api, oldest, accessed_at=now - datetime.timedelta(hours=2))
+    age(api, older, accessed_at=now - datetime.timedelta(hours=1))
+
+    api.database.reap_sessions(max_per_user=1)
+    assert stored(api, oldest, older, newest) == {newest}
+
+
+@pytest.fixture
+def lease(api):
+    name = "test-lease"
+    yield name
+    with api.database.engine.begin() as connection:
+        connection.execute(delete(Lease).where(Lease.name == name))
+
+
+def test_a_lease_has_a_single_holder(api, lease, monkeypatch):
+    duration = datetime.timedelta(minutes=1)
+    holder = api.database.lease_holder
+    assert api.database.acquire_lease(lease, duration)
+    assert api.database.acquire_lease(lease, duration)
+
+    monkeypatch.setattr(api.database, "lease_holder", "another-worker")
+    assert not api.database.acquire_lease(lease, duration)
+
+    monkeypatch.setattr(api.database, "lease_holder", holder)
+    api.database.release_lease(lease)
+    monkeypatch.setattr(api.database, "lease_holder", "another-worker")
+    assert api.database.acquire_lease(lease, duration)
+
+
+def test_an_expired_lease_is_taken_over(api, lease, monkeypatch):
+    assert api.database.acquire_lease(lease, datetime.timedelta(seconds=-1))
+
+    monkeypatch.setattr(api.database, "lease_holder", "another-worker")
+    assert api.database.acquire_lease(lease, datetime.timedelta(minutes=1))
@@ -0,0 +1,113 @@
+"""
+/api/projects/search, with the FTS5 index of the projects and with its substring fallback.
+"""
+
+import pytest
+
+
+def create(client, session_id: str, name: str, description: str, language: str):
+    response = client.request(
+        "POST",
+        "/api/projects",
+        session_id,
+        json={"name": name, "description": description, "language": language},
+    )
+    assert response.status_code == 200, response.json
+    return response.json["data"]["project_id"]
+
+
+def search(client, session_id: str, query: str) -> list[str]:
+    response = client.request("GET", f"/api/projects/search?{query}", session_id)
+    assert response.status_code == 200, response.json
+    return [project["name"] for project in response.json["data"]["projects"]]
+
+
+@pytest.fixture(params=[True, False], ids=["full_text", "substrings"])
+def full_text(api, request, monkeypatch):
+    if request.param and not api.database.full_text_search:
+        pytest.skip("FTS5 is unavailable")
+    monkeypatch.setattr(api.database, "full_text_search", request.param)
+    return request.param
+
+
+def test_only_the_users_projects_match(client, full_text):
+    _, owner = client.register()
+    _, other = client.register()
+    create(client, owner, "Zebra tracker", "Counts zebras", "python")
+    create(client, other, "Zebra game", "Zebras everywhere", "python")
+
+    assert search(client, owner, "q=zebra") == ["Zebra tracker"]
+    assert search(client, other, "q=zebra") == ["Zebra game"]
+
+
+def test_every_term_must_match(client, full_text):
+    _, session_id = client.register()
+    create(client, session_id, "Giraffe chess", "A board game", "rust")
+    create(client, session_id, "Giraffe notes", "Plain text", "rust")
+
+    assert search(client, session_id, "q=giraffe+board") == ["Giraffe chess"]
+
+
+def test_the_last_term_is_a_prefix(client, full_text):
+    _, session_id = client.register()
+    create(client, session_id, "Okapi compiler", "Compiles things", "go")
+
+    assert search(client, session_id, "q=okapi+comp") == ["Okapi compiler"]
+
+
+def test_membership_changes_apply_to_search(client, full_text):
+    owner_email, owner = client.register()
+    member_email, member = client.register()
+    project_id = create(client, owner, "Lemur lab", "Experiments", "python")
+    assert search(client, member, "q=lemur") == []
+
+    path = f"/api/projects/{project_id}/addUser"
+    client.request("POST", path, owner, json={"email": member_email})
+    assert search(client, member, "q=lemur") == ["Lemur lab"]
+
+    path = f"/api/projects/{project_id}/removeUser"
+    client.request("POST", path, owner, json={"email": member_email})
+    assert search(client, member, "q=lemur") == []
+
+
+def test_deleted_projects_dont_match(client, full_text):
+    _, session_id = client.register()
+    project_id = create(client, session_id, "Walrus wiki", "Docs", "python")
+    client.request("DELETE", f"/api/projects/{project_id}", session_id)
+
+    assert search(client, session_id, "q=walrus") == []
+
+
+def test_full_text_ranks_names_first(client, api):
+    if not api.database.full_text_search:
+        pytest.skip("FTS5 is unavailable")
+    _, session_id = client.register()
+    create(client, session_id, "Notes", "All about the narwhal", "python")
+    create(client, session_id, "Narwhal", "Notes", "python")
+
+    assert search(client, session_id, "q=narwhal") == ["Narwhal", "Notes"]
+
+
+def test_substrings_match_within_words(client, api, monkeypatch):
+    monkeypatch.setattr(api.database, "full_text_search", False)
+    _, session_id = client.register()
+    create(client, session_id, "Hippopotamus", "Big", "python")
+
+    assert search(client, session_id, "q=potam") == ["Hippopotamus"]
+
+
+def test_search_validates_its_parameters(client):
+    _, session_id = client.register()
+    for query in ["q=", "q=a&limit=0", "q=a&fields=nope"]:
+        response = client.request("GET", f"/api/projects/search?{query}", session_id)
+        assert response.status_code == 400
+
+
+def test_search_returns_the_requested_fields(client):
+    _, session_id = client.register()
+    create(client, session_id, "Pelican", "Fish", "python")
+
+    response = client.request(
+        "GET", "/api/projects/search?q=pelican&fields=name", session_id
+    )
+    assert response.json["data"]["projects"] == [{"name": "Pelican"}]
@@ -0,0 +1,114 @@
+"""
+The session cache: the generic TTL/LRU cache under the caches of `Database`, and the sessions it skips the database for.
+"""
+
+import time
+
+from database import Session
+from database.session_cache import TTLCache
+
+
+def test_evicts_the_least_recently_used_entry():
+    cache: TTLCache[str, int] = TTLCache(2, 60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats() | {"hit_ratio": None} == {
+        "size": 2,
+        "max_size": 2,
+        "hits": 3,
+        "misses": 1,
+        "evictions": 1,
+        "hit_ratio": None,
+    }
+
+
+def test_entries_expire(monkeypatch):
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    cache: TTLCache[str, int] = TTLCache(10, 5)
+    cache.put("a", 1)
+
+    monkeypatch.setattr(time, "monotonic", lambda: now + 4)
+    assert cache.get("a") == 1
+    monkeypatch.setattr(time, "monotonic", lambda: now + 5)
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_invalidate_and_clear():
+    removed = []
+
+    class Cache(TTLCache[str, int]):
+        def _removed(self, key: str, value: int) -> None:
+            removed.append((key, value))
+
+    cache = Cache(10, 60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.invalidate("a", "missing")
+    assert cache.get("a") is None
+    assert removed == [("a", 1)]
+
+    cache.clear()
+    assert cache.get("b") is None
+
+
+def test_a_cache_without_entries_caches_nothing():
+    cache: TTLCache[str, int] = TTLCache(0, 60)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+
+def user_id_of(api, session_id: str) -> int | None:
+    with api.database.session_scope():
+        return api.database.get_session_user_id(session_id)
+
+
+def test_a_validated_session_is_served_from_memory(api, client, queries):
+    _, session_id = client.register()
+    api.database.session_cache.invalidate(session_id)
+    hits = api.database.session_cache.hits
+
+    queries.reset()
+    user_id = user_id_of(api, session_id)
+    assert user_id is not None
+    assert queries.count > 0
+
+    queries.reset()
+    assert user_id_of(api, session_id) == user_id
+    assert queries.count == 0
+    assert api.database.session_cache.hits == hits + 1
+
+
+def test_an_expired_entry_is_validated_again(api, client, queries, monkeypatch):
+    _, session_id = client.register()
+    monkeypatch.setattr(api.database.session_cache, "ttl", 0)
+    api.database.session_cache.invalidate(session_id)
+
+    for _ in range(2):
+        queries.reset()
+        assert user_id_of(api, session_id) is not None
+        assert queries.count > 0
+
+
+def test_logging_out_removes_the_session(client):
+    _, session_id = client.register()
+    assert client.request("GET", "/api/user", session_id).status_code == 200
+
+    assert client.request("POST", "/api/logout", session_id).status_code == 200
+    assert client.request("GET", "/api/user", session_id).status_code == 401
+
+
+def test_deleting_a_session_removes_it(api, client):
+    _, session_id = client.register()
+    assert client.request("GET", "/api/user", session_id).status_code == 200
+
+    with api.database.session_scope():
+        api.database.delete_from(Session, Session.session_id == session_id)
+    assert client.request("GET", "/api/user", session_id).status_code == 401
@@ -0,0 +1,122 @@
+"""
+Signed session tokens, and their revocation on logout.
+"""
+
+import datetime
+import time
+
+import pytest
+
+from database.session_tokens import SessionTokens
+
+from .conftest import PASSWORD
+
+SECRET = b"secret"
+LIFETIME = datetime.timedelta(hours=1)
+
+
+def test_a_token_carries_its_user():
+    tokens = SessionTokens(SECRET, LIFETIME)
+    token = tokens.issue(42)
+
+    assert SessionTokens.is_token(token)
+    assert tokens.verify(token) == 42
+    assert SessionTokens(SECRET, LIFETIME).verify(token) == 42
+
+
+@pytest.mark.parametrize(
+    "tamper",
+    [
+        lambda token: "43" + token[2:],
+        lambda token: token[:-1] + ("A" if token[-1] != "A" else "B"),
+        lambda token: SessionTokens(b"another secret", LIFETIME).issue(42),
+        lambda token: "not.a.token.é",
+    ],
+)
+def test_a_tampered_token_is_rejected(tamper):
+    tokens = SessionTokens(SECRET, LIFETIME)
+    token = tamper(tokens.issue(42))
+
+    assert tokens.verify(token) is None
+    assert tokens.renew(token) is None
+    assert tokens.revoke(token) is None
+
+
+def test_a_token_expires(monkeypatch):
+    tokens = SessionTokens(SECRET, LIFETIME)
+    token = tokens.issue(42)
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + LIFETIME.total_seconds() + 1)
+    assert tokens.verify(token) is None
+    assert tokens.renew(token) is None
+
+
+def test_revoking_a_token_revokes_its_renewed_copies():
+    tokens = SessionTokens(SECRET, LIFETIME)
+    token = tokens.issue(42)
+    renewed = tokens.renew(token)
+    other = tokens.issue(42)
+
+    assert renewed is not None and tokens.verify(renewed) == 42
+    token_id, expires_at = tokens.revoke(renewed)
+    assert token_id == token.split(".")[2]
+    assert expires_at > datetime.datetime.now()
+
+    assert tokens.verify(token) is None
+    assert tokens.verify(renewed) is None
+    assert tokens.verify(other) == 42
+    assert len(tokens) == 1
+
+
+def test_revocations_are_shared_and_forgotten_once_expired():
+    tokens = SessionTokens(SECRET, LIFETIME)
+    token = tokens.issue(42)
+    token_id = token.split(".")[2]
+
+    tokens.add_revocations({token_id: int(time.time()) + 60})
+    assert tokens.verify(token) is None
+    tokens.add_revocations({token_id: int(time.time()) - 1})
+    assert len(tokens) == 0
+    assert tokens.verify(token) == 42
+
+
+@pytest.fixture
+def signed(api, monkeypatch):
+    """
+    Switches the database to the "signed" session mode.
+    """
+    monkeypatch.setattr(api.database, "session_tokens", SessionTokens(SECRET, LIFETIME))
+    return api.database
+
+
+def login(client, email: str) -> str:
+    response = client.request(
+        "POST", "/api/login", json={"email": email, "password": PASSWORD}
+    )
+    assert response.status_code == 200, response.json
+    return response.headers["Set-Cookie"].split(";")[0].split("=", 1)[1]
+
+
+def test_logging_in_issues_a_token_and_logging_out_revokes_it(client, signed):
+    email, _ = client.register()
+    token = login(client, email)
+    assert SessionTokens.is_token(token)
+    assert client.request("GET", "/api/user", token).status_code == 200
+
+    assert client.request("POST", "/api/logout", token).status_code == 200
+    assert client.request("GET", "/api/user", token).status_code == 401
+
+
+def test_other_workers_load_the_revocations(client, signed, monkeypatch):
+    email, _ = client.register()
+    token = login(client, email)
+    signed.sync_session_revocations()
+    assert client.request("POST", "/api/logout", token).status_code == 200
+
+    # Another worker, which verified the token before it was revoked
+    monkeypatch.setattr(signed, "session_tokens", SessionTokens(SECRET, LIFETIME))
+    assert client.request("GET", "/api/user", token).status_code == 200
+    assert signed.sync_session_revocations() == 1
+    assert client.request("GET", "/api/user", token).status_code == 401
+    assert signed.sync_session_revocations() == 0
@@ -0,0 +1,112 @@
+"""
+Session accesses, buffered in memory and written to `Session.last_accessed_at` in batches.
+"""
+
+import datetime
+
+import pytest
+from sqlalchemy import event, select, update
+
+from database import Session
+from database.session_touch import SessionTouchBuffer
+
+
+@pytest.fixture
+def writes(api):
+    """
+    The UPDATE, INSERT and DELETE statements the database executes, through any of its engines.
+    """
+    statements: list[str] = []
+
+    def record(connection, cursor, statement, *args) -> None:
+        if statement.lstrip().split(None, 1)[0].upper() in (
+            "UPDATE",
+            "INSERT",
+            "DELETE",
+        ):
+            statements.append(statement)
+
+    engines = {api.database.engine, api.database.read_engine}
+    if api.database.write_queue is not None:
+        engines.add(api.database.write_queue.engine)
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", record)
+    yield statements
+    for engine in engines:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def last_accessed_at(api, session_id: str) -> datetime.datetime:
+    with api.database.engine.connect() as connection:
+        return connection.execute(
+            select(Session.last_accessed_at).where(Session.session_id == session_id)
+        ).scalar_one()
+
+
+def test_reading_with_a_session_doesnt_write(api, client, writes):
+    _, session_id = client.register()
+    api.database.flush_session_touches()
+    api.database.session_cache.invalidate(session_id)
+    writes.clear()
+
+    assert client.request("GET", "/api/user", session_id).status_code == 200
+    assert client.request("GET", "/api/projects", session_id).status_code == 200
+    assert writes == []
+    assert api.database.session_touches.last_touch(session_id) is not None
+
+
+def test_accesses_are_flushed_in_one_update(api, client, writes):
+    session_ids = [client.register()[1] for _ in range(3)]
+    api.database.flush_session_touches()
+    # Accesses never move `last_accessed_at` back, so the sessions were last used before the current minute
+    with api.database.engine.begin() as connection:
+        connection.execute(
+            update(Session)
+            .where(Session.session_id.in_(session_ids))
+            .values(
+                last_accessed_at=datetime.datetime.now() - datetime.timedelta(days=1)
+            )
+        )
+    for session_id in session_ids:
+        assert client.request("GET", "/api/user", session_id).status_code == 200
+    touched = {
+        session_id: api.database.session_touches.last_touch(session_id)
+        for session_id in session_ids
+    }
+    writes.clear()
+
+    assert api.database.flush_session_touches() == 3
+    assert len(writes) == len(set(touched.values()))
+    for session_id, accessed_at in touched.items():
+        assert last_accessed_at(api, session_id) == accessed_at
+        assert api.database.session_touches.last_touch(session_id) is None
+    assert api.database.flush_session_touches() == 0
+
+
+def test_accesses_are_rounded_down_and_grouped():
+    buffer = SessionTouchBuffer(datetime.timedelta(minutes=1))
+    buffer.touch("a")
+    buffer.touch("b")
+
+    accessed_at = buffer.last_touch("a")
+    assert accessed_at.second == 0 and accessed_at.microsecond == 0
+    assert len(buffer) == 2
+    assert buffer.drain() in (
+        {accessed_at: ["a", "b"]},
+        # The minute ended between the two accesses
+        {accessed_at: ["a"], buffer.last_touch("b"): ["b"]},
+    )
+    assert len(buffer) == 0
+
+
+def test_restored_accesses_dont_override_newer_ones():
+    buffer = SessionTouchBuffer(datetime.timedelta(0))
+    old = datetime.datetime.now() - datetime.timedelta(hours=1)
+    buffer.touch("a")
+    newer = buffer.last_touch("a")
+
+    buffer.restore({old: ["a", "b"]})
+    assert buffer.last_touch("a") == newer
+    assert buffer.last_touch("b") == old
+    buffer.discard("a", "b")
+    assert len(buffer) == 0
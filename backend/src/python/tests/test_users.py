@@ -0,0 +1,92 @@
+"""
+Registration, login, the lookups of users by email or username, and their autocompletion.
+"""
+
+import pytest
+
+from .conftest import PASSWORD
+
+
+@pytest.mark.parametrize(
+    "path, body",
+    [
+        ("/api/login", {"email": 5, "password": PASSWORD}),
+        ("/api/login", {"email": "a@example.com", "password": ["x"]}),
+        ("/api/login", ["a@example.com"]),
+        ("/api/register", {"email": 5, "username": "user", "password": PASSWORD}),
+        ("/api/register", {"email": "a@example.com", "username": {}, "password": "x"}),
+    ],
+)
+def test_public_routes_reject_fields_that_arent_strings(client, path, body):
+    response = client.request("POST", path, json=body)
+    assert response.status_code == 400
+    assert response.json == {"success": False, "data": {"error": "Invalid request"}}
+
+
+@pytest.mark.parametrize("route", ["addUser", "removeUser"])
+def test_membership_routes_reject_emails_that_arent_strings(client, route):
+    _, session_id = client.register()
+    project_id = client.create_project(session_id)
+
+    response = client.request(
+        "POST", f"/api/projects/{project_id}/{route}", session_id, json={"email": 5}
+    )
+    assert response.status_code == 400
+
+
+def register_named(client, username: str) -> str:
+    response = client.request(
+        "POST",
+        "/api/register",
+        json={
+            "email": f"{username}@example.com",
+            "username": username,
+            "password": PASSWORD,
+        },
+    )
+    assert response.status_code == 200, response.json
+    return response.headers["Set-Cookie"].split(";")[0].split("=", 1)[1]
+
+
+def autocomplete(client, session_id: str, query: str) -> list[str]:
+    response = client.request("GET", f"/api/users/autocomplete?{query}", session_id)
+    assert response.status_code == 200, response.json
+    assert response.headers["Cache-Control"] == "private, max-age=10"
+    return [user["username"] for user in response.json["data"]["users"]]
+
+
+def test_autocomplete_finds_users_by_username_and_email(client):
+    session_id = register_named(client, "Quokka")
+    register_named(client, "quoll")
+    register_named(client, "quail")
+
+    assert autocomplete(client, session_id, "q=QUO") == ["Quokka", "quoll"]
+    assert autocomplete(client, session_id, "q=quokka@example") == ["Quokka"]
+    assert autocomplete(client, session_id, "q=quo&limit=1") == ["Quokka"]
+    assert autocomplete(client, session_id, "q=quoz") == []
+
+
+def test_longer_prefixes_are_answered_from_memory(api, client, queries):
+    session_id = register_named(client, "walrus")
+    register_named(client, "wallaby")
+    register_named(client, "wombat")
+
+    assert autocomplete(client, session_id, "q=w") == ["wallaby", "walrus", "wombat"]
+    queries.reset()
+    hits = api.database.user_directory_cache.hits
+    with api.database.session_scope():
+        assert [user["username"] for user in api.database.search_users("wal", 10)] == [
+            "wallaby",
+            "walrus",
+        ]
+    assert queries.count == 0
+    assert api.database.user_directory_cache.hits == hits + 1
+
+
+@pytest.mark.parametrize(
+    "query", ["", "q=", "q=" + "a" * 255, "q=a&limit=0", "q=a&limit=11", "q=a&limit=x"]
+)
+def test_autocomplete_rejects_invalid_parameters(client, query):
+    _, session_id = client.register()
+    response = client.request("GET", f"/api/users/autocomplete?{query}", session_id)
+    assert response.status_code == 400
@@ -0,0 +1,105 @@
+"""
+`WriteQueue`: writes committed in groups by a single writer thread.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from database.engine import create_writer_engine
+from database.write_queue import WriteQueue
+
+
+@pytest.fixture
+def write_queue(tmp_path):
+    engine = create_writer_engine("sqlite:///" + str(tmp_path / "writes.db"))
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE items (name VARCHAR PRIMARY KEY)"))
+    write_queue = WriteQueue(engine, max_batch=10)
+    yield write_queue
+    write_queue.close()
+    engine.dispose()
+
+
+def insert(name: str):
+    def operation(session) -> str:
+        session.execute(text("INSERT INTO items (name) VALUES (:name)"), {"name": name})
+        return name
+
+    return operation
+
+
+def names(write_queue: WriteQueue) -> list[str]:
+    with write_queue.engine.connect() as connection:
+        return list(
+            connection.execute(text("SELECT name FROM items ORDER BY name")).scalars()
+        )
+
+
+def submit_while_busy(write_queue: WriteQueue, operations) -> list:
+    """
+    Submits operations while the writer is busy, so they're queued and committed together.
+
+    Returns:
+        The futures of the operations.
+    """
+    started, release = threading.Event(), threading.Event()
+
+    def block(session) -> None:
+        started.set()
+        release.wait()
+
+    executor = ThreadPoolExecutor(len(operations) + 1)
+    blocker = executor.submit(write_queue.submit, block)
+    started.wait()
+    futures = [executor.submit(write_queue.submit, op) for op in operations]
+    while len(write_queue) < len(operations):
+        time.sleep(0.01)
+    release.set()
+    blocker.result()
+    executor.shutdown()
+    return futures
+
+
+def test_returns_what_the_operation_returned(write_queue):
+    assert write_queue.submit(insert("a")) == "a"
+    assert names(write_queue) == ["a"]
+    assert (write_queue.operations, write_queue.batches) == (1, 1)
+
+
+def test_queued_writes_are_committed_together(write_queue):
+    futures = submit_while_busy(write_queue, [insert(str(i)) for i in range(5)])
+
+    assert sorted(future.result() for future in futures) == ["0", "1", "2", "3", "4"]
+    assert names(write_queue) == ["0", "1", "2", "3", "4"]
+    # The blocking operation's batch, and one for the rest
+    assert (write_queue.operations, write_queue.batches) == (6, 2)
+
+
+def test_a_failing_write_is_rolled_back_alone(write_queue):
+    write_queue.submit(insert("taken"))
+
+    def insert_twice(session) -> None:
+        insert("partial")(session)
+        insert("taken")(session)
+
+    good, failing, other = submit_while_busy(
+        write_queue, [insert("a"), insert_twice, insert("b")]
+    )
+
+    assert good.result() == "a" and other.result() == "b"
+    with pytest.raises(IntegrityError):
+        failing.result()
+    assert names(write_queue) == ["a", "b", "taken"]
+
+
+def test_a_closed_queue_refuses_writes(write_queue):
+    write_queue.close()
+    write_queue.close()
+
+    with pytest.raises(Exception, match="closed"):
+        write_queue.submit(insert("a"))
@@ -1 +1,2 @@
-from .const import DATABASE, SERVER
\ No newline at end of file
+from .const import DATABASE, SERVER
+from .metrics import Metrics
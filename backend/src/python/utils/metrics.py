@@ -0,0 +1,226 @@
+import bisect
+import contextvars
+import threading
+import time
+from dataclasses import dataclass, field
+
+from typing import Iterable
+
+# Upper bounds (in seconds) of the latency histograms' buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+# Upper bounds of the queries-per-request histogram's buckets
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+
+
+class Histogram:
+    """
+    A cumulative histogram, in the Prometheus sense. It isn't thread-safe on its own.
+    """
+
+    def __init__(self, buckets: Iterable[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # The last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> list[str]:
+        separator = "," if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            cumulative += count
+            lines.append(
+                f'{name}_bucket{{{labels}{separator}le="{bound}"}} {cumulative}'
+            )
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+
+@dataclass
+class RequestStats:
+    """
+    The database work done while handling a single request.
+    """
+
+    started_at: float = field(default_factory=time.perf_counter)
+    queries: int = 0
+    query_time: float = 0.0
+    statements: list[tuple[str, float]] = field(default_factory=list)
+
+
+class Metrics:
+    """
+    A process-wide registry of the API's performance metrics, rendered in the Prometheus text format.
+
+    `ApiServer` reports the requests (see `start_request` and `finish_request`),
+    and `Database` reports the queries executed by its engine (see `record_query`)
+    and the time its connection pools took to hand out connections (see `record_pool_checkout`).
+    Queries are also attributed to the request being handled by the current thread, if there is one.
+    """
+
+    instance = None
+
+    def __init__(self) -> None:
+        if Metrics.instance:
+            raise Exception("This class is a singleton!")
+
+        self.__lock = threading.Lock()
+        self.__request_durations: dict[tuple[str, str], Histogram] = {}
+        self.__request_queries: dict[tuple[str, str], Histogram] = {}
+        self.__responses: dict[tuple[str, str, int], int] = {}
+        self.__query_durations: dict[str, Histogram] = {}
+        self.__lock_errors = 0
+        self.__pool_checkouts = Histogram(LATENCY_BUCKETS)
+        self.__current_request: contextvars.ContextVar[RequestStats | None] = (
+            contextvars.ContextVar("current_request", default=None)
+        )
+
+    @staticmethod
+    def get_instance() -> "Metrics":
+        """
+        Gets the instance of the metrics registry.
+
+        Returns:
+            The instance of the metrics registry.
+        """
+        if not Metrics.instance:
+            Metrics.instance = Metrics()
+        return Metrics.instance
+
+    def start_request(self) -> None:
+        """
+        Starts measuring a request handled by the current thread.
+        """
+        self.__current_request.set(RequestStats())
+
+    def finish_request(
+        self, endpoint: str, method: str, status: int
+    ) -> tuple[float, RequestStats] | None:
+        """
+        Stops measuring the current request, and records it.
+
+        Args:
+            endpoint: The route of the request, e.g. "/api/projects/<project_id>".
+            method: The HTTP method of the request.
+            status: The status code of the response.
+
+        Returns:
+            The duration of the request and the database work it did, or None if it wasn't started.
+        """
+        stats = self.__current_request.get()
+        if stats is None:
+            return None
+        self.__current_request.set(None)
+        duration = time.perf_counter() - stats.started_at
+
+        key = (endpoint, method)
+        with self.__lock:
+            if key not in self.__request_durations:
+                self.__request_durations[key] = Histogram(LATENCY_BUCKETS)
+                self.__request_queries[key] = Histogram(QUERY_COUNT_BUCKETS)
+            self.__request_durations[key].observe(duration)
+            self.__request_queries[key].observe(stats.queries)
+            response_key = (endpoint, method, status)
+            self.__responses[response_key] = self.__responses.get(response_key, 0) + 1
+        return duration, stats
+
+    def record_query(self, statement: str, duration: float) -> None:
+        """
+        Records an executed SQL statement.
+
+        Args:
+            statement: The SQL of the statement.
+            duration: The time it took to execute, including waiting for locks, in seconds.
+        """
+        kind = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else ""
+        if kind not in ("select", "insert", "update", "delete"):
+            kind = "other"
+
+        with self.__lock:
+            if kind not in self.__query_durations:
+                self.__query_durations[kind] = Histogram(LATENCY_BUCKETS)
+            self.__query_durations[kind].observe(duration)
+
+        stats = self.__current_request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.query_time += duration
+            stats.statements.append((statement, duration))
+
+    def record_pool_checkout(self, duration: float) -> None:
+        """
+        Records a connection checked out from a pool.
+
+        Args:
+            duration: The time it took, including waiting for a connection to be returned, in seconds.
+        """
+        with self.__lock:
+            self.__pool_checkouts.observe(duration)
+
+    def record_lock_error(self) -> None:
+        """
+        Records a statement that failed because the database was locked for too long.
+        """
+        with self.__lock:
+            self.__lock_errors += 1
+
+    def render(
+        self,
+        counters: dict[str, float] | None = None,
+        gauges: dict[str, float] | None = None,
+    ) -> str:
+        """
+        Renders the metrics in the Prometheus text exposition format.
+
+        Args:
+            counters: Additional counters kept elsewhere (e.g. by the session cache), by metric name.
+            gauges: Additional point-in-time values to include, by metric name.
+
+        Returns:
+            The metrics.
+        """
+        lines = []
+        with self.__lock:
+            lines.append("# TYPE api_request_duration_seconds histogram")
+            for (endpoint, method), histogram in sorted(
+                self.__request_durations.items()
+            ):
+                labels = f'endpoint="{endpoint}",method="{method}"'
+                lines += histogram.render("api_request_duration_seconds", labels)
+
+            lines.append("# TYPE api_request_queries histogram")
+            for (endpoint, method), histogram in sorted(self.__request_queries.items()):
+                labels = f'endpoint="{endpoint}",method="{method}"'
+                lines += histogram.render("api_request_queries", labels)
+
+            lines.append("# TYPE api_responses_total counter")
+            for (endpoint, method, status), count in sorted(self.__responses.items()):
+                labels = f'endpoint="{endpoint}",method="{method}",status="{status}"'
+                lines.append(f"api_responses_total{{{labels}}} {count}")
+
+            lines.append("# TYPE db_query_duration_seconds histogram")
+            for kind, histogram in sorted(self.__query_durations.items()):
+                lines += histogram.render("db_query_duration_seconds", f'kind="{kind}"')
+
+            lines.append("# TYPE db_pool_checkout_duration_seconds histogram")
+            lines += self.__pool_checkouts.render(
+                "db_pool_checkout_duration_seconds", ""
+            )
+
+            lines.append("# TYPE db_lock_errors_total counter")
+            lines.append(f"db_lock_errors_total {self.__lock_errors}")
+
+        for name, value in (counters or {}).items():
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {value}")
+        for name, value in (gauges or {}).items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
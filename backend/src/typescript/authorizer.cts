@@ -0,0 +1,86 @@
+import backend, { internalHeaders } from './backend.cjs';
+
+type Verdicts = { [session_id: string]: { [project_id: string]: boolean } };
+
+// The maximum amount of pairs in a request, the backend server's `SERVER.MAX_AUTHORIZATION_BATCH`
+const MAX_BATCH = 1000;
+
+export default class Authorizer {
+    private url: string;
+    private delay: number;
+    // The checks waiting for the next batch, by `${session_id}:${project_id}`
+    private pending: Map<string, { session_id: string, project_id: string, resolvers: ((allowed: boolean) => void)[] }> = new Map();
+    // The time until which each allowed pair may skip the backend server, by `${session_id}:${project_id}`
+    private allowed: Map<string, number> = new Map();
+    private timer: NodeJS.Timeout | null = null;
+
+    /**
+     * Checks if users have access to projects in batches, with the backend server's batch authorization endpoint.
+     * When a room reconnects, its sockets' handshakes (and the Yjs authentication of the same sockets) cost a single request,
+     * and allowed pairs are cached for as long as the backend server allows.
+     * @param url The backend server's batch authorization endpoint
+     * @param delay How long (in milliseconds) checks are collected before they're sent
+     */
+    constructor(url: string = 'http://localhost:5000/internal/authorize', delay: number = 10) {
+        this.url = url;
+        this.delay = delay;
+    }
+
+    public authorize(session_id: string, project_id: string): Promise<boolean> {
+        let key = `${session_id}:${project_id}`;
+        let allowed_until = this.allowed.get(key);
+        if (allowed_until !== undefined) {
+            if (allowed_until > Date.now()) {
+                return Promise.resolve(true);
+            }
+            this.allowed.delete(key);
+        }
+
+        return new Promise((resolve) => {
+            let check = this.pending.get(key);
+            if (!check) {
+                check = { session_id, project_id, resolvers: [] };
+                this.pending.set(key, check);
+            }
+            check.resolvers.push(resolve);
+
+            if (this.pending.size >= MAX_BATCH) {
+                this.flush();
+            } else if (!this.timer) {
+                this.timer = setTimeout(() => this.flush(), this.delay);
+            }
+        });
+    }
+
+    private flush() {
+        if (this.timer) {
+            clearTimeout(this.timer);
+            this.timer = null;
+        }
+        let checks = Array.from(this.pending.entries());
+        this.pending.clear();
+        // Forgets the expired verdicts of the pairs that weren't checked again
+        let now = Date.now();
+        this.allowed.forEach((allowed_until, key) => {
+            if (allowed_until <= now) {
+                this.allowed.delete(key);
+            }
+        });
+
+        let pairs = checks.map(([_, check]) => ({ session_id: check.session_id, project_id: check.project_id }));
+        backend.post(this.url, { pairs }, { headers: internalHeaders }).then((response) => {
+            let verdicts: Verdicts = response.data.data.verdicts;
+            let allowed_until = Date.now() + response.data.data.ttl * 1000;
+            for (let [key, check] of checks) {
+                let allowed = verdicts[check.session_id]?.[check.project_id] === true;
+                if (allowed) {
+                    this.allowed.set(key, allowed_until);
+                }
+                check.resolvers.forEach((resolve) => resolve(allowed));
+            }
+        }).catch((err) => {
+            console.error(err);
+            checks.forEach(([_, check]) => check.resolvers.forEach((resolve) => resolve(false)));
+        });
+    }
+}
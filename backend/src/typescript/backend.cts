@@ -0,0 +1,18 @@
+import axios from 'axios';
+
+/**
+ * The HTTP client of the backend server.
+ * When the backend server listens on a Unix domain socket (its `SERVER.UNIX_SOCKET`), the API_SOCKET environment variable
+ * is set to the same path, and requests go through the socket - the host and port of their URLs are then ignored.
+ */
+const backend = axios.create({
+    socketPath: process.env.API_SOCKET,
+});
+
+export default backend;
+
+/**
+ * The headers of requests to the backend server's /internal routes, which require the secret it shares with the realtime servers
+ * (its `SERVER.INTERNAL_SECRET`) - both read it from the INTERNAL_SECRET environment variable.
+ */
+export const internalHeaders = { 'X-Internal-Secret': process.env.INTERNAL_SECRET ?? '' };
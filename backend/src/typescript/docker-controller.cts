@@ -54,7 +54,7 @@ export default class DockerController {
         }, { t: 'code-executor' });
     }
 
-    async createContainer(project_id: string) {
+    async createContainer(project_id: string, session_id: string) {
         try {
             if (this.containers.has(project_id)) {
                 let container = this.containers.get(project_id)
@@ -68,7 +68,7 @@ export default class DockerController {
             }
 
             let promise = new Promise<Container>((resolve, reject) => {
-                let container = new Container(project_id, this.io, this.yjs);
+                let container = new Container(project_id, session_id, this.io, this.yjs);
                 this.containers.set(project_id, container);
                 resolve(container);
             });
@@ -107,6 +107,7 @@ export default class DockerController {
 
 class Container {
     private project_id: string;
+    private session_id: string;
     private io: Server;
     private yjs: YjsController;
     private docker: Docker = new Docker();
@@ -114,8 +115,9 @@ class Container {
     private stdin!: NodeJS.ReadWriteStream;
     private stdout!: NodeJS.ReadWriteStream;
 
-    constructor(project_id: string, io: Server, yjs: YjsController) {
+    constructor(project_id: string, session_id: string, io: Server, yjs: YjsController) {
         this.project_id = project_id;
+        this.session_id = session_id;
         this.io = io;
         this.yjs = yjs;
         this.create().then(async (container) => {
@@ -131,7 +133,7 @@ class Container {
     private async create() {
         try {
             // Exports the project files
-            let projectDir = await this.yjs.exportProjectToDirectory(this.project_id)
+            let projectDir = await this.yjs.exportProjectToDirectory(this.project_id, this.session_id)
             projectDir = fs.realpathSync(projectDir)
 
             let container = await this.docker.createContainer({
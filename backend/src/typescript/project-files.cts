@@ -0,0 +1,63 @@
+import backend, { internalHeaders } from './backend.cjs';
+
+// The maximum amount of files in an import request, the backend server's `SERVER.MAX_FILE_IMPORT_BATCH`
+const MAX_IMPORT_BATCH = 1000;
+
+export default class ProjectFiles {
+    private url: string;
+
+    /**
+     * Lists, creates and deletes the files of projects with the backend server's file routes,
+     * which look them up in an index by project instead of scanning the documents of every project.
+     * Requests are made on behalf of the users, with their session cookie.
+     * @param url The backend server
+     */
+    constructor(url: string = 'http://localhost:5000') {
+        this.url = url;
+    }
+
+    public async list(project_id: string, session_id: string): Promise<string[]> {
+        let response = await backend.get(`${this.url}/api/projects/${encodeURIComponent(project_id)}/files`, {
+            headers: { Cookie: `session_id=${session_id}` },
+        });
+        return response.data.data.files.map((file: { name: string }) => file.name);
+    }
+
+    /**
+     * @returns False if the project already has a file with that name
+     */
+    public async create(project_id: string, name: string, session_id: string): Promise<boolean> {
+        let response = await backend.post(`${this.url}/api/projects/${encodeURIComponent(project_id)}/files`, { name }, {
+            headers: { Cookie: `session_id=${session_id}` },
+            validateStatus: (status) => status === 200 || status === 409,
+        });
+        return response.status === 200;
+    }
+
+    /**
+     * @returns False if the project has no file with that name
+     */
+    public async delete(project_id: string, name: string, session_id: string): Promise<boolean> {
+        let response = await backend.delete(`${this.url}/api/projects/${encodeURIComponent(project_id)}/files/${encodeURIComponent(name)}`, {
+            headers: { Cookie: `session_id=${session_id}` },
+            validateStatus: (status) => status === 200 || status === 404,
+        });
+        return response.status === 200;
+    }
+
+    /**
+     * Registers files that are already stored, e.g. the documents created before the backend server kept the files.
+     * Files that are already registered are skipped.
+     * @returns The amount of files whose project exists
+     */
+    public async import(files: { project_id: string, name: string }[]): Promise<number> {
+        let imported = 0;
+        for (let i = 0; i < files.length; i += MAX_IMPORT_BATCH) {
+            let response = await backend.post(`${this.url}/internal/projects/files`, { files: files.slice(i, i + MAX_IMPORT_BATCH) }, {
+                headers: internalHeaders,
+            });
+            imported += response.data.data.imported;
+        }
+        return imported;
+    }
+}
@@ -1,7 +1,8 @@
 import express from 'express';
-import axios from 'axios';
 import http from 'http';
 import { Server, Socket } from 'socket.io';
+import Authorizer from './authorizer.cjs';
+import ProjectFiles from './project-files.cjs';
 import YjsController from './yjs-controller.cjs';
 import DockerController from './docker-controller.cjs';
 
@@ -15,7 +16,11 @@ const io = new Server(server, {
     },
 });
 
-const yjs = new YjsController(io);
+const authorizer = new Authorizer();
+
+const files = new ProjectFiles();
+
+const yjs = new YjsController(io, authorizer, files);
 
 const docker = new DockerController(io, yjs);
 
@@ -34,27 +39,21 @@ io.use((socket, next) => {
 
     console.log(`[use] Project ID: ${project_id}, Session ID: ${session_id}`);
 
-    // Checks if the user has access to the project by sending a request to the backend server requesting the project details
-    // The backend server should respond with a 200 status code if the user has access to the project and a 403 status code if the user does not have access to the project
-    axios.get(`http://localhost:5000/api/projects/${project_id}`, {
-        headers: {
-            'Cookie': `session_id=${session_id}`
-        },
-    }).then((response) => {
-        if (response.status === 200) {
+    // Checks if the user has access to the project, the checks of concurrent handshakes are sent to the backend server in a single request
+    authorizer.authorize(session_id, project_id).then((allowed) => {
+        if (allowed) {
             next();
         } else {
             next(new Error('Unauthorized'));
         }
-    }).catch((err) => {
-        console.error(err);
-        next(new Error('Unauthorized'));
     });
 })
     .on('connection', (socket: Socket) => {
         console.log(`[connection] Connected with user: ${socket.id}`);
 
         let project_id = socket.handshake.query.project_id as string;
+        // The file routes of the backend server are called on behalf of the user, the cookie was checked by the middleware above
+        let session_id = (socket.handshake.headers.cookie?.split(';').find((cookie: string) => cookie.includes('session_id'))?.split('=')[1]) as string;
         socket.join(project_id);
 
 
@@ -71,7 +70,7 @@ io.use((socket, next) => {
 
         socket.on('get_file_structure', () => {
             console.log(`[get_file_structure] Project ID: ${project_id}`);
-            yjs.getProjectStructure(project_id).then((fileNames) => {
+            yjs.getProjectStructure(project_id, session_id).then((fileNames) => {
                 console.log(`[get_file_structure] Emitting file_structure_update: ${fileNames}`)
                 io.to(project_id).emit('file_structure_update', { files: fileNames });
             });
@@ -80,10 +79,10 @@ io.use((socket, next) => {
         socket.on('create_new_file', (args: string[]) => {
             let filename = args[0];
             console.log(`[create_new_file] Project ID: ${project_id}, File Name: ${filename}`);
-            yjs.createNewFile(project_id, filename).then((success) => {
+            yjs.createNewFile(project_id, filename, session_id).then((success) => {
                 if (success) {
                     console.log(`[create_new_file] Created new file: ${filename}`);
-                    yjs.getProjectStructure(project_id).then((files) => {
+                    yjs.getProjectStructure(project_id, session_id).then((files) => {
                         console.log(`[create_new_file] Emitting file_structure_update: ${files}`);
                         io.to(project_id).emit('file_structure_update', { files: files });
                     });
@@ -95,9 +94,9 @@ io.use((socket, next) => {
             let filename = args[0];
             console.log(`[delete_file] Project ID: ${project_id}, File Name: ${filename}`);
             console.log(`[delete_file] Deleting file: ${project_id}/${filename}`);
-            yjs.deleteFile(project_id, filename).then((success) => {
+            yjs.deleteFile(project_id, filename, session_id).then((success) => {
                 if (success) {
-                    yjs.getProjectStructure(project_id).then((files) => {
+                    yjs.getProjectStructure(project_id, session_id).then((files) => {
                         console.log(`[delete_file] Emitting file_structure_update: ${files}`);
                         io.to(project_id).emit('file_structure_update', { files: files });
                         console.log(`[delete_file] Deleted file: ${filename}`);
@@ -108,7 +107,7 @@ io.use((socket, next) => {
 
         socket.on('start_container', () => {
             console.log(`[start_container] Project ID: ${project_id}`);
-            docker.createContainer(project_id).then(() => {
+            docker.createContainer(project_id, session_id).then(() => {
                 console.log(`[start_container] Created container for project: ${project_id}`);
             });
         });
@@ -1,15 +1,26 @@
-import axios from 'axios';
 import fs from 'fs';
 import { Server } from 'socket.io';
 import { LeveldbPersistence } from 'y-leveldb';
 import { Document, YSocketIO } from 'y-socket.io/dist/server';
 import Y from 'yjs';
+import Authorizer from './authorizer.cjs';
+import ProjectFiles from './project-files.cjs';
+
+// The LevelDB metadata that records the one-time import of the stored documents (see `importFiles`).
+// The document name has no "/", so it's never taken for a file.
+const MIGRATIONS_DOC = 'migrations';
+const FILES_IMPORTED = 'files-imported';
+// The delays between the attempts of the import while the backend server is unreachable, doubled up to the maximum
+const IMPORT_RETRY_DELAY = 1000;
+const MAX_IMPORT_RETRY_DELAY = 60 * 1000;
 
 export default class YjsController {
     yio: YSocketIO;
     persistence: LeveldbPersistence;
+    files: ProjectFiles;
 
-    constructor(io: Server) {
+    constructor(io: Server, authorizer: Authorizer, files: ProjectFiles) {
+        this.files = files;
         this.yio = new YSocketIO(io, {
             levelPersistenceDir: './projects',
             authenticate(handshake) {
@@ -24,18 +35,8 @@ export default class YjsController {
                     console.log(handshake)
                     return false;
                 }
-                // Checks if the user has access to the project by sending a request to the backend server requesting the project details
-                // The backend server should respond with a 200 status code if the user has access to the project and a 403 status code if the user does not have access to the project
-                return axios.get(`http://localhost:5000/api/projects/${project_id}`, {
-                    headers: {
-                        'Cookie': `session_id=${session_id}`
-                    }
-                }).then((response) => {
-                    return response.status === 200;
-                }).catch((err) => {
-                    console.error(err);
-                    return false;
-                });
+                // Checks if the user has access to the project, batched and cached along with the handshakes of `server.cts`
+                return authorizer.authorize(session_id, project_id);
             },
         });
 
@@ -68,28 +69,49 @@ export default class YjsController {
 
         // This is a hack to access the private persistence property of the YSocketIO instance
         this.persistence = (this.yio as any).persistence.provider as LeveldbPersistence;
+
+        this.importFiles();
     }
 
-    async getProjectStructure(project_id: string): Promise<string[]> {
-        return this.persistence.getAllDocNames().then((docNames: string[]) => {
-            let files = docNames.filter((docName: string) => docName.startsWith(project_id + '/')).map((docName: string) => docName.split('/')[1]);
-            return files;
-        }).catch((err: Error) => {
+    // Registers the documents stored before the backend server kept the files, which lists them from then on.
+    // It runs once - the files created since are registered as they're created, so it's recorded in LevelDB once it succeeds,
+    // and the next boots skip the scan of every document. It's retried until the backend server is reachable.
+    private async importFiles(delay: number = IMPORT_RETRY_DELAY) {
+        try {
+            if (await this.persistence.getMeta(MIGRATIONS_DOC, FILES_IMPORTED)) {
+                return;
+            }
+            let docNames: string[] = await this.persistence.getAllDocNames();
+            let files = docNames.map((docName: string) => docName.split('/'))
+                .filter((parts: string[]) => parts.length === 2 && parts[0] && parts[1])
+                .map(([project_id, name]) => ({ project_id, name }));
+            let imported = await this.files.import(files);
+            await this.persistence.setMeta(MIGRATIONS_DOC, FILES_IMPORTED, Date.now());
+            console.log(`[importFiles] Imported ${imported} of ${files.length} files`);
+        } catch (err) {
+            console.error(`[importFiles] Retrying in ${delay} ms:`, err);
+            setTimeout(() => this.importFiles(Math.min(delay * 2, MAX_IMPORT_RETRY_DELAY)), delay);
+        }
+    }
+
+    async getProjectStructure(project_id: string, session_id: string): Promise<string[]> {
+        return this.files.list(project_id, session_id).catch((err: Error) => {
             console.error(err);
             return [];
         });
     }
 
-    async deleteFile(project_id: string, file_name: string): Promise<boolean> {
-        return this.getProjectStructure(project_id).then((files: string[]) => {
-            if (files.includes(file_name)) {
+    // The backend server's file is changed first, so the user's access is checked before the document is touched.
+    // If the document can't be changed, the file is changed back, so the two don't disagree.
+    async deleteFile(project_id: string, file_name: string, session_id: string): Promise<boolean> {
+        return this.files.delete(project_id, file_name, session_id).then((deleted: boolean) => {
+            if (deleted) {
                 return this.persistence.clearDocument(project_id + '/' + file_name).then(() => {
                     console.log(`[deleteFile] Deleted file: ${project_id}/${file_name}`);
                     return true;
-                }).catch((err: Error) => {
-                    console.error(err);
-                    return false;
-                });
+                }, (err: Error) => this.files.create(project_id, file_name, session_id).then(() => {
+                    throw err;
+                }));
             }
             return false;
         }).catch((err: Error) => {
@@ -98,18 +120,17 @@ export default class YjsController {
         });
     }
 
-    async createNewFile(project_id: string, file_name: string): Promise<boolean> {
-        return this.getProjectStructure(project_id).then((files: string[]) => {
-            if (!files.includes(file_name)) {
+    async createNewFile(project_id: string, file_name: string, session_id: string): Promise<boolean> {
+        return this.files.create(project_id, file_name, session_id).then((created: boolean) => {
+            if (created) {
                 const ydoc = new Y.Doc();
                 ydoc.getText('monaco').insert(0, '');
                 return this.persistence.storeUpdate(project_id + '/' + file_name, Y.encodeStateAsUpdate(ydoc)).then(() => {
                     console.log(`[createNewFile] Created new file: ${project_id}/${file_name}`);
                     return true;
-                }).catch((err: Error) => {
-                    console.error(err);
-                    return false;
-                });
+                }, (err: Error) => this.files.delete(project_id, file_name, session_id).then(() => {
+                    throw err;
+                }));
             }
             return false;
         }).catch((err: Error) => {
@@ -127,8 +148,8 @@ export default class YjsController {
         });
     }
 
-    async exportProjectToDirectory(project_id: string) {
-        let files = await this.getProjectStructure(project_id);
+    async exportProjectToDirectory(project_id: string, session_id: string) {
+        let files = await this.getProjectStructure(project_id, session_id);
         let projectDir = `./projects-temp/${project_id}`;
         if (!fs.existsSync(projectDir)) {
             fs.mkdirSync(projectDir, { recursive: true });